@@ -0,0 +1,52 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from orders.models import Order
+from analytics.services import SalesRollupService
+
+class Command(BaseCommand):
+    help = 'Reconstruye (backfill) los rollups de ventas a partir de ORDERS y ORDER_ITEMS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='YYYY-MM-DD (default: primera orden registrada)')
+        parser.add_argument('--end-date', help='YYYY-MM-DD (default: hoy)')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Días procesados por transacción (default: 31)')
+
+    def handle(self, *args, **options):
+        start_date = self._parse(options['start_date'])
+        end_date = self._parse(options['end_date']) or timezone.localtime(timezone.now()).date()
+        chunk_days = max(1, options['chunk_days'])
+
+        if start_date is None:
+            first_record = Order.objects.aggregate(first=Min('created_at'))['first']
+            if first_record is None:
+                self.stdout.write("No hay órdenes registradas, nada que reconstruir.")
+                return
+            start_date = timezone.localtime(first_record).date()
+
+        if start_date > end_date:
+            raise CommandError("--start-date debe ser anterior o igual a --end-date.")
+
+        self.stdout.write(f"Reconstruyendo rollups del {start_date} al {end_date}...")
+
+        totals = {}
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+            counts = SalesRollupService.rebuild(chunk_start, chunk_end)
+            for table, count in counts.items():
+                totals[table] = totals.get(table, 0) + count
+            chunk_start = chunk_end + timedelta(days=1)
+
+        summary = ", ".join(f"{table}: {count}" for table, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(f"Proceso terminado. Filas generadas -> {summary}"))
+
+    def _parse(self, value):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f"Fecha inválida '{value}'. Usa YYYY-MM-DD.")
+        return parsed
@@ -0,0 +1,66 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0005_remove_product_min_stock_product_low_stock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('tickets', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'SALES_HOURLY_ROLLUP',
+                'constraints': [models.UniqueConstraint(fields=('date', 'hour'), name='sales_hourly_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('product_name', models.CharField(max_length=200)),
+                ('units_sold', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.product')),
+            ],
+            options={
+                'db_table': 'PRODUCT_DAILY_ROLLUP',
+                'constraints': [models.UniqueConstraint(fields=('date', 'product', 'product_name'), name='product_daily_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_method', models.CharField(blank=True, default='', max_length=20)),
+                ('tickets', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('lowest_ticket', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('highest_ticket', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('cancelled_tickets', models.IntegerField(default=0)),
+                ('cancelled_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('seller', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'SALES_DAILY_ROLLUP',
+                'constraints': [models.UniqueConstraint(fields=('date', 'seller', 'payment_method'), name='sales_daily_rollup_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 6.1.2 on 2026-10-17 03:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Llena los rollups con el historial existente (misma agregación que SalesRollupService.rebuild).
+    Sin esto, los reportes de días cerrados leerían tablas vacías hasta correr rebuild_sales_rollups.
+    Se recalcula todo desde ORDERS, así también se eliminan filas duplicadas con seller/product NULL.
+    """
+    Order = apps.get_model('orders', 'Order')
+    OrderItems = apps.get_model('orders', 'OrderItems')
+    SalesDailyRollup = apps.get_model('analytics', 'SalesDailyRollup')
+    SalesHourlyRollup = apps.get_model('analytics', 'SalesHourlyRollup')
+    ProductDailyRollup = apps.get_model('analytics', 'ProductDailyRollup')
+
+    orders = Order.objects.annotate(date=TruncDate('created_at'))
+    paid = orders.filter(status='PAID')
+
+    daily = {}
+    for row in paid.values('date', 'seller_id', 'payment_method').annotate(
+        tickets=Count('id'), revenue=Sum('final_amount'),
+        lowest_ticket=Min('final_amount'), highest_ticket=Max('final_amount'),
+    ).order_by():
+        key = (row['date'], row['seller_id'], row['payment_method'] or '')
+        current = daily.setdefault(key, {'tickets': 0, 'revenue': 0, 'lowest_ticket': None, 'highest_ticket': None})
+        current['tickets'] += row['tickets']
+        current['revenue'] += row['revenue'] or 0
+        lows = [value for value in (current['lowest_ticket'], row['lowest_ticket']) if value is not None]
+        highs = [value for value in (current['highest_ticket'], row['highest_ticket']) if value is not None]
+        current['lowest_ticket'] = min(lows) if lows else None
+        current['highest_ticket'] = max(highs) if highs else None
+
+    for row in orders.filter(status='CANCELLED').values('date', 'seller_id', 'payment_method').annotate(
+        cancelled_tickets=Count('id'), cancelled_amount=Sum('final_amount'),
+    ).order_by():
+        key = (row['date'], row['seller_id'], row['payment_method'] or '')
+        current = daily.setdefault(key, {})
+        current['cancelled_tickets'] = current.get('cancelled_tickets', 0) + row['cancelled_tickets']
+        current['cancelled_amount'] = current.get('cancelled_amount', 0) + (row['cancelled_amount'] or 0)
+
+    hourly = paid.annotate(hour=ExtractHour('created_at')).values('date', 'hour').annotate(
+        tickets=Count('id'), revenue=Sum('final_amount'),
+    ).order_by()
+
+    products = OrderItems.objects.filter(order__in=paid.values('pk')).annotate(
+        date=TruncDate('order__created_at')
+    ).values('date', 'product_id', 'product_name').annotate(
+        units_sold=Sum('quantity'), revenue=Sum('amount'),
+    ).order_by()
+
+    SalesDailyRollup.objects.all().delete()
+    SalesHourlyRollup.objects.all().delete()
+    ProductDailyRollup.objects.all().delete()
+
+    SalesDailyRollup.objects.bulk_create(
+        (
+            SalesDailyRollup(date=date, seller_id=seller_id, payment_method=payment_method, **values)
+            for (date, seller_id, payment_method), values in daily.items()
+        ),
+        batch_size=1000
+    )
+    SalesHourlyRollup.objects.bulk_create((SalesHourlyRollup(**row) for row in hourly), batch_size=1000)
+    ProductDailyRollup.objects.bulk_create((ProductDailyRollup(**row) for row in products), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('orders', '0009_idempotency_key'),
+        ('products', '0011_product_active_promotion_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='productdailyrollup',
+            name='product_daily_rollup_key',
+        ),
+        migrations.RemoveConstraint(
+            model_name='salesdailyrollup',
+            name='sales_daily_rollup_key',
+        ),
+        # Se reconstruye antes de crear las llaves: elimina duplicados que las harían fallar
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productdailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'product', 'product_name'), name='product_daily_rollup_key', nulls_distinct=False),
+        ),
+        migrations.AddConstraint(
+            model_name='salesdailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'seller', 'payment_method'), name='sales_daily_rollup_key', nulls_distinct=False),
+        ),
+    ]
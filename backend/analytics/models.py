@@ -1,3 +1,78 @@
 from django.db import models
 
-# Create your models here.
+
+class SalesDailyRollup(models.Model):
+    """
+    Ventas pre-agregadas por día (fecha local), vendedor y método de pago.
+    Se actualiza cuando una orden pasa a PAID o CANCELLED.
+    """
+    date = models.DateField()
+    seller = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    payment_method = models.CharField(max_length=20, blank=True, default='')
+    tickets = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    lowest_ticket = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    highest_ticket = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    cancelled_tickets = models.IntegerField(default=0)
+    cancelled_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'SALES_DAILY_ROLLUP'
+        constraints = [
+            # seller es nullable: sin nulls_distinct=False, PostgreSQL permitiría filas repetidas con seller NULL
+            models.UniqueConstraint(
+                fields=['date', 'seller', 'payment_method'], name='sales_daily_rollup_key', nulls_distinct=False
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.payment_method or 'N/A'}: {self.tickets} tickets"
+
+
+class SalesHourlyRollup(models.Model):
+    """Ventas pagadas pre-agregadas por día y hora local."""
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    tickets = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'SALES_HOURLY_ROLLUP'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'hour'], name='sales_hourly_rollup_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.hour}:00: {self.tickets} tickets"
+
+
+class ProductDailyRollup(models.Model):
+    """Unidades e ingresos vendidos por día y producto (solo órdenes pagadas)."""
+    date = models.DateField()
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    product_name = models.CharField(max_length=200)
+    units_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'PRODUCT_DAILY_ROLLUP'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'product', 'product_name'], name='product_daily_rollup_key', nulls_distinct=False
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_name}: {self.units_sold}"
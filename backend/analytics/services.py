@@ -1,40 +1,363 @@
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from django.utils.dateparse import parse_date
 from django.db.models import Sum, Avg, Max, Min, Count, F, Q, DecimalField
-from django.db.models.functions import ExtractHour
+from django.db.models.functions import ExtractHour, TruncDate
 from orders.models import Order, OrderItems
 from products.models import Product
+from products.search import ProductSearchService
 from customers.models import Customer
 from decimal import Decimal
+from .models import SalesDailyRollup, SalesHourlyRollup, ProductDailyRollup
 
-class ProductAnalyticsService:
+class DateRangeService:
+    """
+    Capa compartida de rangos de fechas.
+    Convierte fechas del calendario local en límites aware semiabiertos [inicio, fin)
+    para filtrar la columna DateTimeField directamente. Filtrar con `__date` envuelve
+    la columna en un cast con zona horaria y la base de datos no puede usar el índice.
+    """
 
     @staticmethod
-    def _calculate_product_stats(period_orders, limit=None, criterion=None):
+    def get_bounds(start_date, end_date=None):
         """
-        Calcula estadísticas de productos..
+        Retorna (inicio, fin): medianoche local de start_date y medianoche local
+        del día siguiente a end_date (None si no hay end_date).
         """
-        base_qs = OrderItems.objects.filter(order__in=period_orders).values(
-            'product__id', 'product_name'
-        ).annotate(
+        start = timezone.make_aware(datetime.combine(start_date, time.min))
+        end = None
+        if end_date is not None:
+            end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+        return start, end
+
+    @classmethod
+    def filter_by_dates(cls, queryset, start_date, end_date=None, date_field='created_at'):
+        """Filtra el queryset por días locales completos entre start_date y end_date (inclusive)."""
+        start, end = cls.get_bounds(start_date, end_date)
+        filters = {f"{date_field}__gte": start}
+        if end is not None:
+            filters[f"{date_field}__lt"] = end
+        return queryset.filter(**filters)
+
+class ProductLookupService:
+    """
+    Resuelve el identificador de producto (SKU o nombre) que reciben los reportes.
+    Nunca elige al azar entre varios productos parecidos: si el identificador es ambiguo
+    responde 400 con los candidatos para que el usuario precise el SKU.
+    """
+
+    @staticmethod
+    def resolve(identifier, queryset=None, not_found_error="Product not found."):
+        """Retorna (producto, error, status) con la misma convención que los reportes."""
+        product, candidates = ProductSearchService.resolve(identifier, queryset=queryset)
+        if product is not None:
+            return product, None, 200
+        if candidates:
+            return None, {
+                "error": "Ambiguous product identifier. Use the SKU of one of the candidates.",
+                "candidates": [{"sku": c.sku, "name": c.name} for c in candidates]
+            }, 400
+        return None, {"error": not_found_error}, 404
+
+class SalesRollupService:
+    """
+    Mantiene y consulta las tablas de rollups de ventas (diario, por hora y por producto).
+    - Escritura incremental: cuando una orden pasa a PAID o CANCELLED.
+    - Lectura: los días cerrados salen de los rollups y el día en curso de las tablas crudas.
+    - Reconstrucción: comando rebuild_sales_rollups.
+    """
+
+    DAILY_KEYS = ('date', 'seller_id', 'payment_method')
+    HOURLY_KEYS = ('date', 'hour')
+    PRODUCT_KEYS = ('date', 'product_id', 'product_name')
+
+    # ---------- Escritura incremental ----------
+
+    @classmethod
+    def register_paid_orders(cls, orders):
+        """Suma las órdenes pagadas a los rollups de su día (fecha local de creación)."""
+        orders = list(orders)
+        if not orders:
+            return
+
+        daily_rows, hourly_rows = {}, {}
+        order_dates = {}
+        for order in orders:
+            created = timezone.localtime(order.created_at)
+            order_dates[order.pk] = created.date()
+            amount = order.final_amount
+
+            cls._add(daily_rows, (created.date(), order.seller_id, order.payment_method or ''), {
+                'tickets': 1, 'revenue': amount, 'lowest_ticket': amount, 'highest_ticket': amount
+            })
+            cls._add(hourly_rows, (created.date(), created.hour), {'tickets': 1, 'revenue': amount})
+
+        product_rows = {}
+        items = OrderItems.objects.filter(order__in=orders).values(
+            'order_id', 'product_id', 'product_name'
+        ).annotate(units_sold=Sum('quantity'), revenue=Sum('amount'))
+        for item in items:
+            cls._add(product_rows, (order_dates[item['order_id']], item['product_id'], item['product_name']), {
+                'units_sold': item['units_sold'], 'revenue': item['revenue']
+            })
+
+        with transaction.atomic():
+            cls._upsert(SalesDailyRollup, cls.DAILY_KEYS, daily_rows)
+            cls._upsert(SalesHourlyRollup, cls.HOURLY_KEYS, hourly_rows)
+            cls._upsert(ProductDailyRollup, cls.PRODUCT_KEYS, product_rows)
+
+    @classmethod
+    def register_cancelled_orders(cls, orders):
+        """Registra órdenes canceladas en el contador diario de cancelaciones."""
+        daily_rows = {}
+        for order in orders:
+            created = timezone.localtime(order.created_at)
+            cls._add(daily_rows, (created.date(), order.seller_id, order.payment_method or ''), {
+                'cancelled_tickets': 1, 'cancelled_amount': order.final_amount
+            })
+
+        with transaction.atomic():
+            cls._upsert(SalesDailyRollup, cls.DAILY_KEYS, daily_rows)
+
+    @staticmethod
+    def _combine(field, current, value):
+        """Regla de acumulación por campo: mínimos, máximos o suma."""
+        if current is None:
+            return value
+        if value is None:
+            return current
+        if field == 'lowest_ticket':
+            return min(current, value)
+        if field == 'highest_ticket':
+            return max(current, value)
+        return current + value
+
+    @classmethod
+    def _add(cls, rows, key, values):
+        target = rows.setdefault(key, {})
+        for field, value in values.items():
+            target[field] = cls._combine(field, target.get(field), value)
+
+    @classmethod
+    def _upsert(cls, model, key_fields, rows):
+        """
+        Aplica los incrementos sobre las filas del rollup.
+        Las filas se bloquean antes de sumar para que dos pagos simultáneos no se pisen.
+        """
+        if not rows:
+            return
+
+        def locked_rows():
+            condition = Q()
+            for key in rows:
+                condition |= Q(**dict(zip(key_fields, key)))
+            return {
+                tuple(getattr(row, field) for field in key_fields): row
+                for row in model.objects.select_for_update().filter(condition)
+            }
+
+        existing = locked_rows()
+        missing = [key for key in rows if key not in existing]
+        if missing:
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create([model(**dict(zip(key_fields, key))) for key in missing])
+            except IntegrityError:
+                # Otra transacción creó la fila al mismo tiempo, se vuelve a leer
+                pass
+            existing = locked_rows()
+
+        updated_fields = set()
+        for key, values in rows.items():
+            row = existing[key]
+            for field, value in values.items():
+                setattr(row, field, cls._combine(field, getattr(row, field), value))
+            updated_fields.update(values)
+
+        model.objects.bulk_update(list(existing.values()), sorted(updated_fields))
+
+    # ---------- Reconstrucción ----------
+
+    @classmethod
+    def rebuild(cls, start_date, end_date):
+        """
+        Borra y recalcula los rollups del periodo a partir de ORDERS y ORDER_ITEMS.
+        Retorna el número de filas creadas por tabla.
+        """
+        orders = DateRangeService.filter_by_dates(
+            Order.objects.all(), start_date, end_date
+        ).annotate(date=TruncDate('created_at'))
+        paid_orders = orders.filter(status='PAID')
+        cancelled_orders = orders.filter(status='CANCELLED')
+
+        daily_rows = cls._merge(
+            list(cls._raw_sales_rows(paid_orders, *cls.DAILY_KEYS))
+            + list(cls._raw_cancelled_rows(cancelled_orders, *cls.DAILY_KEYS)),
+            cls.DAILY_KEYS
+        )
+        hourly_rows = cls._merge(cls._raw_hourly_rows(paid_orders, 'date'), cls.HOURLY_KEYS)
+        product_rows = cls._merge(cls._raw_product_rows(paid_orders, 'date'), cls.PRODUCT_KEYS)
+
+        counts = {}
+        with transaction.atomic():
+            for model, rows in (
+                (SalesDailyRollup, daily_rows),
+                (SalesHourlyRollup, hourly_rows),
+                (ProductDailyRollup, product_rows),
+            ):
+                model.objects.filter(date__gte=start_date, date__lte=end_date).delete()
+                model.objects.bulk_create([model(**row) for row in rows], batch_size=1000)
+                counts[model._meta.db_table] = len(rows)
+
+        return counts
+
+    @staticmethod
+    def _key(row, key_fields):
+        """Clave de agrupación. Un método de pago vacío se guarda como ''."""
+        return tuple(
+            (row[field] or '') if field == 'payment_method' else row[field]
+            for field in key_fields
+        )
+
+    # ---------- Lectura ----------
+
+    @staticmethod
+    def _raw_sales_rows(orders, *keys):
+        return orders.values(*keys).annotate(
+            tickets=Count('id'),
+            revenue=Sum('final_amount'),
+            lowest_ticket=Min('final_amount'),
+            highest_ticket=Max('final_amount')
+        ).order_by()
+
+    @staticmethod
+    def _raw_cancelled_rows(orders, *keys):
+        return orders.values(*keys).annotate(
+            cancelled_tickets=Count('id'),
+            cancelled_amount=Sum('final_amount')
+        ).order_by()
+
+    @staticmethod
+    def _raw_hourly_rows(orders, *keys):
+        return orders.annotate(hour=ExtractHour('created_at')).values(*keys, 'hour').annotate(
+            tickets=Count('id'),
+            revenue=Sum('final_amount')
+        ).order_by()
+
+    @staticmethod
+    def _raw_product_rows(orders, *keys):
+        items = OrderItems.objects.filter(order__in=orders.values('pk'))
+        if 'date' in keys:
+            items = items.annotate(date=TruncDate('order__created_at'))
+        return items.values(*keys, 'product_id', 'product_name').annotate(
             units_sold=Sum('quantity'),
             revenue=Sum('amount')
-        )
+        ).order_by()
+
+    @staticmethod
+    def _split_period(start_date, end_date):
+        """
+        Separa el periodo en días cerrados (se leen de los rollups)
+        y el día en curso (se lee de las tablas crudas).
+        """
+        today = timezone.localtime(timezone.now()).date()
+        closed_end = min(end_date, today - timedelta(days=1))
+        live_start = max(start_date, today)
+
+        closed = (start_date, closed_end) if start_date <= closed_end else None
+        live = (live_start, end_date) if live_start <= end_date else None
+        return closed, live
+
+    @staticmethod
+    def _live_orders(live, status='PAID'):
+        return DateRangeService.filter_by_dates(Order.objects.filter(status=status), live[0], live[1])
+
+    @classmethod
+    def _merge(cls, rows, key_fields):
+        merged = {}
+        for row in rows:
+            cls._add(merged, cls._key(row, key_fields), {
+                field: value for field, value in row.items() if field not in key_fields
+            })
+        return [dict(zip(key_fields, key), **values) for key, values in merged.items()]
+
+    @classmethod
+    def get_sales_rows(cls, start_date, end_date):
+        """Totales por método de pago: tickets, ingresos, mínimos, máximos y cancelaciones."""
+        closed, live = cls._split_period(start_date, end_date)
+        rows = []
+        if closed:
+            rows += SalesDailyRollup.objects.filter(date__gte=closed[0], date__lte=closed[1]).values(
+                'payment_method'
+            ).annotate(
+                tickets=Sum('tickets'),
+                revenue=Sum('revenue'),
+                lowest_ticket=Min('lowest_ticket'),
+                highest_ticket=Max('highest_ticket'),
+                cancelled_tickets=Sum('cancelled_tickets'),
+                cancelled_amount=Sum('cancelled_amount')
+            ).order_by()
+        if live:
+            rows += cls._raw_sales_rows(cls._live_orders(live), 'payment_method')
+            rows += cls._raw_cancelled_rows(cls._live_orders(live, status='CANCELLED'), 'payment_method')
+        return cls._merge(rows, ('payment_method',))
+
+    @classmethod
+    def get_hourly_rows(cls, start_date, end_date):
+        closed, live = cls._split_period(start_date, end_date)
+        rows = []
+        if closed:
+            rows += SalesHourlyRollup.objects.filter(date__gte=closed[0], date__lte=closed[1]).values(
+                'hour'
+            ).annotate(tickets=Sum('tickets'), revenue=Sum('revenue')).order_by()
+        if live:
+            rows += cls._raw_hourly_rows(cls._live_orders(live))
+        return cls._merge(rows, ('hour',))
+
+    @classmethod
+    def get_product_rows(cls, start_date, end_date):
+        closed, live = cls._split_period(start_date, end_date)
+        rows = []
+        if closed:
+            rows += ProductDailyRollup.objects.filter(date__gte=closed[0], date__lte=closed[1]).values(
+                'product_id', 'product_name'
+            ).annotate(units_sold=Sum('units_sold'), revenue=Sum('revenue')).order_by()
+        if live:
+            rows += cls._raw_product_rows(cls._live_orders(live))
+        return cls._merge(rows, ('product_id', 'product_name'))
+
+class ProductAnalyticsService:
+
+    @staticmethod
+    def _calculate_product_stats(product_rows, limit=None, criterion=None):
+        """
+        Calcula estadísticas de productos a partir de filas agregadas
+        (product_id, product_name, units_sold, revenue).
+        """
+        base_rows = [
+            {
+                "product__id": row['product_id'],
+                "product_name": row['product_name'],
+                "units_sold": row['units_sold'],
+                "revenue": row['revenue']
+            }
+            for row in product_rows
+        ]
 
         if criterion is None:
-            products_stats = base_qs.order_by('-revenue')
+            products_stats = sorted(base_rows, key=lambda x: x['revenue'], reverse=True)
             
-            total_piezas = products_stats.aggregate(total=Sum('units_sold'))['total'] or 0
-            top_product = products_stats.first() if products_stats else None
+            total_piezas = sum(row['units_sold'] for row in products_stats)
+            top_product = products_stats[0] if products_stats else None
 
             return {
                 "total_units_sold": total_piezas,
                 "top_product": top_product,
-                "breakdown": list(products_stats)
+                "breakdown": products_stats
             }
         else:
-            sales_list = list(base_qs.order_by('units_sold'))
+            sales_list = sorted(base_rows, key=lambda x: x['units_sold'])
 
             if not sales_list:
                 return {"message": "No hubo productos vendidos en el período seleccionado."}
@@ -73,12 +396,9 @@ class ProductAnalyticsService:
         if error:
             return None, error
 
-        period_orders = base_orders.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        )
+        product_rows = SalesRollupService.get_product_rows(start_date, end_date)
 
-        data = cls._calculate_product_stats(period_orders, limit, criterion)
+        data = cls._calculate_product_stats(product_rows, limit, criterion)
 
         response_data = {
             "periodo_analizado": {
@@ -103,25 +423,31 @@ class SalesAnalyticsService:
         return Order.objects.filter(status=status)
 
     @staticmethod
-    def _calculate_general_totals(period_orders):
+    def _calculate_general_totals(sales_rows):
         """Calcula métricas generales como ingresos totales, ticket promedio, min y max."""
-        return period_orders.aggregate(
-            total_revenue=Sum('final_amount'),
-            average_ticket=Avg('final_amount'),
-            lowest_ticket=Min('final_amount'),
-            highest_ticket=Max('final_amount'),
-            total_tickets=Count('id')
-        )
+        total_tickets = sum(row.get('tickets') or 0 for row in sales_rows)
+        total_revenue = sum((row.get('revenue') or Decimal('0.00') for row in sales_rows), Decimal('0.00'))
+
+        return {
+            "total_revenue": total_revenue if total_tickets else None,
+            "average_ticket": total_revenue / total_tickets if total_tickets else None,
+            "lowest_ticket": min((row['lowest_ticket'] for row in sales_rows if row.get('lowest_ticket') is not None), default=None),
+            "highest_ticket": max((row['highest_ticket'] for row in sales_rows if row.get('highest_ticket') is not None), default=None),
+            "total_tickets": total_tickets,
+            "cancelled_tickets": sum(row.get('cancelled_tickets') or 0 for row in sales_rows),
+            "cancelled_amount": sum((row.get('cancelled_amount') or Decimal('0.00') for row in sales_rows), Decimal('0.00'))
+        }
 
     @staticmethod
-    def _calculate_hourly_stats(period_orders):
+    def _calculate_hourly_stats(hourly_rows):
         """Calculates which hour had the most revenue and most activity (tickets)."""
-        hourly_stats = period_orders.annotate(
-            hour=ExtractHour('created_at')
-        ).values('hour').annotate(
-            total_revenue=Sum('final_amount'),
-            ticket_count=Count('id')
-        ).order_by('hour')
+        hourly_stats = sorted(
+            (
+                {"hour": row['hour'], "total_revenue": row['revenue'], "ticket_count": row['tickets']}
+                for row in hourly_rows
+            ),
+            key=lambda x: x['hour']
+        )
 
         most_profitable = max(hourly_stats, key=lambda x: x['total_revenue'], default=None) if hourly_stats else None
         busiest = max(hourly_stats, key=lambda x: x['ticket_count'], default=None) if hourly_stats else None
@@ -129,25 +455,29 @@ class SalesAnalyticsService:
         return {
             "most_profitable_hour": most_profitable,
             "busiest_hour": busiest,
-            "hourly_breakdown": list(hourly_stats)
+            "hourly_breakdown": hourly_stats
         }
 
     @staticmethod
-    def _calculate_payment_stats(period_orders):
+    def _calculate_payment_stats(sales_rows):
         """Groups and sums sales by payment method."""
-        payment_stats = period_orders.values('payment_method').annotate(
-            total_sales=Count('id'),
-            average_ticket=Avg('final_amount'),
-            highest_ticket=Max('final_amount'),
-            accumulated_amount=Sum('final_amount')
-        )
-        return list(payment_stats)
+        return [
+            {
+                "payment_method": row['payment_method'] or None,
+                "total_sales": row['tickets'],
+                "average_ticket": row['revenue'] / row['tickets'],
+                "highest_ticket": row['highest_ticket'],
+                "accumulated_amount": row['revenue']
+            }
+            for row in sales_rows if row.get('tickets')
+        ]
 
     @classmethod
     def get_sales_summary(cls, start_date_str=None, end_date_str=None):
         """
         Orquestador principal. 
         Usa los submétodos para construir el informe final.
+        Los días cerrados se leen de los rollups y solo el día en curso de las tablas crudas.
         """
         base_orders = cls._get_orders_by_status(status='PAID')
 
@@ -162,10 +492,7 @@ class SalesAnalyticsService:
         if error:
             return error
 
-        period_orders = base_orders.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        )
+        sales_rows = SalesRollupService.get_sales_rows(start_date, end_date)
 
         # 4. Consolidar el informe llamando a los servicios independientes
         return {
@@ -173,10 +500,12 @@ class SalesAnalyticsService:
                 "start_date": start_date.strftime('%Y-%m-%d'),
                 "end_date": end_date.strftime('%Y-%m-%d')
             },
-            "general_summary": cls._calculate_general_totals(period_orders),
-            "products": ProductAnalyticsService._calculate_product_stats(period_orders),
-            "peak_hours": cls._calculate_hourly_stats(period_orders),
-            "payment_methods": cls._calculate_payment_stats(period_orders)
+            "general_summary": cls._calculate_general_totals(sales_rows),
+            "products": ProductAnalyticsService._calculate_product_stats(
+                SalesRollupService.get_product_rows(start_date, end_date)
+            ),
+            "peak_hours": cls._calculate_hourly_stats(SalesRollupService.get_hourly_rows(start_date, end_date)),
+            "payment_methods": cls._calculate_payment_stats(sales_rows)
         }
 
     @staticmethod
@@ -185,31 +514,30 @@ class SalesAnalyticsService:
             return None, {"error": "Product identifier is required."}, 400
 
         # ! Validación del Producto
-        try:
-            product = Product.objects.get(Q(sku=product_identifier) | Q(name__iexact=product_identifier))
-        except Product.DoesNotExist:
-            return None, {"error": "Product not found."}, 404
-        except Product.MultipleObjectsReturned:
-            product = Product.objects.filter(Q(sku=product_identifier) | Q(name__iexact=product_identifier)).first()
+        product, error, status_code = ProductLookupService.resolve(product_identifier)
+        if error:
+            return None, error, status_code
 
         # ! Definición del Período
         if not start_date or not end_date:
             end_date_parsed = timezone.now()
             start_date_parsed = end_date_parsed - timedelta(days=30)
+            report_period = (start_date_parsed, end_date_parsed)
         else:
             start_parsed = parse_date(start_date)
             end_parsed = parse_date(end_date)
             
             if not start_parsed or not end_parsed:
                 return None, {"error": "Invalid date format. Use YYYY-MM-DD."}, 400
-            # Convertimos a datetime con timezone aware (inicio del día y fin del día)
-            start_date_parsed = timezone.make_aware(datetime.combine(start_parsed, datetime.min.time()))
-            end_date_parsed = timezone.make_aware(datetime.combine(end_parsed, datetime.max.time()))
+            # Convertimos a datetime con timezone aware: [inicio del día, inicio del día siguiente)
+            start_date_parsed, end_date_parsed = DateRangeService.get_bounds(start_parsed, end_parsed)
+            report_period = (start_parsed, end_parsed)
 
         # ! Cálculo de Ventas Totales (General)
         orders_in_period = Order.objects.filter(
             status='PAID', 
-            created_at__range=(start_date_parsed, end_date_parsed)
+            created_at__gte=start_date_parsed,
+            created_at__lt=end_date_parsed
         )
 
         total_general_sales = orders_in_period.aggregate(
@@ -237,8 +565,8 @@ class SalesAnalyticsService:
                 "name": product.name
             },
             "period": {
-                "start_date": start_date_parsed.strftime('%Y-%m-%d'),
-                "end_date": end_date_parsed.strftime('%Y-%m-%d')
+                "start_date": report_period[0].strftime('%Y-%m-%d'),
+                "end_date": report_period[1].strftime('%Y-%m-%d')
             },
             "contribution_metrics": {
                 "contribution_percentage": round(contribution_percentage, 2),
@@ -281,12 +609,9 @@ class DateValidationService:
             except ValueError:
                 return None, None, {"error": "Formato de fecha inválido. Usa YYYY-MM-DD."}
             
-            range_filter = {
-                f"{date_field}__date__gte": start_date,
-                f"{date_field}__date__lte": end_date
-            }
+            period_queryset = DateRangeService.filter_by_dates(queryset, start_date, end_date, date_field)
             
-            if not queryset.filter(**range_filter).exists():
+            if not period_queryset.exists():
                 return None, None, {
                     "error": f"No se encontraron {entity_name} entre el {start_date_str} y el {end_date_str}.",
                     "first_system_record": system_first_date.strftime('%Y-%m-%d'),
@@ -363,9 +688,10 @@ class InventoryService:
         else:
             reference_date = timezone.now().date() - timedelta(days=30)
 
-        sold_product_ids = OrderItems.objects.filter(
-            order__created_at__date__gte=reference_date,
-            order__status='PAID'
+        sold_product_ids = DateRangeService.filter_by_dates(
+            OrderItems.objects.filter(order__status='PAID'),
+            reference_date,
+            date_field='order__created_at'
         ).values_list('product_id', flat=True).distinct()
 
         dead_inventory_qs = Product.objects.exclude(id__in=sold_product_ids)
@@ -389,12 +715,11 @@ class InventoryService:
         if not identifier:
             return None, {"error": "Product identifier (Name or SKU) is required."}, 400
 
-        try:
-            product = Product.objects.get(Q(sku=identifier) | Q(name__iexact=identifier))
-        except Product.DoesNotExist:
-            return None, {"error": "Product not found in the system."}, 404
-        except Product.MultipleObjectsReturned:
-            product = Product.objects.filter(Q(sku=identifier) | Q(name__iexact=identifier)).first()
+        product, error, status_code = ProductLookupService.resolve(
+            identifier, not_found_error="Product not found in the system."
+        )
+        if error:
+            return None, error, status_code
 
         now = timezone.now()
         
@@ -457,7 +782,10 @@ class InventoryService:
         
         # Filtrado por producto específico si se envía
         if product_identifier:
-            queryset = queryset.filter(Q(sku=product_identifier) | Q(name__iexact=product_identifier))
+            product, error, status_code = ProductLookupService.resolve(product_identifier, queryset=queryset)
+            if status_code == 400:
+                return None, error, status_code
+            queryset = queryset.filter(pk=product.pk) if product else queryset.none()
             scope_name = f"Specific Product: {product_identifier}"
 
         if not queryset.exists():
@@ -504,7 +832,10 @@ class InventoryService:
         scope_name = "Entire Inventory"
         
         if product_identifier:
-            queryset = queryset.filter(Q(sku=product_identifier) | Q(name__iexact=product_identifier))
+            product, error, status_code = ProductLookupService.resolve(product_identifier, queryset=queryset)
+            if status_code == 400:
+                return None, error, status_code
+            queryset = queryset.filter(pk=product.pk) if product else queryset.none()
             scope_name = f"Specific Product: {product_identifier}"
 
         if not queryset.exists():
@@ -570,10 +901,7 @@ class CustomerAnalyticsService:
         if error:
             return None, error, 400
 
-        period_orders = customer_orders.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        )
+        period_orders = DateRangeService.filter_by_dates(customer_orders, start_date, end_date)
         base_response = {
             "customer_info": {
                 "id": customer.id,
@@ -595,8 +923,12 @@ class CustomerAnalyticsService:
         sales_metrics = cls._calculate_customer_totals(period_orders)
         top_product = cls._get_customer_top_product(period_orders)
         
-        peak_hours = SalesAnalyticsService._calculate_hourly_stats(period_orders)['hourly_breakdown']
-        payment_methods = SalesAnalyticsService._calculate_payment_stats(period_orders)
+        peak_hours = SalesAnalyticsService._calculate_hourly_stats(
+            SalesRollupService._raw_hourly_rows(period_orders)
+        )['hourly_breakdown']
+        payment_methods = SalesAnalyticsService._calculate_payment_stats(
+            SalesRollupService._raw_sales_rows(period_orders, 'payment_method')
+        )
 
         base_response.update({
             "sales_metrics": sales_metrics,
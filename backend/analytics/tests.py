@@ -3,14 +3,19 @@ from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.core.management import call_command
+from django.db import connection
 from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
 
 from users.models import User
 from customers.models import Customer
 from products.models import Product
 from orders.models import Order, OrderItems
 from suppliers.models import Supplier
+from .models import SalesDailyRollup, SalesHourlyRollup, ProductDailyRollup
+from .services import DateRangeService
 
 User = get_user_model()
 
@@ -118,6 +123,31 @@ class AnalyticsIntegrationTests(BaseAnalyticsTest):
         res_name = self.client.get(url, {'identifier': 'buscame'})
         self.assertEqual(res_name.status_code, status.HTTP_200_OK)
 
+        # Con error de dedo se resuelve al producto más parecido
+        res_typo = self.client.get(url, {'identifier': 'buscane'})
+        self.assertEqual(res_typo.status_code, status.HTTP_200_OK)
+        self.assertEqual(res_typo.data['product_sku'], "FINDME")
+
+        res_missing = self.client.get(url, {'identifier': 'zzzz'})
+        self.assertEqual(res_missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ambiguous_identifier_is_not_resolved_to_top_match(self):
+        """Un nombre parcial que coincide con varios productos no elige uno al azar."""
+        Product.objects.create(name="Laptop Gamer", sku="LAP-G", price=10, current_stock=5, supplier=self.supplier)
+        Product.objects.create(name="Laptop Oficina", sku="LAP-O", price=10, current_stock=5, supplier=self.supplier)
+
+        velocity = self.client.get(reverse('analytics-sales-velocity'), {'identifier': 'laptop'})
+        self.assertEqual(velocity.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual({c['sku'] for c in velocity.data['candidates']}, {"LAP-G", "LAP-O"})
+
+        valuation = self.client.get(reverse('analytics-inventory-valuation'), {'product_identifier': 'laptop'})
+        self.assertEqual(valuation.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # El nombre exacto gana aunque también coincida difusamente con el otro producto
+        exact = self.client.get(reverse('analytics-sales-velocity'), {'identifier': 'laptop gamer'})
+        self.assertEqual(exact.status_code, status.HTTP_200_OK)
+        self.assertEqual(exact.data['product_sku'], "LAP-G")
+
     def test_customer_sales_lookup(self):
         """Verifica la relación Cliente -> Ventas a través del endpoint."""
         order = Order.objects.create(customer=self.customer, status='PAID', final_amount=100)
@@ -323,4 +353,129 @@ class AnalyticsAcceptanceTests(BaseAnalyticsTest):
         
         # El contrato dice que solo debe venir name y current_stock
         self.assertIn('name', item)
-        self.assertIn('current_stock', item)
\ No newline at end of file
+        self.assertIn('current_stock', item)
+
+class AnalyticsRollupTests(BaseAnalyticsTest):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.admin)
+        self.product = Product.objects.create(name="Rollup", sku="R1", price=Decimal('50.00'), current_stock=10, supplier=self.supplier)
+
+    def _create_paid_order(self, created_at, amount=Decimal('100.00'), quantity=2):
+        order = Order.objects.create(customer=self.customer, seller=self.admin, status='PAID', payment_method='CASH', final_amount=amount)
+        OrderItems.objects.create(order=order, product=self.product, product_name="Rollup", quantity=quantity, unit_price=50, amount=amount)
+        Order.objects.filter(id=order.id).update(created_at=created_at)
+        return order
+
+    def test_payment_updates_rollups(self):
+        """Pagar una orden suma el ticket a los rollups del día, de la hora y del producto."""
+        order = Order.objects.create(customer=self.customer, seller=self.admin, status='PENDING', final_amount=Decimal('100.00'))
+        OrderItems.objects.create(order=order, product=self.product, product_name="Rollup", quantity=2, unit_price=50, amount=100)
+
+        response = self.client.post(reverse('order-pay', kwargs={'pk': order.id}), {"payment_method": "CARD"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        created = timezone.localtime(Order.objects.get(id=order.id).created_at)
+        daily = SalesDailyRollup.objects.get(date=created.date(), payment_method='CARD')
+        self.assertEqual(daily.tickets, 1)
+        self.assertEqual(daily.revenue, Decimal('100.00'))
+        self.assertEqual(daily.highest_ticket, Decimal('100.00'))
+        self.assertEqual(SalesHourlyRollup.objects.get(date=created.date(), hour=created.hour).tickets, 1)
+        self.assertEqual(ProductDailyRollup.objects.get(date=created.date(), product=self.product).units_sold, 2)
+
+    def test_closed_days_are_read_from_rollups(self):
+        """Los días cerrados salen de los rollups reconstruidos, no de ORDERS."""
+        past = self.today - timedelta(days=3)
+        order = self._create_paid_order(past)
+
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+
+        # Si el reporte leyera ORDERS vería este monto alterado
+        Order.objects.filter(id=order.id).update(final_amount=Decimal('999.00'))
+
+        params = {'start_date': str(past.date()), 'end_date': str(past.date())}
+        summary = self.client.get(reverse('analytics-sales-summary'), params).data
+        self.assertEqual(summary['general_summary']['total_revenue'], Decimal('100.00'))
+        self.assertEqual(summary['general_summary']['total_tickets'], 1)
+        self.assertEqual(summary['products']['total_units_sold'], 2)
+        self.assertEqual(summary['peak_hours']['hourly_breakdown'][0]['hour'], past.hour)
+
+        ranking = self.client.get(reverse('analytics-product-ranking'), params).data
+        self.assertEqual(ranking['results']['most_sold'][0]['product_name'], "Rollup")
+
+    def test_rebuild_is_idempotent(self):
+        past = self.today - timedelta(days=2)
+        self._create_paid_order(past)
+        self._create_paid_order(past, amount=Decimal('40.00'), quantity=1)
+
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+
+        daily = SalesDailyRollup.objects.get(date=past.date())
+        self.assertEqual(daily.tickets, 2)
+        self.assertEqual(daily.lowest_ticket, Decimal('40.00'))
+        self.assertEqual(ProductDailyRollup.objects.get(date=past.date()).units_sold, 3)
+
+    def test_migration_backfill_matches_rebuild(self):
+        """La migración 0002 llena los rollups con el historial previo igual que rebuild_sales_rollups."""
+        from importlib import import_module
+        from django.apps import apps
+
+        past = self.today - timedelta(days=4)
+        self._create_paid_order(past)
+        self._create_paid_order(past, amount=Decimal('30.00'), quantity=1)
+        cancelled = self._create_paid_order(past - timedelta(days=1))
+        Order.objects.filter(id=cancelled.id).update(status='CANCELLED')
+
+        def snapshot():
+            return (
+                sorted(SalesDailyRollup.objects.values_list(
+                    'date', 'seller', 'payment_method', 'tickets', 'revenue', 'lowest_ticket', 'highest_ticket',
+                    'cancelled_tickets', 'cancelled_amount'
+                )),
+                sorted(SalesHourlyRollup.objects.values_list('date', 'hour', 'tickets', 'revenue')),
+                sorted(ProductDailyRollup.objects.values_list('date', 'product', 'product_name', 'units_sold', 'revenue')),
+            )
+
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        expected = snapshot()
+
+        import_module('analytics.migrations.0002_rollup_keys_and_backfill').backfill_rollups(apps, None)
+        self.assertEqual(snapshot(), expected)
+        self.assertEqual(len(expected[0]), 2)
+
+    def test_cancellation_updates_daily_counter(self):
+        order = Order.objects.create(customer=self.customer, seller=self.admin, status='PENDING', final_amount=Decimal('30.00'))
+        OrderItems.objects.create(order=order, product=self.product, product_name="Rollup", quantity=1, unit_price=30, amount=30)
+
+        self.client.post(reverse('order-cancel', kwargs={'pk': order.id}))
+
+        daily = SalesDailyRollup.objects.get(date=timezone.localtime(order.created_at).date())
+        self.assertEqual(daily.cancelled_tickets, 1)
+        self.assertEqual(daily.cancelled_amount, Decimal('30.00'))
+        self.assertEqual(daily.tickets, 0)
+
+
+class AnalyticsQueryPlanTests(BaseAnalyticsTest):
+
+    def test_date_bounds_are_half_open_local_days(self):
+        start, end = DateRangeService.get_bounds(self.today.date(), self.today.date())
+        self.assertEqual(timezone.localtime(start).date(), self.today.date())
+        self.assertEqual(timezone.localtime(start).hour, 0)
+        self.assertEqual(end - start, timedelta(days=1))
+
+    def test_date_range_filter_uses_status_created_index(self):
+        """Regresión: el filtro por rango debe resolverse con el índice (status, created_at)."""
+        Order.objects.create(customer=self.customer, status='PAID', final_amount=10)
+        queryset = DateRangeService.filter_by_dates(
+            Order.objects.filter(status='PAID'), self.today.date(), self.today.date()
+        )
+
+        if connection.vendor == 'postgresql':
+            # Con tablas pequeñas el planner prefiere un seq scan, se desactiva solo en esta transacción
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+        self.assertIn('orders_status_created_idx', queryset.explain())
+        self.assertEqual(queryset.count(), 1)
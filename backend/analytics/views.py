@@ -107,7 +107,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         """
         Calcula la velocidad de venta de un producto y estima en cuántos días se agotará.
         Params: 
-        - identifier (obligatorio): Nombre exacto o Código de Barras (SKU)
+        - identifier (obligatorio): Código de Barras (SKU) o nombre (acepta nombres parciales y errores de dedo si solo un producto coincide)
         - period_days (opcional): Número de días a analizar (default: 30)
         """
         identifier = request.query_params.get('identifier')
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -171,3 +172,10 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
+
+# --- Configuración de Checkout ---
+# True: descuento de stock optimista (UPDATE condicional, sin select_for_update)
+OPTIMISTIC_STOCK_DECREMENT = os.getenv('OPTIMISTIC_STOCK_DECREMENT', 'False') == 'True'
+# Minutos que una orden PENDING retiene su stock antes de que release_expired_holds la cancele.
+# Sin valor (por omisión) las órdenes PENDING no vencen: el barrido solo libera apartados de productos.
+ORDER_HOLD_MINUTES = int(os.getenv('ORDER_HOLD_MINUTES')) if os.getenv('ORDER_HOLD_MINUTES') else None
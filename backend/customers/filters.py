@@ -0,0 +1,24 @@
+import django_filters
+from django.db.models import Q
+
+from .models import Customer
+
+
+class CustomerFilter(django_filters.FilterSet):
+    """
+    Búsqueda para el selector de clientes del punto de venta:
+    `search` coincide con el teléfono exacto (unique) o con el inicio del nombre o del apellido.
+    """
+    search = django_filters.CharFilter(method='filter_search')
+
+    class Meta:
+        model = Customer
+        fields = ['phone_number', 'is_frequent']
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return queryset.filter(
+            Q(phone_number=value) | Q(first_name__istartswith=value) | Q(last_name__istartswith=value)
+        )
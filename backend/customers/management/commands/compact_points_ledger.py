@@ -0,0 +1,53 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from customers.models import PointsBalanceCheckpoint
+
+
+class Command(BaseCommand):
+    help = 'Crea checkpoints de saldo de puntos por cliente y archiva movimientos viejos (Ideal para Cron Jobs diarios)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--as-of',
+            help='Fecha y hora ISO del checkpoint (default: inicio del día de hoy)'
+        )
+        parser.add_argument(
+            '--archive-before',
+            help='Mueve a POINTS_TRANSACTIONS_ARCHIVE los movimientos hasta esta fecha y hora ISO'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Clientes o movimientos por lote (default: 1000)')
+
+    def handle(self, *args, **options):
+        as_of = self._parse(options['as_of'], '--as-of')
+        archive_before = self._parse(options['archive_before'], '--archive-before')
+
+        self.stdout.write("Compactando ledger de puntos...")
+        start = time.perf_counter()
+
+        created = PointsBalanceCheckpoint.compact(as_of=as_of, chunk_size=options['chunk_size'])
+        summary = f'Checkpoints creados: {created}'
+
+        if archive_before is not None:
+            try:
+                archived = PointsBalanceCheckpoint.archive(archive_before, chunk_size=options['chunk_size'])
+            except ValidationError as e:
+                raise CommandError(e.messages[0])
+            summary += f', movimientos archivados: {archived}'
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Proceso terminado en {elapsed:.2f}s. {summary}'))
+
+    def _parse(self, value, option):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"{option} debe ser una fecha y hora ISO, p.ej. 2025-01-31T00:00:00")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
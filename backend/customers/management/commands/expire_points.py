@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from customers.models import PointsTransaction
+
+
+class Command(BaseCommand):
+    help = 'Vence los puntos ganados hace más de POINTS_EXPIRATION_DAYS que no se han usado (Ideal para Cron Jobs diarios)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--now',
+            help='Fecha y hora ISO de referencia para calcular el corte (default: ahora)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Clientes por lote (default: 1000)')
+
+    def handle(self, *args, **options):
+        now = None
+        if options['now']:
+            now = parse_datetime(options['now'])
+            if now is None:
+                raise CommandError("--now debe ser una fecha y hora ISO, p.ej. 2025-01-31T00:00:00")
+            if timezone.is_naive(now):
+                now = timezone.make_aware(now)
+
+        self.stdout.write("Venciendo puntos no utilizados...")
+        start = time.perf_counter()
+
+        stats = PointsTransaction.expire(now=now, chunk_size=options['chunk_size'])
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Proceso terminado en {elapsed:.2f}s. Clientes: {stats["customers"]}, puntos vencidos: {stats["points"]}'
+        ))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from customers.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el estatus de cliente frecuente con base en el mes anterior (Ideal para Cron Jobs mensuales)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Fecha ISO de la revisión; se evalúa el mes anterior a esta fecha (default: hoy)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Clientes por lote (default: 1000)')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError("--date debe ser una fecha ISO, p.ej. 2025-02-01")
+
+        self.stdout.write("Recalculando estatus de clientes frecuentes...")
+        start = time.perf_counter()
+
+        stats = Customer.bulk_update_frequent_status(today=today, chunk_size=options['chunk_size'])
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Proceso terminado en {elapsed:.2f}s. Frecuentes: {stats["frequent"]}, no frecuentes: {stats["regular"]}'
+        ))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from customers.models import PointsBalanceCheckpoint
+
+
+class Command(BaseCommand):
+    help = 'Verifica current_points de cada cliente contra el ledger de puntos, por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Clientes por lote (default: 1000)')
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Reescribe current_points con el saldo del ledger en los clientes que no cuadran'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Verificando saldos de puntos contra el ledger...")
+        start = time.perf_counter()
+
+        drift = list(PointsBalanceCheckpoint.find_drift(chunk_size=options['chunk_size']))
+
+        for pk, current_points, ledger in drift:
+            self.stdout.write(self.style.WARNING(f"Cliente {pk}: current_points {current_points} vs ledger {ledger}"))
+
+        if drift and options['rebuild']:
+            chunk_size = options['chunk_size']
+            customer_ids = [pk for pk, _, _ in drift]
+            rebuilt = 0
+            for offset in range(0, len(customer_ids), chunk_size):
+                rebuilt += PointsBalanceCheckpoint.rebuild(customer_ids[offset:offset + chunk_size])
+            self.stdout.write(f"Saldos reconstruidos: {rebuilt}")
+
+        elapsed = time.perf_counter() - start
+        style = self.style.SUCCESS if not drift or options['rebuild'] else self.style.ERROR
+        self.stdout.write(style(f'Proceso terminado en {elapsed:.2f}s. Clientes con diferencias: {len(drift)}'))
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_credit_limit_customer_credit_used_and_more'),
+        ('orders', '0009_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='credittransaction',
+            index=models.Index(fields=['customer', 'created_at'], name='credit_transaction_idx'),
+        ),
+    ]
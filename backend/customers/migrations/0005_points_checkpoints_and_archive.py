@@ -0,0 +1,56 @@
+# Generated by Django 6.1.2 on 2026-10-17 03:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0004_credit_transaction_index'),
+        ('orders', '0009_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPointsTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('customer_id', models.BigIntegerField()),
+                ('amount', models.IntegerField()),
+                ('transaction_type', models.CharField(choices=[('EARN', 'Ganancia por compra'), ('REDEEM', 'Canjeo de puntos'), ('ADJUSTMENT', 'Ajuste manual'), ('EXPIRED', 'Expiración de puntos')], max_length=20)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('order_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'POINTS_TRANSACTIONS_ARCHIVE',
+            },
+        ),
+        migrations.CreateModel(
+            name='PointsBalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('balance', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'POINTS_CHECKPOINTS',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pointstransaction',
+            index=models.Index(fields=['customer', 'created_at'], name='points_transaction_idx'),
+        ),
+        migrations.AddField(
+            model_name='pointsbalancecheckpoint',
+            name='customer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_checkpoints', to='customers.customer'),
+        ),
+        migrations.AddConstraint(
+            model_name='pointsbalancecheckpoint',
+            constraint=models.UniqueConstraint(fields=('customer', 'as_of'), name='points_checkpoint_unique'),
+        ),
+    ]
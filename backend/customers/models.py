@@ -1,11 +1,12 @@
+from django.conf import settings
 from django.db import models, transaction
 from django.urls import reverse
-from django.db.models.functions import ExtractWeek
+from django.db.models.functions import Coalesce, ExtractWeek
 from django.utils import timezone
 from decimal import Decimal
 from django.core.exceptions import ValidationError
-from datetime import timedelta
-from django.db.models import F
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db.models import Case, Count, F, Max, OuterRef, Subquery, Sum, Value, When
 
 class Customer(models.Model):
     first_name = models.CharField(max_length=60)
@@ -91,6 +92,7 @@ class Customer(models.Model):
     def update_frequent_status(self):
         """
         Método público principal: Orquesta la validación del estatus de cliente frecuente.
+        Revisa a un solo cliente; el recálculo mensual de todos lo hace bulk_update_frequent_status.
         """
         today = timezone.now().date()
 
@@ -100,14 +102,62 @@ class Customer(models.Model):
         start_date, end_date = self._get_previous_month_range(today)
 
         total_weeks_in_month = self._get_iso_weeks_in_range(start_date, end_date)
-        weeks_with_purchases = self._get_purchased_weeks(start_date, end_date)
+        weeks_with_purchases = self._purchased_weeks_by_customer(start_date, end_date).filter(customer=self.pk)
+        weeks = next((count for _, count in weeks_with_purchases), 0)
 
-        is_eligible = len(weeks_with_purchases) >= len(total_weeks_in_month)
+        is_eligible = weeks >= len(total_weeks_in_month)
 
         self._save_new_status(is_eligible, today)
 
         return self.is_frequent
 
+    @classmethod
+    def bulk_update_frequent_status(cls, today=None, chunk_size=1000):
+        """
+        Recalcula is_frequent de todos los clientes con base en el mes anterior (comando update_frequent_customers).
+
+        Las semanas ISO distintas con compra se cuentan con una sola consulta agrupada por cliente;
+        después se actualizan los clientes por lotes de pk con dos UPDATE por lote (frecuentes y no frecuentes).
+        Es idempotente: correrlo dos veces el mismo mes deja el mismo resultado.
+        Retorna {"frequent": n, "regular": m}.
+        """
+        today = today or timezone.now().date()
+        start_date, end_date = cls._get_previous_month_range(today)
+        required_weeks = len(cls._get_iso_weeks_in_range(start_date, end_date))
+
+        eligible = {
+            customer_id
+            for customer_id, weeks in cls._purchased_weeks_by_customer(start_date, end_date)
+            if weeks >= required_weeks
+        }
+
+        stats = {"frequent": 0, "regular": 0}
+        last_pk = 0
+        while True:
+            chunk = list(
+                cls.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+
+            frequent = [pk for pk in chunk if pk in eligible]
+            regular = [pk for pk in chunk if pk not in eligible]
+
+            with transaction.atomic():
+                if frequent:
+                    cls.objects.filter(pk__in=frequent).update(is_frequent=True, last_status_check=today)
+                if regular:
+                    cls.objects.filter(pk__in=regular).update(is_frequent=False, last_status_check=today)
+
+            stats["frequent"] += len(frequent)
+            stats["regular"] += len(regular)
+
+            if len(chunk) < chunk_size:
+                break
+
+        return stats
+
     def _status_already_checked(self, today):
         """Verifica si la revisión ya se hizo en el mes y año actual."""
         if not self.last_status_check:
@@ -116,14 +166,16 @@ class Customer(models.Model):
         return (self.last_status_check.month == today.month and 
                 self.last_status_check.year == today.year)
 
-    def _get_previous_month_range(self, today):
+    @staticmethod
+    def _get_previous_month_range(today):
         """Retorna tupla (fecha_inicio, fecha_fin) del mes anterior."""
         first_day_current = today.replace(day=1)
         last_day_prev = first_day_current - timedelta(days=1)
         first_day_prev = last_day_prev.replace(day=1)
         return first_day_prev, last_day_prev
 
-    def _get_iso_weeks_in_range(self, start_date, end_date):
+    @staticmethod
+    def _get_iso_weeks_in_range(start_date, end_date):
         """Devuelve un set con los números de semana ISO contenidos en el rango."""
         weeks = set()
         current = start_date
@@ -132,18 +184,26 @@ class Customer(models.Model):
             current += timedelta(days=1)
         return weeks
 
-    def _get_purchased_weeks(self, start_date, end_date):
-        """Devuelve un set de semanas donde hubo órdenes pagadas."""
-        order_dates = (
-            self.orders.filter(
-                created_at__date__gte=start_date,
-                created_at__date__lte=end_date,
-                status='PAID'
+    @staticmethod
+    def _purchased_weeks_by_customer(start_date, end_date):
+        """
+        Queryset de (customer_id, semanas ISO distintas con órdenes pagadas) en el rango de fechas:
+        un COUNT(DISTINCT EXTRACT(week)) agrupado por cliente, sin traer los timestamps a Python.
+        """
+        from orders.models import Order
+
+        start = timezone.make_aware(datetime.combine(start_date, time.min))
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+
+        return (
+            Order.objects.filter(
+                status='PAID', customer__isnull=False, created_at__gte=start, created_at__lt=end
             )
-            .values_list('created_at', flat=True)
+            .values('customer')
+            .annotate(weeks=Count(ExtractWeek('created_at'), distinct=True))
+            .values_list('customer', 'weeks')
+            .order_by()
         )
-        # Convertimos cada timestamp a su número de semana
-        return {dt.isocalendar()[1] for dt in order_dates}
 
     def _save_new_status(self, is_eligible, check_date):
         """Actualiza el estado solo si cambió o si necesitamos actualizar la fecha de revisión."""
@@ -152,36 +212,70 @@ class Customer(models.Model):
             self.last_status_check = check_date
             self.save(update_fields=['is_frequent', 'last_status_check'])
 
+    # Métodos de pago que generan puntos y tasa de acumulación (1 punto por cada 100 pesos)
+    POINTS_EARNING_METHODS = ('CASH', 'CARD')
+    POINTS_EARN_RATE = Decimal('0.01')
+
     def accrue_points_from_order(self, order, payment_method, total_amount):
         """
         Calcula y asigna puntos basados en una compra.
-        Valida el método de pago y actualiza el estatus.
+        Valida el método de pago; el estatus de frecuente lo recalcula el comando mensual update_frequent_customers.
         """
-        VALID_PAYMENT_METHODS = ['CASH', 'CARD']
-        
-        if payment_method not in VALID_PAYMENT_METHODS:
+        if payment_method not in self.POINTS_EARNING_METHODS:
             return
 
+        points_earned = round(Decimal(total_amount) * self.POINTS_EARN_RATE)
 
-        points_earned = round(Decimal(total_amount) * Decimal(0.01))
+        if points_earned > 0:
+            self.apply_points(
+                points_earned, 'EARN', description=f"Puntos compra {order.ticket_folio}", order=order
+            )
 
-        if points_earned > 0: 
+    def apply_points(self, amount, transaction_type, description='', order=None):
+        """
+        Motor de puntos: registra el movimiento en el ledger y aplica el delta al saldo.
+        Son dos consultas: el INSERT del movimiento y un UPDATE ... RETURNING current_points
+        que solo escribe esa columna (save() con una expresión F refresca el valor con RETURNING).
+        Retorna el nuevo saldo.
+        """
+        # savepoint=False: dentro del pago no agrega SAVEPOINT/RELEASE; un error revierte la transacción externa
+        with transaction.atomic(savepoint=False):
+            PointsTransaction.objects.create(
+                customer=self,
+                amount=amount,
+                transaction_type=transaction_type,
+                description=description,
+                order=order,
+            )
+            self.current_points = F('current_points') + amount
+            self.save(update_fields=['current_points'])
 
-            with transaction.atomic():
-                PointsTransaction.objects.create(
-                    customer=self,
-                    amount=points_earned,
-                    transaction_type='EARN',
-                    order=order,
-                    description=f"Puntos compra {order.ticket_folio}"
-                )
+        return self.current_points
 
-                self.current_points = F('current_points') + points_earned
-                self.save()
-                
-                self.refresh_from_db()
+    @classmethod
+    def apply_points_bulk(cls, movements):
+        """
+        Versión por lotes de apply_points: movements es una lista de PointsTransaction sin guardar.
+        Inserta el ledger con un solo bulk_create y aplica los deltas con un UPDATE (CASE por cliente).
+        Retorna {customer_id: delta aplicado}.
+        """
+        deltas = {}
+        for movement in movements:
+            deltas[movement.customer_id] = deltas.get(movement.customer_id, 0) + movement.amount
+        deltas = {customer_id: delta for customer_id, delta in deltas.items() if delta}
+
+        with transaction.atomic(savepoint=False):
+            PointsTransaction.objects.bulk_create(movements)
+            if deltas:
+                cls.objects.filter(pk__in=list(deltas)).update(
+                    current_points=F('current_points') + Case(
+                        *[When(pk=customer_id, then=Value(delta)) for customer_id, delta in deltas.items()],
+                        default=Value(0),
+                        output_field=models.IntegerField(),
+                    )
+                )
 
-                self.update_frequent_status()
+        return deltas
     
     class Meta:
         db_table = 'CUSTOMERS'
@@ -209,9 +303,287 @@ class PointsTransaction(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Historial por cliente, saldos desde el último checkpoint y archivado por fecha
+            models.Index(fields=['customer', 'created_at'], name='points_transaction_idx'),
+        ]
+
     def __str__(self):
         return f"{self.customer} - {self.amount} ({self.transaction_type})"
 
+    @staticmethod
+    def expiration_period():
+        """Vigencia de los puntos: lo ganado antes de now - POINTS_EXPIRATION_DAYS y no consumido vence."""
+        return timedelta(days=getattr(settings, 'POINTS_EXPIRATION_DAYS', 365))
+
+    @classmethod
+    def expirable_points(cls, customer_ids, cutoff):
+        """
+        Puntos por vencer de cada cliente con semántica FIFO: los cargos (canjes, ajustes negativos
+        y expiraciones previas) consumen primero los puntos más antiguos. Lo que queda sin consumir
+        de lo ganado hasta cutoff es saldo_a_cutoff - cargos_después_de_cutoff.
+        Dos consultas: balances() al corte (checkpoint + ledger) y una suma agrupada de cargos posteriores.
+        Ambas leen solo el ledger vivo: es correcto porque archive() nunca mueve movimientos
+        posteriores a now - POINTS_EXPIRATION_DAYS (el corte siempre cae después del último archivado).
+        Retorna {customer_id: puntos > 0}.
+        """
+        balances = PointsBalanceCheckpoint.balances(customer_ids, as_of=cutoff)
+        debits_after = dict(
+            cls.objects.filter(customer__in=list(customer_ids), created_at__gt=cutoff, amount__lt=0)
+            .values('customer')
+            .annotate(total=Sum('amount'))
+            .values_list('customer', 'total')
+            .order_by()
+        )
+
+        expirable = {}
+        for customer_id, balance in balances.items():
+            remaining = balance + debits_after.get(customer_id, 0)
+            if remaining > 0:
+                expirable[customer_id] = remaining
+        return expirable
+
+    @classmethod
+    def expire(cls, now=None, chunk_size=1000):
+        """
+        Vence por lotes los puntos ganados antes de now - POINTS_EXPIRATION_DAYS que no se han usado.
+        Por lote: bloquea a los clientes con saldo, calcula lo vencible, inserta los EXPIRED con un
+        bulk_create y descuenta los saldos con un UPDATE (Customer.apply_points_bulk).
+        Cada lote va en su propia transacción. Es reanudable e idempotente: las expiraciones ya
+        registradas cuentan como cargos, así que volver a correr (o continuar tras una falla) no vence dos veces.
+        Retorna {"customers": n, "points": m}.
+        """
+        now = now or timezone.now()
+        cutoff = now - cls.expiration_period()
+        description = f"Puntos vencidos al {timezone.localtime(cutoff):%Y-%m-%d}"
+        stats = {"customers": 0, "points": 0}
+
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                chunk = list(
+                    Customer.objects.select_for_update()
+                    .filter(pk__gt=last_pk, current_points__gt=0)
+                    .order_by('pk')
+                    .values_list('pk', 'current_points')[:chunk_size]
+                )
+                if not chunk:
+                    break
+                last_pk = chunk[-1][0]
+
+                expirable = cls.expirable_points([pk for pk, _ in chunk], cutoff)
+                # Nunca se vence más que el saldo actual (por si current_points difiere del ledger)
+                movements = [
+                    cls(
+                        customer_id=pk, amount=-min(expirable[pk], current_points),
+                        transaction_type='EXPIRED', description=description,
+                    )
+                    for pk, current_points in chunk if pk in expirable
+                ]
+                Customer.apply_points_bulk(movements)
+
+            stats["customers"] += len(movements)
+            stats["points"] -= sum(movement.amount for movement in movements)
+
+            if len(chunk) < chunk_size:
+                break
+
+        return stats
+
+class PointsBalanceCheckpoint(models.Model):
+    """
+    Saldo de puntos compactado de un cliente a una fecha: acumula todos los movimientos hasta as_of.
+    Lo genera periódicamente el comando compact_points_ledger. Con checkpoints el saldo de un cliente
+    se obtiene sin recorrer su historial completo, y los movimientos anteriores se pueden archivar.
+    """
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='points_checkpoints')
+    as_of = models.DateTimeField()
+    balance = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'POINTS_CHECKPOINTS'
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'as_of'], name='points_checkpoint_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} @ {self.as_of}: {self.balance}"
+
+    @classmethod
+    def balances(cls, customer_ids, as_of=None):
+        """
+        Saldo según el ledger para cada cliente, al momento as_of (default: ahora).
+        Una sola consulta: por cliente, el último checkpoint <= as_of (índice único customer, as_of)
+        más la suma de movimientos entre ese checkpoint y as_of (índice customer, created_at).
+        Retorna {customer_id: saldo}.
+        """
+        as_of = as_of or timezone.now()
+
+        latest = cls.objects.filter(customer=OuterRef('pk'), as_of__lte=as_of).order_by('-as_of')
+        # Sin checkpoint se suman todos los movimientos del cliente
+        since = Coalesce(
+            OuterRef('checkpoint_as_of'),
+            Value(datetime.min.replace(tzinfo=dt_timezone.utc)),
+            output_field=models.DateTimeField()
+        )
+        movements = PointsTransaction.objects.filter(
+            customer=OuterRef('pk'), created_at__gt=since, created_at__lte=as_of
+        ).order_by().values('customer').annotate(total=Sum('amount')).values('total')
+
+        rows = Customer.objects.filter(pk__in=list(customer_ids)).annotate(
+            checkpoint_as_of=Subquery(latest.values('as_of')[:1]),
+            checkpoint_balance=Coalesce(Subquery(latest.values('balance')[:1]), 0),
+            delta=Coalesce(Subquery(movements), 0),
+        ).values_list('pk', 'checkpoint_balance', 'delta')
+
+        return {pk: checkpoint_balance + delta for pk, checkpoint_balance, delta in rows}
+
+    @classmethod
+    def compact(cls, as_of=None, chunk_size=1000):
+        """
+        Crea checkpoints a la fecha as_of (default: inicio del día local) para los clientes
+        con movimientos desde el checkpoint anterior. Los clientes sin movimientos conservan
+        su checkpoint previo. Idempotente: volver a correr con la misma fecha no duplica.
+        Retorna el número de checkpoints creados.
+        """
+        if as_of is None:
+            as_of = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        previous = cls.objects.filter(as_of__lt=as_of).aggregate(last=Max('as_of'))['last']
+        moved = PointsTransaction.objects.filter(created_at__lte=as_of)
+        if previous is not None:
+            moved = moved.filter(created_at__gt=previous)
+        customer_ids = sorted(set(moved.values_list('customer', flat=True).distinct()))
+
+        created = 0
+        for start in range(0, len(customer_ids), chunk_size):
+            chunk = customer_ids[start:start + chunk_size]
+            checkpoints = [
+                cls(customer_id=pk, as_of=as_of, balance=balance)
+                for pk, balance in cls.balances(chunk, as_of).items()
+            ]
+            with transaction.atomic():
+                existing = set(
+                    cls.objects.filter(customer__in=chunk, as_of=as_of).values_list('customer', flat=True)
+                )
+                created += len(cls.objects.bulk_create(
+                    [checkpoint for checkpoint in checkpoints if checkpoint.customer_id not in existing],
+                    ignore_conflicts=True
+                ))
+
+        return created
+
+    @classmethod
+    def find_drift(cls, chunk_size=1000):
+        """
+        Recorre los clientes en lotes (iterator, sin cargarlos completos) y compara current_points
+        contra el ledger: una consulta balances() por lote.
+        Genera (customer_id, current_points, saldo según ledger) para cada cliente que no cuadra.
+        """
+        def check(chunk):
+            expected = cls.balances([pk for pk, _ in chunk])
+            for pk, current_points in chunk:
+                ledger = expected.get(pk, 0)
+                if ledger != current_points:
+                    yield pk, current_points, ledger
+
+        chunk = []
+        customers = Customer.objects.order_by('pk').values_list('pk', 'current_points')
+        for row in customers.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield from check(chunk)
+                chunk = []
+        if chunk:
+            yield from check(chunk)
+
+    @classmethod
+    def rebuild(cls, customer_ids):
+        """
+        Reescribe current_points con el saldo del ledger: bloquea los clientes, recalcula con balances()
+        dentro de la misma transacción (no pisa un pago concurrente) y aplica un UPDATE con CASE por cliente.
+        Retorna el número de clientes actualizados.
+        """
+        with transaction.atomic():
+            locked = list(
+                Customer.objects.select_for_update().filter(pk__in=list(customer_ids)).order_by('pk').values_list('pk', flat=True)
+            )
+            balances = cls.balances(locked)
+            if not balances:
+                return 0
+            return Customer.objects.filter(pk__in=list(balances)).update(
+                current_points=Case(
+                    *[When(pk=pk, then=Value(balance)) for pk, balance in balances.items()],
+                    default=F('current_points'),
+                    output_field=models.IntegerField(),
+                )
+            )
+
+    @classmethod
+    def archive(cls, before, chunk_size=5000):
+        """
+        Mueve a POINTS_TRANSACTIONS_ARCHIVE los movimientos con created_at <= before.
+        Primero asegura checkpoints a esa fecha, así balances() sigue cuadrando sin las filas movidas.
+        Cada lote se copia y se borra en la misma transacción; si se interrumpe, la siguiente
+        corrida continúa (la copia ignora ids ya archivados). Retorna el número de movimientos archivados.
+
+        before no puede ser posterior a now - POINTS_EXPIRATION_DAYS: la expiración FIFO necesita
+        en el ledger vivo todos los cargos posteriores a su corte.
+        """
+        limit = timezone.now() - PointsTransaction.expiration_period()
+        if before > limit:
+            raise ValidationError(
+                f"Solo se pueden archivar movimientos anteriores a {timezone.localtime(limit):%Y-%m-%d %H:%M} "
+                f"(vigencia de puntos: {PointsTransaction.expiration_period().days} días)."
+            )
+
+        cls.compact(as_of=before)
+
+        archived = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    PointsTransaction.objects.filter(created_at__lte=before).order_by('pk').values(
+                        'id', 'customer_id', 'amount', 'transaction_type', 'description', 'order_id', 'created_at'
+                    )[:chunk_size]
+                )
+                if not rows:
+                    break
+
+                ArchivedPointsTransaction.objects.bulk_create(
+                    [ArchivedPointsTransaction(**row) for row in rows],
+                    ignore_conflicts=True
+                )
+                PointsTransaction.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            archived += len(rows)
+
+            if len(rows) < chunk_size:
+                break
+
+        return archived
+
+class ArchivedPointsTransaction(models.Model):
+    """
+    Movimientos de puntos ya cubiertos por un checkpoint. Conserva el id original,
+    sin llaves foráneas ni índices secundarios (solo se consulta para auditoría).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    customer_id = models.BigIntegerField()
+    amount = models.IntegerField()
+    transaction_type = models.CharField(max_length=20, choices=PointsTransaction.TRANSACTION_TYPES)
+    description = models.CharField(max_length=255, blank=True)
+    order_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'POINTS_TRANSACTIONS_ARCHIVE'
+
+    def __str__(self):
+        return f"{self.customer_id} - {self.amount} ({self.transaction_type})"
+
 class CreditTransaction(models.Model):
     """
     Historial financiero del crédito del cliente.
@@ -234,5 +606,11 @@ class CreditTransaction(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Historial paginado por cliente, del más reciente al más antiguo
+            models.Index(fields=['customer', 'created_at'], name='credit_transaction_idx'),
+        ]
+
     def __str__(self):
         return f"{self.customer} - ${self.amount} ({self.transaction_type})"
\ No newline at end of file
@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CustomerCursorPagination(CursorPagination):
+    """
+    Listado de clientes por id (estable aunque se den de alta clientes).
+    Siempre pagina: 50 por omisión, hasta 500 con `page_size`; se recorre con `next`.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class LedgerCursorPagination(CursorPagination):
+    """
+    Historiales (crédito y puntos) del más reciente al más antiguo.
+    Siempre pagina: el ledger crece sin límite. El orden usa el índice (customer, created_at).
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
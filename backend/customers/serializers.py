@@ -12,13 +12,35 @@ class CreditTransactionSerializer(serializers.ModelSerializer):
         fields = ['id', 'amount', 'transaction_type', 'description', 'created_at']
         read_only_fields = ['id', 'amount', 'transaction_type', 'description', 'created_at']
 
+class CustomerListSerializer(serializers.ModelSerializer):
+    """
+    Serializer del listado: sin el historial anidado, solo agregados de crédito
+    (credit_transaction_count y last_credit_activity vienen anotados en el queryset).
+    """
+    available_credit = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    credit_transaction_count = serializers.IntegerField(read_only=True)
+    last_credit_activity = serializers.DateTimeField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Customer
+        fields = [
+            'id', 'first_name', 'last_name', 'phone_number',
+            'email', 'is_frequent', 'birth_date', 'current_points',
+            'credit_limit', 'credit_used', 'available_credit',
+            'credit_transaction_count', 'last_credit_activity'
+        ]
+        read_only_fields = fields
+
 class CustomerSerializer(serializers.ModelSerializer):
     available_credit = serializers.DecimalField(
         max_digits=10, 
         decimal_places=2, 
         read_only=True
     )
-    credit_transactions = CreditTransactionSerializer(many=True, read_only=True)
+    # En el detalle solo van los movimientos más recientes;
+    # el historial completo se consulta paginado en /customers/{id}/credit-history/
+    credit_transactions = serializers.SerializerMethodField()
+    RECENT_CREDIT_TRANSACTIONS = 20
 
     class Meta:
         model = Customer
@@ -28,4 +50,12 @@ class CustomerSerializer(serializers.ModelSerializer):
             'credit_limit', 'credit_used', 'available_credit',
             'credit_transactions'
         ]
-        read_only_fields = ['current_points', 'credit_used', 'available_credit','is_frequent']
\ No newline at end of file
+        read_only_fields = ['current_points', 'credit_used', 'available_credit','is_frequent']
+
+    def get_credit_transactions(self, customer):
+        """Usa el prefetch acotado de la vista de detalle; sin él, consulta solo los más recientes."""
+        if hasattr(customer, 'recent_credit_transactions'):
+            transactions = customer.recent_credit_transactions
+        else:
+            transactions = customer.credit_transactions.order_by('-created_at', '-id')[:self.RECENT_CREDIT_TRANSACTIONS]
+        return CreditTransactionSerializer(transactions, many=True).data
@@ -7,7 +7,12 @@ from decimal import Decimal
 import calendar
 from datetime import datetime, timedelta 
 from django.utils import timezone
-from .models import Customer, PointsTransaction, CreditTransaction
+from django.core.management import call_command, CommandError
+from io import StringIO
+from .models import (
+    Customer, PointsTransaction, CreditTransaction, PointsBalanceCheckpoint, ArchivedPointsTransaction
+)
+from .serializers import CustomerSerializer
 from orders.models import Order
 
 User = get_user_model()
@@ -127,6 +132,87 @@ class CustomerUnitTests(BaseCustomerTestCase):
         self.customer.save()
         self.assertFalse(self.customer.update_frequent_status())
 
+    def test_bulk_update_frequent_status_uses_grouped_weeks(self):
+        today = timezone.now().date()
+        first_day_prev = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+        weeks = calendar.monthcalendar(first_day_prev.year, first_day_prev.month)
+
+        regular = Customer.objects.create(
+            first_name="Cliente", last_name="Ocasional", phone_number="5500000001",
+            email="ocasional@cliente.com", birth_date="1990-01-01", is_frequent=True
+        )
+
+        # Una compra por semana para self.customer; regular solo compra la primera semana
+        for index, week in enumerate(weeks):
+            day = next(d for d in week if d != 0)
+            date_sim = timezone.make_aware(datetime(first_day_prev.year, first_day_prev.month, day, 12))
+            buyers = [self.customer, regular] if index == 0 else [self.customer]
+            for buyer in buyers:
+                order = Order.objects.create(
+                    ticket_folio=f"BULK-{buyer.pk}-{day}", final_amount=100, status='PAID',
+                    customer=buyer, seller=self.user, payment_method='CASH'
+                )
+                Order.objects.filter(pk=order.pk).update(created_at=date_sim)
+
+        # Consulta agrupada + pks del lote + dos UPDATE (más el savepoint de la transacción del lote)
+        with self.assertNumQueries(6):
+            stats = Customer.bulk_update_frequent_status(today=today, chunk_size=1000)
+        self.assertEqual(stats, {"frequent": 1, "regular": 1})
+
+        self.customer.refresh_from_db()
+        regular.refresh_from_db()
+        self.assertTrue(self.customer.is_frequent)
+        self.assertFalse(regular.is_frequent)
+        self.assertEqual(self.customer.last_status_check, today)
+        self.assertEqual(regular.last_status_check, today)
+
+    def test_accrue_points_does_not_recompute_frequent_status(self):
+        order = Order.objects.create(
+            ticket_folio="ACC-1", final_amount=500, status='PAID',
+            customer=self.customer, seller=self.user, payment_method='CASH'
+        )
+        self.customer.accrue_points_from_order(order, 'CASH', order.final_amount)
+
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_points, 5)
+        self.assertIsNone(self.customer.last_status_check)
+
+    def test_accrue_points_is_insert_plus_update_returning(self):
+        order = Order.objects.create(
+            ticket_folio="ACC-2", final_amount=1000, status='PAID',
+            customer=self.customer, seller=self.user, payment_method='CARD'
+        )
+        self.customer.current_points = 7
+        self.customer.save()
+
+        # INSERT del movimiento + UPDATE ... RETURNING current_points; sin refresh_from_db
+        with self.assertNumQueries(2) as captured:
+            self.customer.accrue_points_from_order(order, 'CARD', order.final_amount)
+
+        update_sql = captured.captured_queries[1]['sql']
+        self.assertIn('RETURNING', update_sql)
+        self.assertNotIn('first_name', update_sql)
+        self.assertEqual(self.customer.current_points, 17)
+
+    def test_apply_points_bulk_single_insert_and_update(self):
+        other = Customer.objects.create(
+            first_name="Otro", last_name="Cliente", phone_number="5500000002",
+            email="otro@cliente.com", birth_date="1990-01-01", current_points=50
+        )
+        movements = [
+            PointsTransaction(customer=self.customer, amount=10, transaction_type='ADJUSTMENT'),
+            PointsTransaction(customer=self.customer, amount=5, transaction_type='ADJUSTMENT'),
+            PointsTransaction(customer=other, amount=-20, transaction_type='EXPIRED'),
+        ]
+
+        with self.assertNumQueries(2):
+            deltas = Customer.apply_points_bulk(movements)
+
+        self.assertEqual(deltas, {self.customer.pk: 15, other.pk: -20})
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).current_points, 15)
+        self.assertEqual(Customer.objects.get(pk=other.pk).current_points, 30)
+        self.assertEqual(PointsTransaction.objects.count(), 3)
+
 
 class CustomerIntegrationTests(BaseCustomerTestCase):
     
@@ -230,7 +316,8 @@ class CustomerFunctionalTests(BaseCustomerTestCase):
         url = reverse('customer-history', kwargs={'pk': self.customer.id})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        # Siempre paginado, del más reciente al más antiguo
+        self.assertEqual([txn['amount'] for txn in response.data['results']], [-10, 50])
 
     # Verifica RQF46
     def test_credit_history_endpoint(self):
@@ -240,7 +327,74 @@ class CustomerFunctionalTests(BaseCustomerTestCase):
         
         if response.status_code != 404:
             self.assertEqual(response.status_code, status.HTTP_200_OK)
-            self.assertEqual(len(response.data), 1)
+            self.assertEqual(len(response.data['results']), 1)
+
+    def test_credit_history_is_cursor_paginated(self):
+        CreditTransaction.objects.bulk_create([
+            CreditTransaction(customer=self.customer, amount=Decimal(i + 1), transaction_type='CHARGE')
+            for i in range(5)
+        ])
+        url = reverse('customer-credit-history', kwargs={'pk': self.customer.id})
+
+        first = self.client.get(url, {'page_size': 3})
+        self.assertEqual(len(first.data['results']), 3)
+        self.assertIsNotNone(first.data['next'])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(second.data['results']), 2)
+        self.assertIsNone(second.data['next'])
+
+        ids = [tx['id'] for tx in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_customer_list_is_slim_and_constant_queries(self):
+        for i in range(5):
+            customer = Customer.objects.create(
+                first_name="Lista", last_name=str(i), phone_number=f"55100000{i}",
+                email=f"lista{i}@cliente.com", birth_date="1990-01-01"
+            )
+            CreditTransaction.objects.create(customer=customer, amount=Decimal('10.00'), transaction_type='CHARGE')
+            CreditTransaction.objects.create(customer=customer, amount=Decimal('5.00'), transaction_type='PAYMENT')
+
+        # Una sola consulta con los agregados, sin importar cuántos clientes haya
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(len(response.data['results']), 6)
+        listed = response.data['results'][-1]
+        self.assertNotIn('credit_transactions', listed)
+        self.assertEqual(listed['credit_transaction_count'], 2)
+        self.assertIsNotNone(listed['last_credit_activity'])
+
+        page = self.client.get(self.list_url, {'page_size': 4})
+        self.assertEqual(len(page.data['results']), 4)
+        self.assertIsNotNone(page.data['next'])
+
+    def test_customer_list_search_for_pos_picker(self):
+        Customer.objects.create(
+            first_name="Rosa", last_name="Mendoza", phone_number="5512340000", email="rosa@cliente.com", birth_date="1990-01-01"
+        )
+
+        def search(term):
+            return [c['phone_number'] for c in self.client.get(self.list_url, {'search': term}).data['results']]
+
+        self.assertEqual(search("ros"), ["5512340000"])
+        self.assertEqual(search("mend"), ["5512340000"])
+        self.assertEqual(search("5512340000"), ["5512340000"])
+        self.assertEqual(search("5512"), [])
+
+    def test_customer_detail_nests_recent_credit_transactions_only(self):
+        limit = CustomerSerializer.RECENT_CREDIT_TRANSACTIONS
+        CreditTransaction.objects.bulk_create([
+            CreditTransaction(customer=self.customer, amount=Decimal('1.00'), transaction_type='CHARGE')
+            for _ in range(limit + 5)
+        ])
+        url = reverse('customer-detail', kwargs={'pk': self.customer.id})
+
+        # Cliente + prefetch acotado
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['credit_transactions']), limit)
 
     # Verifica RQF45
     def test_pay_credit_endpoint_success(self):
@@ -267,6 +421,130 @@ class CustomerFunctionalTests(BaseCustomerTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         payment_txn = any(
             txn['transaction_type'] == 'PAYMENT' and Decimal(txn['amount']) == Decimal('150.00') 
-            for txn in response.data
+            for txn in response.data['results']
+        )
+        self.assertTrue(payment_txn)
+
+
+class PointsLedgerCompactionTests(BaseCustomerTestCase):
+
+    def _movement(self, amount, days_ago, transaction_type='EARN'):
+        movement = PointsTransaction.objects.create(
+            customer=self.customer, amount=amount, transaction_type=transaction_type
         )
-        self.assertTrue(payment_txn)
\ No newline at end of file
+        PointsTransaction.objects.filter(pk=movement.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_checkpoint_and_archive_keep_balance(self):
+        self._movement(100, 400)
+        self._movement(-30, 395, 'REDEEM')
+        self._movement(20, 5)
+        Customer.objects.filter(pk=self.customer.pk).update(current_points=90)
+
+        cutoff = timezone.now() - timedelta(days=390)
+        self.assertEqual(PointsBalanceCheckpoint.compact(as_of=cutoff), 1)
+        # Idempotente
+        self.assertEqual(PointsBalanceCheckpoint.compact(as_of=cutoff), 0)
+        self.assertEqual(PointsBalanceCheckpoint.objects.get().balance, 70)
+
+        self.assertEqual(PointsBalanceCheckpoint.archive(cutoff, chunk_size=1), 2)
+        self.assertEqual(PointsTransaction.objects.count(), 1)
+        self.assertEqual(ArchivedPointsTransaction.objects.count(), 2)
+
+        # Checkpoint + movimientos posteriores, en una consulta
+        with self.assertNumQueries(1):
+            balances = PointsBalanceCheckpoint.balances([self.customer.pk])
+        self.assertEqual(balances, {self.customer.pk: 90})
+        self.assertEqual(list(PointsBalanceCheckpoint.find_drift()), [])
+
+    def test_verify_command_flags_and_rebuilds_drift(self):
+        self._movement(50, 2)
+        Customer.objects.filter(pk=self.customer.pk).update(current_points=80)
+
+        out = StringIO()
+        call_command('verify_points_ledger', stdout=out)
+        self.assertIn('current_points 80 vs ledger 50', out.getvalue())
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_points, 80)
+
+        call_command('verify_points_ledger', '--rebuild', stdout=StringIO())
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_points, 50)
+
+
+class PointsExpirationTests(BaseCustomerTestCase):
+
+    def _movement(self, customer, amount, days_ago, transaction_type='EARN'):
+        movement = PointsTransaction.objects.create(customer=customer, amount=amount, transaction_type=transaction_type)
+        PointsTransaction.objects.filter(pk=movement.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_expire_is_fifo_and_idempotent(self):
+        other = Customer.objects.create(
+            first_name="Otro", last_name="Cliente", phone_number="5500000003",
+            email="otro3@cliente.com", birth_date="1990-01-01"
+        )
+        # Ganó 100 hace 400 días; los canjes (30 + 40) consumen primero esos puntos → vencen 30
+        self._movement(self.customer, 100, 400)
+        self._movement(self.customer, -30, 200, 'REDEEM')
+        self._movement(self.customer, 50, 10)
+        self._movement(self.customer, -40, 5, 'REDEEM')
+        # Todo lo viejo ya se usó: no vence nada
+        self._movement(other, 20, 400)
+        self._movement(other, -20, 100, 'REDEEM')
+        self._movement(other, 15, 3)
+        Customer.objects.filter(pk=self.customer.pk).update(current_points=80)
+        Customer.objects.filter(pk=other.pk).update(current_points=15)
+
+        # Mismas consultas sin importar cuántos clientes haya en el lote
+        with self.assertNumQueries(7):
+            stats = PointsTransaction.expire(chunk_size=1000)
+        self.assertEqual(stats, {"customers": 1, "points": 30})
+
+        self.customer.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.customer.current_points, 50)
+        self.assertEqual(other.current_points, 15)
+        self.assertEqual(
+            PointsTransaction.objects.get(transaction_type='EXPIRED').amount, -30
+        )
+
+        # Segunda corrida: la expiración ya registrada cuenta como cargo
+        self.assertEqual(PointsTransaction.expire(chunk_size=1), {"customers": 0, "points": 0})
+        self.assertEqual(list(PointsBalanceCheckpoint.find_drift()), [])
+
+    def test_expire_command_reads_archived_history_through_checkpoints(self):
+        self._movement(self.customer, 60, 500)
+        self._movement(self.customer, -10, 450, 'REDEEM')
+        Customer.objects.filter(pk=self.customer.pk).update(current_points=50)
+        PointsBalanceCheckpoint.archive(timezone.now() - timedelta(days=420))
+        self.assertEqual(PointsTransaction.objects.count(), 0)
+
+        out = StringIO()
+        call_command('expire_points', stdout=out)
+        self.assertIn('puntos vencidos: 50', out.getvalue())
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_points, 0)
+
+    def test_archive_cannot_drop_debits_needed_by_expiration(self):
+        self._movement(self.customer, 100, 430)
+        self._movement(self.customer, -60, 100, 'REDEEM')
+        self._movement(self.customer, 200, 40)
+        Customer.objects.filter(pk=self.customer.pk).update(current_points=240)
+        now = timezone.now()
+        cutoff = now - PointsTransaction.expiration_period()
+        self.assertEqual(PointsTransaction.expirable_points([self.customer.pk], cutoff), {self.customer.pk: 40})
+
+        PointsBalanceCheckpoint.compact(as_of=now - timedelta(days=366))
+        # Archivar el canje de hace 100 días haría vencer 60 puntos de más
+        with self.assertRaises(ValidationError):
+            PointsBalanceCheckpoint.archive(now - timedelta(days=30))
+        with self.assertRaises(CommandError):
+            call_command('compact_points_ledger', '--archive-before', (now - timedelta(days=30)).isoformat(), stdout=StringIO())
+        self.assertEqual(PointsTransaction.objects.count(), 3)
+
+        PointsBalanceCheckpoint.archive(now - timedelta(days=366))
+        self.assertEqual(PointsTransaction.objects.count(), 2)
+
+        stats = PointsTransaction.expire(now=now)
+        self.assertEqual(stats, {"customers": 1, "points": 40})
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_points, 200)
@@ -1,38 +1,70 @@
-from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Customer, PointsTransaction
-from .serializers import CustomerSerializer, PointsTransactionSerializer, CreditTransactionSerializer
+from django.db.models import Count, Max, Prefetch
+from .models import Customer, CreditTransaction
+from .filters import CustomerFilter
+from .pagination import CustomerCursorPagination, LedgerCursorPagination
+from .serializers import (
+    CustomerListSerializer, CustomerSerializer, PointsTransactionSerializer, CreditTransactionSerializer
+)
 
 class CustomerViewSet(viewsets.ModelViewSet):
+    #/api/customers/?page_size=50&search=&phone_number=&is_frequent=
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [permissions.IsAuthenticated] 
+    pagination_class = CustomerCursorPagination
+    filterset_class = CustomerFilter
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if self.action == 'list':
+            return queryset.annotate(
+                credit_transaction_count=Count('credit_transactions'),
+                last_credit_activity=Max('credit_transactions__created_at'),
+            ).order_by('pk')
+
+        if self.action == 'retrieve':
+            return queryset.prefetch_related(Prefetch(
+                'credit_transactions',
+                queryset=CreditTransaction.objects.order_by('-created_at', '-id')[
+                    :CustomerSerializer.RECENT_CREDIT_TRANSACTIONS
+                ],
+                to_attr='recent_credit_transactions',
+            ))
+
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CustomerListSerializer
+        return super().get_serializer_class()
+
     #/api/customers/{id}/history/
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
+        # Paginado por cursor (siempre), igual que credit-history
         customer = self.get_object() # Obtener id del cliente de la url
-        
-        transactions = customer.transactions.all().order_by('-created_at')
-        
-        page = self.paginate_queryset(transactions)
-        if page is not None:
-            serializer = PointsTransactionSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
 
-        serializer = PointsTransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        paginator = LedgerCursorPagination()
+        page = paginator.paginate_queryset(customer.transactions.all(), request, view=self)
+        serializer = PointsTransactionSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     #api/customers/{id}/credit-history/
     @action(detail=True, methods=['get'], url_path='credit-history')
     def credit_history(self, request, pk=None):
+        # Paginado por cursor (siempre): ?cursor=... para la siguiente página, ?page_size= hasta 500
         customer = self.get_object()
-        transactions = customer.credit_transactions.all().order_by('-created_at')
-        serializer = CreditTransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+
+        paginator = LedgerCursorPagination()
+        page = paginator.paginate_queryset(customer.credit_transactions.all(), request, view=self)
+        serializer = CreditTransactionSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     # /api/customers/{id}/points/
     @action(detail=True, methods=['post'])
@@ -54,24 +86,11 @@ class CustomerViewSet(viewsets.ModelViewSet):
         except ValueError:
             return Response({"error": "Amount must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
-        with transaction.atomic():
-            PointsTransaction.objects.create(
-                customer=customer,
-                amount=amount,
-                transaction_type=trans_type,
-                description=description,
-            )
-
-            # (Usamos F expressions para evitar condiciones de carrera si hay concurrencia)
-            from django.db.models import F
-            customer.current_points = F('current_points') + amount
-            customer.save()
-            
-            customer.refresh_from_db()
+        new_balance = customer.apply_points(amount, trans_type, description=description)
 
         return Response({
             "status": "success",
-            "new_balance": customer.current_points
+            "new_balance": new_balance
         }, status=status.HTTP_201_CREATED)
     
     # /api/customers/{id}/pay-credit/
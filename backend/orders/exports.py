@@ -0,0 +1,102 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Order
+
+
+class _Echo:
+    """Buffer falso para csv.writer: write() regresa la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+class OrderExportService:
+    """
+    Exportación de órdenes con sus ítems en streaming (CSV o NDJSON).
+    Una sola consulta Order LEFT JOIN ORDER_ITEMS recorrida con iterator(chunk_size):
+    en PostgreSQL es un cursor del lado del servidor, así la memoria no crece con el rango
+    y los primeros bytes salen en cuanto llega el primer lote.
+    """
+    CHUNK_SIZE = 2000
+    # Renglones que se juntan antes de mandar un pedazo de la respuesta
+    FLUSH_ROWS = 500
+
+    ORDER_FIELDS = (
+        'id', 'ticket_folio', 'created_at', 'status', 'payment_method', 'customer_id', 'seller_id',
+        'subtotal', 'total_tax', 'discount_applied', 'points_used', 'store_credit_used', 'final_amount',
+    )
+    ITEM_FIELDS = (
+        'product_id', 'product_name', 'promotion_name', 'quantity', 'unit_price',
+        'discount_amount', 'tax_amount', 'amount',
+    )
+
+    @classmethod
+    def rows(cls, start, end):
+        """Tuplas (campos de la orden..., campos del ítem...) ordenadas por orden; ítems en None si la orden no tiene."""
+        lookups = [
+            'customer' if field == 'customer_id' else 'seller' if field == 'seller_id' else field
+            for field in cls.ORDER_FIELDS
+        ] + [
+            'items__product' if field == 'product_id' else f'items__{field}'
+            for field in cls.ITEM_FIELDS
+        ]
+
+        return (
+            Order.objects.filter(created_at__gte=start, created_at__lt=end)
+            .order_by('created_at', 'pk', 'items__pk')
+            .values_list(*lookups)
+            .iterator(chunk_size=cls.CHUNK_SIZE)
+        )
+
+    @classmethod
+    def stream_csv(cls, start, end):
+        """Un renglón por ítem con los datos de su orden repetidos."""
+        writer = csv.writer(_Echo())
+        created_at_index = cls.ORDER_FIELDS.index('created_at')
+
+        buffer = [writer.writerow([f'order_{f}' if f == 'id' else f for f in cls.ORDER_FIELDS + cls.ITEM_FIELDS])]
+        for row in cls.rows(start, end):
+            row = list(row)
+            row[created_at_index] = timezone.localtime(row[created_at_index]).isoformat()
+            buffer.append(writer.writerow(row))
+            if len(buffer) >= cls.FLUSH_ROWS:
+                yield ''.join(buffer)
+                buffer = []
+
+        if buffer:
+            yield ''.join(buffer)
+
+    @classmethod
+    def stream_ndjson(cls, start, end):
+        """Un objeto JSON por orden con sus ítems anidados; los renglones llegan agrupados por orden."""
+        order_count = len(cls.ORDER_FIELDS)
+        buffer = []
+        current = None
+
+        for row in cls.rows(start, end):
+            if current is None or current['id'] != row[0]:
+                if current is not None:
+                    buffer.append(cls._dump(current))
+                    if len(buffer) >= cls.FLUSH_ROWS:
+                        yield ''.join(buffer)
+                        buffer = []
+                current = dict(zip(cls.ORDER_FIELDS, row[:order_count]))
+                current['created_at'] = timezone.localtime(current['created_at'])
+                current['items'] = []
+
+            item = row[order_count:]
+            if item[cls.ITEM_FIELDS.index('quantity')] is not None:
+                current['items'].append(dict(zip(cls.ITEM_FIELDS, item)))
+
+        if current is not None:
+            buffer.append(cls._dump(current))
+        if buffer:
+            yield ''.join(buffer)
+
+    @staticmethod
+    def _dump(order):
+        return json.dumps(order, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
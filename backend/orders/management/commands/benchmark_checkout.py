@@ -0,0 +1,108 @@
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from orders.serializers import OrderSerializer
+from products.models import Product
+from suppliers.models import Supplier
+
+
+class PerLineOrderSerializer(OrderSerializer):
+    """
+    Ruta de checkout anterior (una consulta de bloqueo, un save y un insert por línea).
+    Se conserva solo como referencia para el benchmark.
+    """
+
+    def _create_items_and_calculate_totals(self, order, items_data):
+        accumulated = self._empty_totals()
+
+        for item in items_data:
+            product_db = Product.objects.select_for_update().get(pk=item['product'].pk)
+            product_db.reduce_stock(item['quantity'], consume_reservation=False)
+
+            order_item = self._build_order_item(order, product_db, item['quantity'], order.customer)
+            order_item.save()
+            self._accumulate_line(accumulated, order_item)
+
+        return accumulated
+
+
+class Command(BaseCommand):
+    help = 'Compara número de consultas y latencia p95 entre el checkout por línea y el checkout por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=40, help='Líneas por carrito (default: 40)')
+        parser.add_argument('--iterations', type=int, default=30, help='Órdenes por ruta (default: 30)')
+
+    def handle(self, *args, **options):
+        lines = options['lines']
+        iterations = options['iterations']
+
+        self.stdout.write(f"Benchmark de checkout: {lines} líneas x {iterations} órdenes por ruta...")
+
+        # Todo se crea dentro de una transacción que se revierte al final
+        with transaction.atomic():
+            seller, products = self._create_fixtures(lines, iterations)
+            request = SimpleNamespace(user=seller)
+
+            results = []
+            for label, serializer_class in (('per-line', PerLineOrderSerializer), ('batched', OrderSerializer)):
+                results.append(self._run(label, serializer_class, request, products, iterations))
+
+            transaction.set_rollback(True)
+
+        for label, queries, p50, p95 in results:
+            self.stdout.write(
+                f"{label:>9}: {queries} consultas/orden | p50 {p50:.2f} ms | p95 {p95:.2f} ms"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado.'))
+
+    def _create_fixtures(self, lines, iterations):
+        suffix = uuid.uuid4().hex[:8]
+        seller = get_user_model().objects.create_user(
+            username=f'bench-{suffix}', email=f'bench-{suffix}@example.com'
+        )
+        supplier = Supplier.objects.create(
+            name=f'Bench {suffix}', phone_number='0', contact_person='Bench', rfc='BENCH', tax_address='N/A'
+        )
+        products = [
+            Product.objects.create(
+                name=f'Bench {suffix} {i}', sku=f'BENCH-{suffix}-{i}', price=Decimal('10.00'),
+                current_stock=iterations * 4, supplier=supplier
+            )
+            for i in range(lines)
+        ]
+        return seller, products
+
+    def _run(self, label, serializer_class, request, products, iterations):
+        latencies = []
+        query_counts = []
+
+        for _ in range(iterations):
+            validated_data = {
+                'customer': None,
+                'items': [{'product': product, 'quantity': 1} for product in products],
+            }
+            serializer = serializer_class(context={'request': request})
+
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                serializer.create(validated_data)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            query_counts.append(len(ctx.captured_queries))
+
+        return label, max(query_counts), self._percentile(latencies, 50), self._percentile(latencies, 95)
+
+    @staticmethod
+    def _percentile(values, percent):
+        ordered = sorted(values)
+        index = max(0, round(percent / 100 * len(ordered)) - 1)
+        return ordered[index]
@@ -0,0 +1,119 @@
+import threading
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from orders.models import Order
+from orders.serializers import OrderSerializer
+from products.models import Product
+from suppliers.models import Supplier
+
+
+class LockingOrderSerializer(OrderSerializer):
+    optimistic_stock = False
+
+
+class OptimisticOrderSerializer(OrderSerializer):
+    optimistic_stock = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Vende el mismo SKU desde muchos hilos y compara el throughput del checkout con '
+        'select_for_update contra el descuento optimista. Requiere PostgreSQL para resultados representativos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Cajas concurrentes (default: 16)')
+        parser.add_argument('--orders', type=int, default=50, help='Órdenes por hilo (default: 50)')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        orders_per_thread = options['orders']
+
+        self.stdout.write(f"Benchmark de concurrencia: {threads} hilos x {orders_per_thread} órdenes sobre un SKU...")
+
+        initial_stock = threads * orders_per_thread
+
+        # Los hilos usan sus propias conexiones: los datos se confirman y se borran al final
+        seller, supplier = self._create_fixtures()
+        try:
+            for label, serializer_class in (('locking', LockingOrderSerializer), ('optimistic', OptimisticOrderSerializer)):
+                product = Product.objects.create(
+                    name=f'Hot SKU {label}', sku=f'HOT-{uuid.uuid4().hex[:8]}', price=Decimal('10.00'),
+                    current_stock=initial_stock, supplier=supplier
+                )
+                results = self._run(serializer_class, seller, product, threads, orders_per_thread)
+                self._report(label, product, initial_stock, *results)
+        finally:
+            Order.objects.filter(seller=seller).delete()
+            Product.objects.filter(supplier=supplier).delete()
+            supplier.delete()
+            seller.delete()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado.'))
+
+    def _create_fixtures(self):
+        suffix = uuid.uuid4().hex[:8]
+        seller = get_user_model().objects.create_user(
+            username=f'bench-{suffix}', email=f'bench-{suffix}@example.com'
+        )
+        supplier = Supplier.objects.create(
+            name=f'Bench {suffix}', phone_number='0', contact_person='Bench', rfc='BENCH', tax_address='N/A'
+        )
+        return seller, supplier
+
+    def _run(self, serializer_class, seller, product, threads, orders_per_thread):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(threads)
+
+        def till():
+            request = SimpleNamespace(user=seller)
+            local_latencies = []
+            local_errors = []
+            try:
+                start_barrier.wait()
+                for _ in range(orders_per_thread):
+                    serializer = serializer_class(context={'request': request})
+                    start = time.perf_counter()
+                    try:
+                        serializer.create({'customer': None, 'items': [{'product': product, 'quantity': 1}]})
+                    except Exception as e:
+                        local_errors.append(type(e).__name__)
+                    local_latencies.append((time.perf_counter() - start) * 1000)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(local_latencies)
+                    errors.extend(local_errors)
+
+        workers = [threading.Thread(target=till) for _ in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        return latencies, errors, elapsed
+
+    def _report(self, label, product, initial_stock, latencies, errors, elapsed):
+        product.refresh_from_db()
+        sold = Order.objects.filter(items__product=product).count()
+        consistent = product.current_stock == initial_stock - sold
+
+        ordered = sorted(latencies)
+        p95 = ordered[max(0, round(0.95 * len(ordered)) - 1)] if ordered else 0
+
+        self.stdout.write(
+            f"{label:>10}: {sold / elapsed:.1f} órdenes/s | p95 {p95:.2f} ms | "
+            f"{sold} vendidas, {len(errors)} errores | stock final {product.current_stock} "
+            f"({'consistente' if consistent else 'INCONSISTENTE'})"
+        )
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Borra por lotes las llaves de idempotencia vencidas (Ideal para Cron Jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Llaves por lote (default: 1000)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Borrando llaves de idempotencia vencidas...")
+        start = time.perf_counter()
+
+        deleted = IdempotencyKey.purge_expired(chunk_size=options['chunk_size'])
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Proceso terminado en {elapsed:.2f}s. Llaves borradas: {deleted}'))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.services import OrderCancellationService
+from products.models import StockReservation
+
+
+class Command(BaseCommand):
+    help = 'Libera el stock de órdenes PENDING abandonadas y de apartados vencidos (Ideal para Cron Jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Registros por lote (default: 500)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        self.stdout.write("Buscando apartados vencidos...")
+        start = time.perf_counter()
+
+        orders = OrderCancellationService.expire_pending(chunk_size=chunk_size)
+        reservations = StockReservation.release_expired(chunk_size=chunk_size)
+
+        elapsed = time.perf_counter() - start
+        if OrderCancellationService.hold_duration() is not None:
+            self.stdout.write(
+                f"Órdenes PENDING vencidas: {orders['orders']} (unidades devueltas al stock: {orders['units']})"
+            )
+        else:
+            self.stdout.write("Órdenes PENDING: ORDER_HOLD_MINUTES no está configurado, no se cancela ninguna.")
+        self.stdout.write(
+            f"Apartados vencidos: {reservations['reservations']} (unidades liberadas: {reservations['units']})"
+        )
+        self.stdout.write(self.style.SUCCESS(f'Proceso terminado en {elapsed:.2f}s.'))
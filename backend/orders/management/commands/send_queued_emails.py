@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.services import EmailOutboxService
+
+
+class Command(BaseCommand):
+    help = 'Envía los correos pendientes del outbox por lotes (worker; usar --loop para dejarlo corriendo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Correos por conexión SMTP (default: 50)')
+        parser.add_argument('--loop', action='store_true', help='No termina: vuelve a revisar la cola cada --interval segundos')
+        parser.add_argument('--interval', type=float, default=5, help='Segundos entre revisiones cuando la cola está vacía (default: 5)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        totals = {"sent": 0, "retrying": 0, "failed": 0}
+
+        while True:
+            stats = EmailOutboxService.deliver_batch(batch_size)
+            for key, value in stats.items():
+                totals[key] += value
+
+            if any(stats.values()):
+                self.stdout.write(
+                    f"Lote: {stats['sent']} enviados, {stats['retrying']} por reintentar, {stats['failed']} fallidos"
+                )
+
+            # Lote incompleto = cola vacía (o solo quedan correos esperando su backoff)
+            if sum(stats.values()) < batch_size:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Proceso terminado. Enviados: {totals['sent']}, por reintentar: {totals['retrying']}, fallidos: {totals['failed']}"
+        ))
@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_credit_limit_customer_credit_used_and_more'),
+        ('orders', '0005_alter_order_payment_method_alter_order_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='orders_status_created_idx'),
+        ),
+    ]
@@ -1,5 +1,11 @@
 from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from django.urls import reverse
+from datetime import timedelta
+import hashlib
+import json
 import uuid
 class Order(models.Model):
     ticket_folio = models.CharField(max_length=50, unique=True, blank=True)
@@ -32,6 +38,7 @@ class Order(models.Model):
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING') 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     customer = models.ForeignKey(
         'customers.Customer', 
@@ -49,6 +56,10 @@ class Order(models.Model):
 
     class Meta:
         db_table = 'ORDERS'
+        indexes = [
+            # Reportes y barridos filtran por estado y rango de fechas
+            models.Index(fields=['status', 'created_at'], name='orders_status_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.ticket_folio:
@@ -85,3 +96,99 @@ class OrderItems(models.Model):
         db_table = 'ORDER_ITEMS'
     def __str__(self):
         return f"{self.quantity} x {self.product_name}"
+
+
+class EmailOutbox(models.Model):
+    """
+    Correos pendientes de envío (patrón outbox). La petición HTTP solo inserta la fila;
+    el comando send_queued_emails los entrega por lotes y reintenta con backoff.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pendiente'),
+        ('SENT', 'Enviado'),
+        ('FAILED', 'Fallido'),
+    ]
+    order = models.ForeignKey(Order,
+                              on_delete=models.SET_NULL,
+                              null=True,
+                              blank=True,
+                              related_name="emails")
+    recipient = models.EmailField()
+    from_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=200)
+    body_text = models.TextField()
+    body_html = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'EMAIL_OUTBOX'
+        indexes = [
+            # El worker toma los pendientes cuyo siguiente intento ya venció
+            models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Respuesta guardada de un POST /api/orders/ enviado con el header Idempotency-Key.
+    Un reintento con la misma llave (mismo usuario y mismo cuerpo) recibe la respuesta
+    guardada sin volver a crear la orden ni descontar stock.
+    """
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys"
+    )
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'IDEMPOTENCY_KEYS'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_key_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+    @staticmethod
+    def ttl():
+        return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+    @staticmethod
+    def hash_request(method, path, data):
+        payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha256(f"{method} {path} {payload}".encode()).hexdigest()
+
+    @classmethod
+    def purge_expired(cls, now=None, chunk_size=1000):
+        """Borra las llaves vencidas por lotes (índice expires_at). Retorna cuántas se borraron."""
+        now = now or timezone.now()
+        deleted = 0
+
+        while True:
+            chunk = list(cls.objects.filter(expires_at__lte=now).order_by('expires_at').values_list('pk', flat=True)[:chunk_size])
+            if not chunk:
+                break
+
+            deleted += cls.objects.filter(pk__in=chunk).delete()[0]
+
+            if len(chunk) < chunk_size:
+                break
+
+        return deleted
@@ -0,0 +1,26 @@
+from rest_framework.renderers import BaseRenderer
+
+
+class PlainTextRenderer(BaseRenderer):
+    """Devuelve el contenido tal cual como text/plain (p. ej. ticket para impresoras térmicas)."""
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # Respuestas de error ({"detail": ...})
+            return '\n'.join(f"{key}: {value}" for key, value in data.items())
+        return data
+
+
+class CSVRenderer(PlainTextRenderer):
+    """Habilita ?format=csv; el cuerpo lo genera la vista en streaming."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(PlainTextRenderer):
+    """Habilita ?format=ndjson (un objeto JSON por línea); el cuerpo lo genera la vista en streaming."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
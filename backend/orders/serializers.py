@@ -1,12 +1,13 @@
 from rest_framework import serializers
 from django.db import transaction
 from django.db.models import F
-from django.db import models
 from django.utils import timezone
+from django.conf import settings
 from django.core.exceptions import ValidationError as DjangoValidationError 
-from .models import Order, OrderItems
-from products.models import Product, Promotion
-from customers.models import PointsTransaction
+from .models import Order, OrderItems, EmailOutbox
+from products.models import Product, ProductPrice, Promotion
+from analytics.services import SalesRollupService
+from .services import OrderCancellationService
 from decimal import Decimal
 from django.utils.translation import gettext_lazy as _
 import math
@@ -54,14 +55,18 @@ class OrderItemSerializer(serializers.ModelSerializer):
     
 
 class OrderSerializer(serializers.ModelSerializer):
+    # None = usar settings.OPTIMISTIC_STOCK_DECREMENT
+    optimistic_stock = None
+
     items = OrderItemSerializer(many=True)
     seller_name = serializers.ReadOnlyField(source='seller.username')
     customer_name = serializers.SerializerMethodField()
+    hold_expires_at = serializers.SerializerMethodField()
 
     class Meta:
         model = Order
         fields = [
-            'id', 'ticket_folio', 'created_at', 'payment_method', 'status','seller',
+            'id', 'ticket_folio', 'created_at', 'hold_expires_at', 'payment_method', 'status','seller',
             'seller_name', 'customer', 'customer_name', 
             'subtotal', 'total_tax', 'final_amount', 
             'discount_applied', 'money_saved_total',
@@ -76,6 +81,11 @@ class OrderSerializer(serializers.ModelSerializer):
         if obj.customer:
             return f"{obj.customer.first_name} {obj.customer.last_name}"
         return "Cliente General"
+
+    def get_hold_expires_at(self, obj):
+        """Momento en que una orden PENDING libera su stock si no se paga."""
+        expires_at = OrderCancellationService.hold_expires_at(obj)
+        return serializers.DateTimeField().to_representation(expires_at) if expires_at else None
     
     def validate(self, attrs):
         if not attrs.get('items'):
@@ -87,9 +97,6 @@ class OrderSerializer(serializers.ModelSerializer):
         items_payload = validated_data.pop('items')
         user = self.context['request'].user
 
-        Promotion.deactivate_expired()
-        Promotion.check_and_activate_promotions()
-        
         order = Order.objects.create(
             seller=user, 
             status='PENDING', 
@@ -112,55 +119,143 @@ class OrderSerializer(serializers.ModelSerializer):
         return order
 
     def _create_items_and_calculate_totals(self, order, items_data):
-        accumulated = {
+        """
+        Checkout por lotes: bloquea todos los productos del carrito en una sola
+        consulta ordenada, descuenta el stock con un único UPDATE y crea todos
+        los OrderItems con un solo bulk insert.
+        En modo optimista no hay bloqueo: el UPDATE condicional decide si alcanza el stock.
+        """
+        accumulated = self._empty_totals()
+        customer = order.customer
+        optimistic = self._use_optimistic_stock()
+
+        requested = self._group_quantities(items_data)
+        products = self._load_products(requested.keys(), lock=not optimistic)
+
+        # Solo se resuelven las promociones de los productos del carrito
+        Promotion.sync_products(list(products.values()))
+
+        for product_id, quantity in requested.items():
+            try:
+                products[product_id].check_stock(quantity)
+            except DjangoValidationError as e:
+                raise serializers.ValidationError(f"Error de stock: {str(e)}")
+
+        # Precios ya resueltos para el nivel del cliente: una lectura por el índice (product, tier)
+        tier_prices = {
+            price.product_id: price
+            for price in ProductPrice.objects.filter(product__in=list(requested), tier=ProductPrice.tier_for(customer))
+        }
+
+        order_items = []
+        for item in items_data:
+            product_db = products[item['product'].pk]
+            order_item = self._build_order_item(
+                order, product_db, item['quantity'], customer, tier_prices.get(product_db.pk)
+            )
+            self._accumulate_line(accumulated, order_item)
+            order_items.append(order_item)
+
+        if optimistic:
+            if not Product.try_decrement_stock(requested, order_id=order.pk):
+                self._raise_insufficient_stock(requested)
+        else:
+            Product.apply_stock_deltas(
+                {pk: -quantity for pk, quantity in requested.items()}, 'SALE',
+                entries=[(pk, order.pk, -quantity) for pk, quantity in requested.items()]
+            )
+        OrderItems.objects.bulk_create(order_items)
+
+        return accumulated
+
+    def _empty_totals(self):
+        return {
             'subtotal': Decimal("0.00"),
             'tax': Decimal("0.00"),
             'final_amount': Decimal("0.00"),
             'savings': Decimal("0.00")
         }
 
-        customer = order.customer
-
+    def _group_quantities(self, items_data):
+        """Suma las cantidades por producto (un mismo producto puede venir en varias líneas)."""
+        requested = {}
         for item in items_data:
-            product = item['product']
-            quantity = item['quantity']
+            product_id = item['product'].pk
+            requested[product_id] = requested.get(product_id, 0) + item['quantity']
+        return requested
 
-            try:
-                product_db = Product.objects.select_for_update().get(pk=product.pk)
-                product_db.reduce_stock(quantity, consume_reservation=False) 
-            except Exception as e:
-                raise serializers.ValidationError(f"Error de stock: {str(e)}")
+    def _use_optimistic_stock(self):
+        if self.optimistic_stock is not None:
+            return self.optimistic_stock
+        return getattr(settings, 'OPTIMISTIC_STOCK_DECREMENT', False)
 
+    def _load_products(self, product_ids, lock=True):
+        """
+        Carga todos los productos del carrito en una sola consulta.
+        Con lock=True se bloquean ordenados por pk para que dos cajas concurrentes
+        tomen los locks en el mismo orden y no se produzcan deadlocks.
+        """
+        queryset = Product.objects.select_for_update() if lock else Product.objects.all()
+        products = {
+            product.pk: product
+            for product in queryset.filter(pk__in=list(product_ids)).order_by('pk')
+        }
+
+        missing = set(product_ids) - set(products)
+        if missing:
+            raise serializers.ValidationError(f"Error de stock: Productos no encontrados {sorted(missing)}")
+
+        return products
+
+    def _raise_insufficient_stock(self, requested):
+        """El UPDATE condicional no alcanzó: se relee el stock para indicar qué producto falló."""
+        for product in Product.objects.filter(pk__in=list(requested)).only('name', 'current_stock').order_by('pk'):
+            if product.current_stock < requested[product.pk]:
+                raise serializers.ValidationError(
+                    f"Error de stock: Stock insuficiente en {product.name}. Disponible: {product.current_stock}"
+                )
+        # Otra caja liberó stock entre el UPDATE y la relectura
+        raise serializers.ValidationError("Error de stock: El stock cambió durante la venta, intenta de nuevo.")
+
+    def _build_order_item(self, order, product_db, quantity, customer, tier_price=None):
+        """
+        Calcula los importes de una línea y regresa el OrderItems sin guardar.
+        Usa la fila de ProductPrice del nivel del cliente; sin ella, resuelve el precio con el producto.
+        """
+        if tier_price is not None:
+            selling_base_price = tier_price.base_price
+            selling_final_price = tier_price.final_price
+            promo_name = tier_price.promotion_name
+        else:
             selling_base_price, selling_final_price, promo_name = product_db.get_dynamic_price(customer)
 
-            line_subtotal = selling_base_price * quantity
-            unit_tax = selling_final_price - selling_base_price
-            line_tax = unit_tax * quantity
+        line_subtotal = selling_base_price * quantity
+        unit_tax = selling_final_price - selling_base_price
+        line_tax = unit_tax * quantity
 
-            unit_saving = product_db.price - selling_base_price
-            line_discount = unit_saving * quantity
-            
-            if line_discount < 0:
-                line_discount = Decimal("0.00")
+        unit_saving = product_db.price - selling_base_price
+        line_discount = unit_saving * quantity
 
-            OrderItems.objects.create(
-                order=order,
-                product=product_db,
-                quantity=quantity,
-                product_name=product_db.name,
-                unit_price=selling_base_price,        # Precio Base Unitario
-                amount=line_subtotal,         # Subtotal de la línea (Base)
-                tax_amount=line_tax,          # IVA calculado
-                discount_amount=line_discount, # Ahorro del producto
-                promotion_name=promo_name
-            )
+        if line_discount < 0:
+            line_discount = Decimal("0.00")
 
-            accumulated['subtotal'] += line_subtotal
-            accumulated['tax'] += line_tax
-            accumulated['savings'] += line_discount
-            accumulated['final_amount'] += (line_subtotal + line_tax)
+        return OrderItems(
+            order=order,
+            product=product_db,
+            quantity=quantity,
+            product_name=product_db.name,
+            unit_price=selling_base_price,        # Precio Base Unitario
+            amount=line_subtotal,         # Subtotal de la línea (Base)
+            tax_amount=line_tax,          # IVA calculado
+            discount_amount=line_discount, # Ahorro del producto
+            promotion_name=promo_name
+        )
 
-        return accumulated
+    def _accumulate_line(self, accumulated, order_item):
+        accumulated['subtotal'] += order_item.amount
+        accumulated['tax'] += order_item.tax_amount
+        accumulated['savings'] += order_item.discount_amount
+        accumulated['final_amount'] += (order_item.amount + order_item.tax_amount)
 
 
     def _calculate_tax_breakdown(self, product, base_amount):
@@ -284,6 +379,9 @@ class OrderPaymentSerializer(serializers.Serializer):
         """
         order = self.context['order']
         method = self.validated_data['payment_method']
+
+        # El barrido de apartados vencidos pudo cancelar la orden después de validate()
+        self._validate_order_status(Order.objects.select_for_update().only('status').get(pk=order.pk))
         
         if method == 'LOYALTY_POINTS':
             self._process_points_deduction(order)
@@ -293,6 +391,8 @@ class OrderPaymentSerializer(serializers.Serializer):
         order.payment_method = method
         order.status = 'PAID'
         order.save()
+
+        SalesRollupService.register_paid_orders([order])
         
         if order.customer:
             order.customer.accrue_points_from_order(
@@ -306,16 +406,9 @@ class OrderPaymentSerializer(serializers.Serializer):
     def _process_points_deduction(self, order):
         points_needed = math.ceil(order.final_amount)
         
-        PointsTransaction.objects.create(
-            customer=order.customer,
-            amount=-points_needed,
-            transaction_type='REDEEM',
-            order=order,
-            description=f"Pago Ticket #{order.ticket_folio}"
+        order.customer.apply_points(
+            -points_needed, 'REDEEM', description=f"Pago Ticket #{order.ticket_folio}", order=order
         )
-        # Actualización atómica
-        order.customer.current_points = models.F('current_points') - points_needed
-        order.customer.save()
         
         order.points_used = points_needed
 
@@ -343,15 +436,32 @@ class OrderCancelSerializer(serializers.ModelSerializer):
 
     def save(self, **kwargs):
         order = self.instance
-        
-        with transaction.atomic():
-            order_items = order.items.all()
-            for item in order_items:
-                product = item.product
-                product.current_stock = F('current_stock') + item.quantity
-                product.save()
-
-            order.status = 'CANCELLED'
-            order.save()
-            
-        return order
\ No newline at end of file
+        cancelled = OrderCancellationService.cancel([order.pk])
+        if cancelled:
+            order.status = cancelled[0].status
+            order.updated_at = cancelled[0].updated_at
+        return order
+
+
+class OrderBulkCancelSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=500
+    )
+
+    def save(self, **kwargs):
+        order_ids = list(dict.fromkeys(self.validated_data['order_ids']))
+        cancelled_ids = [order.pk for order in OrderCancellationService.cancel(order_ids)]
+        return {
+            "cancelled": cancelled_ids,
+            "skipped": [pk for pk in order_ids if pk not in set(cancelled_ids)],
+        }
+
+
+class EmailOutboxSerializer(serializers.ModelSerializer):
+    """Estado de entrega de un correo encolado (sin el contenido)."""
+    class Meta:
+        model = EmailOutbox
+        fields = ['id', 'recipient', 'subject', 'status', 'attempts', 'last_error', 'next_attempt_at', 'created_at', 'sent_at']
+        read_only_fields = fields
@@ -0,0 +1,235 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from analytics.services import SalesRollupService
+from products.models import Product
+from .models import EmailOutbox, Order, OrderItems
+
+
+class EmailOutboxService:
+    """
+    Cola de correos respaldada en la tabla EMAIL_OUTBOX.
+    enqueue() se llama dentro de la petición; deliver_batch() lo ejecuta el worker (send_queued_emails).
+    """
+    MAX_ATTEMPTS = 5
+    BACKOFF_BASE_SECONDS = 30
+    BACKOFF_MAX_SECONDS = 3600
+    # Tiempo que un lote queda reservado para un worker; si muere a medio envío, otro lo retoma después
+    LEASE_SECONDS = 300
+
+    @staticmethod
+    def get_from_email():
+        """Dirección remitente con fallbacks seguros. Cadena vacía si no hay ninguna configurada."""
+        return (
+            getattr(settings, 'DEFAULT_FROM_EMAIL', None)
+            or getattr(settings, 'EMAIL_HOST_USER', None)
+            or ''
+        ).strip()
+
+    @staticmethod
+    def enqueue(recipient, subject, body_text, body_html='', from_email='', order=None):
+        return EmailOutbox.objects.create(
+            order=order,
+            recipient=recipient,
+            from_email=from_email,
+            subject=subject,
+            body_text=body_text,
+            body_html=body_html,
+        )
+
+    @classmethod
+    def backoff(cls, attempts):
+        """Espera exponencial antes del siguiente intento: 30s, 60s, 120s... con tope de una hora."""
+        return timedelta(seconds=min(cls.BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), cls.BACKOFF_MAX_SECONDS))
+
+    @classmethod
+    def claim_batch(cls, batch_size):
+        """
+        Reserva hasta batch_size correos vencidos moviendo su next_attempt_at al final del lease.
+        Con skip_locked varios workers pueden correr en paralelo sin tomar las mismas filas.
+        """
+        now = timezone.now()
+
+        with transaction.atomic():
+            batch = list(
+                EmailOutbox.objects.select_for_update(skip_locked=True).filter(
+                    status='PENDING', next_attempt_at__lte=now
+                ).order_by('next_attempt_at', 'pk')[:batch_size]
+            )
+            EmailOutbox.objects.filter(pk__in=[email.pk for email in batch]).update(
+                next_attempt_at=now + timedelta(seconds=cls.LEASE_SECONDS)
+            )
+
+        return batch
+
+    @classmethod
+    def deliver_batch(cls, batch_size=50):
+        """
+        Envía un lote reutilizando una sola conexión SMTP.
+        Retorna {"sent": n, "retrying": m, "failed": k}.
+        """
+        batch = cls.claim_batch(batch_size)
+        stats = {"sent": 0, "retrying": 0, "failed": 0}
+        if not batch:
+            return stats
+
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as e:
+            # Sin conexión no se puede enviar nada del lote: todos se reprograman
+            for email in batch:
+                cls._register_failure(email, e, stats)
+        else:
+            try:
+                for email in batch:
+                    try:
+                        cls._build_message(email, connection).send()
+                    except Exception as e:
+                        cls._register_failure(email, e, stats)
+                    else:
+                        email.status = 'SENT'
+                        email.attempts += 1
+                        email.sent_at = timezone.now()
+                        email.last_error = ''
+                        stats["sent"] += 1
+            finally:
+                connection.close()
+
+        EmailOutbox.objects.bulk_update(
+            batch, ['status', 'attempts', 'sent_at', 'last_error', 'next_attempt_at']
+        )
+        return stats
+
+    @staticmethod
+    def _build_message(email, connection):
+        message = EmailMultiAlternatives(
+            subject=email.subject,
+            body=email.body_text,
+            from_email=email.from_email or None,
+            to=[email.recipient],
+            connection=connection,
+        )
+        if email.body_html:
+            message.attach_alternative(email.body_html, 'text/html')
+        return message
+
+    @classmethod
+    def _register_failure(cls, email, error, stats):
+        email.attempts += 1
+        email.last_error = str(error)
+
+        if email.attempts >= cls.MAX_ATTEMPTS:
+            email.status = 'FAILED'
+            stats["failed"] += 1
+        else:
+            email.next_attempt_at = timezone.now() + cls.backoff(email.attempts)
+            stats["retrying"] += 1
+
+
+class OrderCancellationService:
+    """
+    Cancelación de órdenes PENDING con devolución de stock basada en conjuntos:
+    el número de consultas no depende de cuántas órdenes ni cuántas líneas se cancelan.
+    """
+
+    @classmethod
+    def cancel(cls, order_ids):
+        """
+        Cancela las órdenes PENDING de order_ids en una sola transacción.
+        Las que no existen o ya no están PENDING se ignoran.
+        Retorna la lista de órdenes canceladas.
+        """
+        orders, _ = cls._cancel(order_ids)
+        return orders
+
+    @staticmethod
+    def hold_duration():
+        """
+        Tiempo que una orden PENDING puede retener stock antes de vencer (settings.ORDER_HOLD_MINUTES).
+        None si no está configurado: las órdenes PENDING no vencen.
+        """
+        minutes = getattr(settings, 'ORDER_HOLD_MINUTES', None)
+        return timedelta(minutes=minutes) if minutes else None
+
+    @classmethod
+    def hold_expires_at(cls, order):
+        duration = cls.hold_duration()
+        if duration is None or order.status != 'PENDING':
+            return None
+        return order.created_at + duration
+
+    @classmethod
+    def expire_pending(cls, now=None, chunk_size=500):
+        """
+        Cancela por lotes las órdenes PENDING cuyo apartado venció (created_at + ORDER_HOLD_MINUTES).
+        Sin ORDER_HOLD_MINUTES no cancela nada.
+        El barrido usa el índice (status, created_at); cada lote se cancela con _cancel.
+        Retorna {"orders": n, "units": m}.
+        """
+        stats = {"orders": 0, "units": 0}
+        duration = cls.hold_duration()
+        if duration is None:
+            return stats
+
+        cutoff = (now or timezone.now()) - duration
+
+        while True:
+            chunk = list(
+                Order.objects.filter(status='PENDING', created_at__lt=cutoff)
+                .order_by('created_at')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            orders, restored = cls._cancel(chunk)
+            stats["orders"] += len(orders)
+            stats["units"] += sum(restored.values())
+
+            if len(chunk) < chunk_size:
+                break
+
+        return stats
+
+    @staticmethod
+    def _cancel(order_ids):
+        """Retorna (órdenes canceladas, {product_id: unidades devueltas})."""
+        with transaction.atomic():
+            orders = list(
+                Order.objects.select_for_update().filter(pk__in=order_ids, status='PENDING').order_by('pk')
+            )
+            if not orders:
+                return [], {}
+
+            order_pks = [order.pk for order in orders]
+
+            # Unidades a devolver por orden y producto; el UPDATE usa el total por producto
+            returned = list(
+                OrderItems.objects.filter(order__in=order_pks, product__isnull=False)
+                .values('order', 'product')
+                .annotate(total=Sum('quantity'))
+                .values_list('product', 'order', 'total')
+            )
+            restored = {}
+            for product_id, _, total in returned:
+                restored[product_id] = restored.get(product_id, 0) + total
+
+            # Mismo orden de bloqueo que el checkout (por pk) para evitar deadlocks
+            list(Product.objects.select_for_update().filter(pk__in=list(restored)).order_by('pk').values_list('pk', flat=True))
+            Product.apply_stock_deltas(restored, 'CANCELLATION', entries=returned)
+
+            now = timezone.now()
+            Order.objects.filter(pk__in=order_pks).update(status='CANCELLED', updated_at=now)
+            for order in orders:
+                order.status = 'CANCELLED'
+                order.updated_at = now
+
+            SalesRollupService.register_cancelled_orders(orders)
+
+        return orders, restored
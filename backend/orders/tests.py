@@ -3,13 +3,28 @@ from rest_framework import status
 from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from smtplib import SMTPException
+from unittest import mock
+from io import StringIO
+import csv
+import json
+from types import SimpleNamespace
 from decimal import Decimal
 from datetime import date, timedelta
 
-from products.models import Product, Promotion
+from products.models import Product, ProductPrice, Promotion
 from suppliers.models import Supplier
 from customers.models import Customer, PointsTransaction
-from .models import Order
+from .models import Order, OrderItems, EmailOutbox, IdempotencyKey
+from .serializers import OrderSerializer
+from .services import EmailOutboxService
+from .tickets import TicketRenderer
 
 User = get_user_model()
 
@@ -104,6 +119,94 @@ class OrderUnitTests(BaseOrderTestCase):
 
 class OrderIntegrationTests(BaseOrderTestCase):
 
+    def test_checkout_query_count_does_not_depend_on_promoted_lines(self):
+        self._disable_promotions()
+        products = [
+            Product.objects.create(name=f"Prod {i}", sku=f"Q-{i}", price=10, current_stock=100, supplier=self.supplier)
+            for i in range(10)
+        ]
+        promoted, plain = products[:5], products[5:]
+        for product in promoted:
+            Promotion.objects.create(
+                name=f"Promo {product.sku}", description="D", discount_percent=10, start_date=date.today(),
+                end_date=date.today() + timedelta(days=5), target_audience="ALL", product=product, is_active=True
+            )
+
+        def checkout(cart):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.list_url, {
+                    "items": [{"product_id": product.id, "quantity": 1} for product in cart]
+                }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        # Mismo número de líneas: con o sin promoción se ejecutan las mismas consultas
+        baseline = checkout(plain)
+        self.assertEqual(checkout(promoted), baseline)
+
+        # Sin filas en la tabla de precios se usa get_dynamic_price, que tampoco carga la promoción
+        ProductPrice.objects.all().delete()
+        self.assertEqual(checkout(promoted), baseline)
+
+    def test_checkout_recalculates_promotion_after_price_edit(self):
+        items = [{"product_id": self.product.id, "quantity": 1}]
+
+        # Edición desde la API con la promoción del 10% corriendo
+        self.client.patch(reverse('product-detail', kwargs={'pk': self.product.pk}), {"price": "200.00"}, format='json')
+        response = self.client.post(self.list_url, {"items": items}, format='json')
+        self.assertEqual(Decimal(response.data['final_amount']), Decimal('180.00'))
+
+        # Precio cambiado sin pasar por save(): el checkout detecta el descuento desfasado
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('300.00'))
+        response = self.client.post(self.list_url, {"items": items}, format='json')
+        self.assertEqual(Decimal(response.data['final_amount']), Decimal('270.00'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.discounted_price, Decimal('270.00'))
+
+    def test_checkout_charges_the_price_table_row_of_the_customer_tier(self):
+        vip_product = Product.objects.create(name="VIP", sku="SKU-VIP", price=200, current_stock=10, supplier=self.supplier, tax_rate='16.00')
+        Promotion.objects.create(
+            name="Solo VIP", description="D", discount_percent=50, start_date=date.today(), end_date=date.today() + timedelta(days=5),
+            target_audience="FREQUENT_ONLY", product=vip_product, is_active=True
+        )
+        items = [{"product_id": vip_product.id, "quantity": 2}]
+
+        self.customer.is_frequent = False
+        self.customer.save()
+        regular = self.client.post(self.list_url, {"customer": self.customer.id, "items": items}, format='json')
+        self.assertEqual(Decimal(regular.data['final_amount']), Decimal('464.00'))
+        self.assertIsNone(regular.data['items'][0]['promotion_name'])
+
+        self.customer.is_frequent = True
+        self.customer.save()
+        frequent = self.client.post(self.list_url, {"customer": self.customer.id, "items": items}, format='json')
+        self.assertEqual(Decimal(frequent.data['final_amount']), Decimal('232.00'))
+        self.assertEqual(frequent.data['items'][0]['promotion_name'], "Solo VIP")
+
+    def test_price_table_totals_match_dynamic_price_for_percentage_promos(self):
+        """Con la tabla de precios el checkout cobra lo mismo que con get_dynamic_price."""
+        self._disable_promotions()
+        general = Product.objects.create(name="Gral", sku="PCT-G", price=Decimal('10.01'), current_stock=100, supplier=self.supplier, tax_rate='16.00')
+        frequent_only = Product.objects.create(name="Frec", sku="PCT-F", price=Decimal('10.01'), current_stock=100, supplier=self.supplier, tax_rate='16.00')
+        for product, audience in ((general, "ALL"), (frequent_only, "FREQUENT_ONLY")):
+            Promotion.objects.create(
+                name=f"15% {product.sku}", description="D", discount_percent=15, start_date=date.today(),
+                end_date=date.today() + timedelta(days=5), target_audience=audience, product=product, is_active=True
+            )
+        items = [{"product_id": general.id, "quantity": 3}, {"product_id": frequent_only.id, "quantity": 7}]
+
+        def totals(is_frequent):
+            self.customer.is_frequent = is_frequent
+            self.customer.save()
+            response = self.client.post(self.list_url, {"customer": self.customer.id, "items": items}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            order = Order.objects.get(pk=response.data['id'])
+            return order.subtotal, order.total_tax, order.final_amount
+
+        with_table = [totals(False), totals(True)]
+        ProductPrice.objects.all().delete()
+        self.assertEqual([totals(False), totals(True)], with_table)
+
     def test_atomic_transaction_integrity(self):
         """Si un producto falla (stock), la relación con DB debe hacer rollback completo."""
         product_2 = Product.objects.create(name="Prod 2", sku="SKU-2", price=50, current_stock=1, supplier=self.supplier)
@@ -117,6 +220,95 @@ class OrderIntegrationTests(BaseOrderTestCase):
         self.assertEqual(self.product.current_stock, 10) # No interactuó con el stock final
         self.assertEqual(Order.objects.count(), 0)
 
+    def test_duplicate_lines_share_stock_validation(self):
+        """Dos líneas del mismo producto se validan contra el stock sumado."""
+        response = self.client.post(self.list_url, {
+            "items": [{"product_id": self.product.id, "quantity": 6}, {"product_id": self.product.id, "quantity": 6}]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 10)
+
+    def test_batched_checkout_query_count_does_not_grow_with_lines(self):
+        """El checkout por lotes usa las mismas consultas para 1 o 5 líneas."""
+        self._disable_promotions()
+        products = [
+            Product.objects.create(name=f"Lote {i}", sku=f"LOTE-{i}", price=10, current_stock=5, supplier=self.supplier)
+            for i in range(5)
+        ]
+        serializer = OrderSerializer(context={'request': SimpleNamespace(user=self.seller)})
+
+        def count_queries(cart):
+            order = Order.objects.create(seller=self.seller)
+            with CaptureQueriesContext(connection) as ctx:
+                serializer._create_items_and_calculate_totals(
+                    order, [{'product': p, 'quantity': 1} for p in cart]
+                )
+            return len(ctx.captured_queries)
+
+        self.assertEqual(count_queries(products[:1]), count_queries(products))
+        products[-1].refresh_from_db()
+        self.assertEqual(products[-1].current_stock, 4)
+
+    def test_checkout_applies_promotion_that_started_today(self):
+        """Sin correr el scheduler, el checkout resuelve la promoción del producto en el carrito."""
+        self._disable_promotions()
+        self._set_no_birthday()
+        promo = Promotion.objects.create(
+            name="Desde hoy", description="Test", discount_percent=20.00,
+            start_date=date.today() + timedelta(days=1), end_date=date.today() + timedelta(days=30),
+            target_audience="ALL", product=self.product, is_active=True
+        )
+        Promotion.objects.filter(pk=promo.pk).update(start_date=date.today())
+
+        response = self.client.post(self.list_url, {"items": [{"product_id": self.product.id, "quantity": 1}]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(response.data['final_amount']), Decimal('80.00'))
+        self.assertEqual(response.data['items'][0]['promotion_name'], "Desde hoy")
+
+    def test_checkout_does_not_rewrite_unrelated_promoted_products(self):
+        """Las promociones de productos fuera del carrito no se tocan en el checkout."""
+        other = Product.objects.create(name="Otro", sku="SKU-OTRO", price=50, current_stock=5, supplier=self.supplier)
+        Promotion.objects.create(
+            name="Otra promo", description="Test", discount_percent=10.00,
+            start_date=date.today() - timedelta(days=1), end_date=date.today() + timedelta(days=30),
+            target_audience="ALL", product=other, is_active=True
+        )
+        updated_at = Product.objects.get(pk=other.pk).updated_at
+
+        self.client.post(self.list_url, {"items": [{"product_id": self.product.id, "quantity": 1}]}, format='json')
+
+        self.assertEqual(Product.objects.get(pk=other.pk).updated_at, updated_at)
+
+    @override_settings(OPTIMISTIC_STOCK_DECREMENT=True)
+    def test_optimistic_checkout_decrements_without_locking(self):
+        self._disable_promotions()
+        other = Product.objects.create(name="Otro", sku="SKU-OPT", price=10, current_stock=1, supplier=self.supplier)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.list_url, {"items": [{"product_id": self.product.id, "quantity": 3}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(any('FOR UPDATE' in q['sql'] for q in ctx.captured_queries))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 7)
+
+        # El stock cambia después de validar: el UPDATE condicional rechaza todo el carrito
+        self.assertFalse(Product.try_decrement_stock({self.product.pk: 1, other.pk: 2}))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 7)
+
+        with mock.patch.object(Product, 'check_stock'):
+            response = self.client.post(self.list_url, {"items": [
+                {"product_id": self.product.id, "quantity": 1}, {"product_id": other.id, "quantity": 2}
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Stock insuficiente en Otro. Disponible: 1", str(response.data))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 7)
+        self.assertEqual(Order.objects.count(), 1)
+
     def test_cancel_pending_order_restores_stock(self):
         """Prueba la interfaz bidireccional: Cancelar orden -> Restaurar stock en Producto."""
         self._disable_promotions()
@@ -127,6 +319,92 @@ class OrderIntegrationTests(BaseOrderTestCase):
         self.product.refresh_from_db()
         self.assertEqual(self.product.current_stock, 10) 
 
+    def _create_pending_orders(self, count, products):
+        return [
+            self.client.post(self.list_url, {"items": [{"product_id": p.id, "quantity": 1} for p in products]}, format='json').data['id']
+            for _ in range(count)
+        ]
+
+    def test_bulk_cancel_restores_stock_with_constant_query_count(self):
+        self._disable_promotions()
+        self.client.force_authenticate(user=User.objects.create_user(username='owner', email='o@test.com', password='pass', role='OWNER'))
+        products = [self.product] + [
+            Product.objects.create(name=f"Bulk {i}", sku=f"BULK-{i}", price=10, current_stock=20, supplier=self.supplier)
+            for i in range(4)
+        ]
+        url = reverse('order-bulk-cancel')
+
+        small = self._create_pending_orders(2, products[:2])
+        with CaptureQueriesContext(connection) as small_ctx:
+            response = self.client.post(url, {"order_ids": small}, format='json')
+        self.assertEqual(response.data, {"cancelled": small, "skipped": []})
+
+        large = self._create_pending_orders(5, products)
+        paid = large.pop()
+        Order.objects.filter(pk=paid).update(status='PAID')
+        with CaptureQueriesContext(connection) as large_ctx:
+            response = self.client.post(url, {"order_ids": large + [paid, 999999]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"cancelled": large, "skipped": [paid, 999999]})
+        # Más órdenes y más líneas no agregan consultas
+        self.assertEqual(len(large_ctx.captured_queries), len(small_ctx.captured_queries))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 9)  # solo la orden pagada conserva su unidad
+        self.assertEqual(Product.objects.get(sku="BULK-3").current_stock, 19)
+        self.assertEqual(Order.objects.filter(pk__in=small + large, status='CANCELLED').count(), 6)
+
+    @override_settings(ORDER_HOLD_MINUTES=30)
+    def test_sweeper_cancels_expired_pending_orders_in_chunks(self):
+        self._disable_promotions()
+        order_ids = self._create_pending_orders(3, [self.product])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 7)
+
+        fresh = Order.objects.get(pk=order_ids[2])
+        self.assertEqual(
+            OrderSerializer(fresh).data['hold_expires_at'],
+            OrderSerializer().fields['created_at'].to_representation(fresh.created_at + timedelta(minutes=30))
+        )
+
+        Order.objects.filter(pk__in=order_ids[:2]).update(created_at=timezone.now() - timedelta(hours=2))
+
+        out = StringIO()
+        call_command('release_expired_holds', '--chunk-size', '1', stdout=out)
+
+        self.assertIn("Órdenes PENDING vencidas: 2 (unidades devueltas al stock: 2)", out.getvalue())
+        self.assertEqual(
+            list(Order.objects.filter(pk__in=order_ids).order_by('pk').values_list('status', flat=True)),
+            ['CANCELLED', 'CANCELLED', 'PENDING']
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 9)
+
+        # Una orden ya vencida y cancelada no se puede cobrar
+        res_pay = self.client.post(self._get_pay_url(order_ids[0]), {"payment_method": "CASH"}, format='json')
+        self.assertEqual(res_pay.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(ORDER_HOLD_MINUTES=None)
+    def test_pending_orders_do_not_expire_without_hold_setting(self):
+        self._disable_promotions()
+        order_ids = self._create_pending_orders(1, [self.product])
+        Order.objects.filter(pk__in=order_ids).update(created_at=timezone.now() - timedelta(days=2))
+
+        out = StringIO()
+        call_command('release_expired_holds', stdout=out)
+
+        self.assertIn("ORDER_HOLD_MINUTES no está configurado", out.getvalue())
+        order = Order.objects.get(pk=order_ids[0])
+        self.assertEqual(order.status, 'PENDING')
+        self.assertIsNone(OrderSerializer(order).data['hold_expires_at'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 9)
+
+    def test_employee_cannot_bulk_cancel(self):
+        response = self.client.post(reverse('order-bulk-cancel'), {"order_ids": [1]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
 
 class OrderFunctionalTests(BaseOrderTestCase):
 
@@ -233,6 +511,107 @@ class OrderSystemTests(BaseOrderTestCase):
         self.assertEqual(self.customer.available_credit, Decimal('1900.00'))
 
 
+@override_settings(DEFAULT_FROM_EMAIL='tienda@test.com')
+class OrderTicketEmailTests(BaseOrderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.order = Order.objects.create(customer=self.customer, seller=self.seller, status='PAID', final_amount=100)
+
+    def _send_email_url(self):
+        return reverse('order-send-ticket-email', kwargs={'pk': self.order.id})
+
+    def test_send_email_is_queued_and_delivered_by_worker(self):
+        for address in ('a@test.com', 'b@test.com', 'c@test.com'):
+            response = self.client.post(self._send_email_url(), {"email": address}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data['email']['status'], 'PENDING')
+
+        # La petición no toca SMTP
+        self.assertEqual(len(mail.outbox), 0)
+
+        out = StringIO()
+        call_command('send_queued_emails', '--batch-size', '10', stdout=out)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn(f"Orden #{self.order.id}", mail.outbox[0].subject)
+        self.assertEqual(mail.outbox[0].alternatives[0].mimetype, 'text/html')
+        self.assertIn("Enviados: 3", out.getvalue())
+
+        response = self.client.get(reverse('order-emails', kwargs={'pk': self.order.id}))
+        self.assertEqual({email['status'] for email in response.data}, {'SENT'})
+
+    def test_invalid_recipient_is_rejected(self):
+        response = self.client.post(self._send_email_url(), {"email": "no-es-correo"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_failed_delivery_is_retried_with_backoff_then_marked_failed(self):
+        self.client.post(self._send_email_url(), {"email": "a@test.com"}, format='json')
+
+        with mock.patch('orders.services.EmailMultiAlternatives.send', side_effect=SMTPException("boom")):
+            self.assertEqual(EmailOutboxService.deliver_batch(), {"sent": 0, "retrying": 1, "failed": 0})
+
+            email = EmailOutbox.objects.get()
+            self.assertEqual(email.attempts, 1)
+            self.assertEqual(email.last_error, "boom")
+            self.assertGreater(email.next_attempt_at, timezone.now())
+
+            # Aún no vence el backoff: el worker no lo vuelve a tomar
+            self.assertEqual(EmailOutboxService.deliver_batch(), {"sent": 0, "retrying": 0, "failed": 0})
+
+            EmailOutbox.objects.filter(pk=email.pk).update(
+                attempts=EmailOutboxService.MAX_ATTEMPTS - 1, next_attempt_at=timezone.now()
+            )
+            self.assertEqual(EmailOutboxService.deliver_batch(), {"sent": 0, "retrying": 0, "failed": 1})
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'FAILED')
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class OrderTicketRenderTests(BaseOrderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.order = Order.objects.create(customer=self.customer, status='PAID', payment_method='CASH', final_amount=Decimal('180.00'))
+        OrderItems.objects.create(
+            order=self.order, product=self.product, product_name="Refresco <Cola>", quantity=2,
+            unit_price=Decimal('90.00'), amount=Decimal('180.00')
+        )
+        self.url = reverse('order-ticket', kwargs={'pk': self.order.id})
+
+    def test_ticket_endpoint_renders_html_text_and_json(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertIn("Refresco &lt;Cola&gt;", response.content.decode())
+        self.assertIn("TOTAL: $180.00", response.content.decode())
+
+        response = self.client.get(self.url, {"format": "txt"})
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn("2 x Refresco <Cola>", text)
+        self.assertIn("Método de Pago: Efectivo", text)
+        self.assertNotIn("<td", text)
+
+        response = self.client.get(self.url, {"format": "json"})
+        self.assertEqual(response.json()['order'], self.order.id)
+
+    def test_rendered_ticket_is_cached_until_order_changes(self):
+        TicketRenderer.render(self.order)
+
+        # Caché: sin consulta de ítems ni render
+        with self.assertNumQueries(0):
+            subject, text, html = TicketRenderer.build_email(self.order)
+        self.assertIn(f"Orden #{self.order.id}", subject)
+
+        self.order.payment_method = 'CARD'
+        self.order.save()
+        self.assertIn("Método de Pago: Tarjeta", TicketRenderer.render(self.order)["text"])
+
+
 class OrderAcceptanceTests(BaseOrderTestCase):
 
     def test_complete_happy_path_sale_and_rewards(self):
@@ -269,4 +648,98 @@ class OrderAcceptanceTests(BaseOrderTestCase):
         self.assertEqual(order.status, 'PAID')
 
         self.customer.refresh_from_db()
-        self.assertEqual(self.customer.current_points, 2) 
\ No newline at end of file
+        self.assertEqual(self.customer.current_points, 2) 
+
+class OrderExportTests(BaseOrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(
+            username='admin_export', email='admin@test.com', password='pass', role='ADMIN'
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('order-export')
+
+        self.order = Order.objects.create(status='PAID', customer=self.customer, subtotal=300, final_amount=300)
+        for quantity in (1, 2):
+            OrderItems.objects.create(
+                order=self.order, product=self.product, product_name="Producto, Test", quantity=quantity,
+                unit_price=Decimal('100.00'), amount=Decimal('100.00') * quantity
+            )
+        self.empty_order = Order.objects.create(status='PENDING')
+
+        old_order = Order.objects.create(status='PAID', final_amount=50)
+        Order.objects.filter(pk=old_order.pk).update(created_at=timezone.now() - timedelta(days=400))
+
+    def _params(self, export_format):
+        today = timezone.localdate()
+        return {"start": (today - timedelta(days=1)).isoformat(), "end": today.isoformat(), "format": export_format}
+
+    def test_csv_export_streams_one_row_per_item(self):
+        response = self.client.get(self.url, self._params('csv'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['order_id'] for row in rows], [str(self.order.id)] * 2 + [str(self.empty_order.id)])
+        self.assertEqual([row['quantity'] for row in rows], ['1', '2', ''])
+        self.assertEqual(rows[0]['product_name'], "Producto, Test")
+
+    def test_ndjson_export_groups_items_by_order(self):
+        response = self.client.get(self.url, self._params('ndjson'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['id'] for line in lines], [self.order.id, self.empty_order.id])
+        self.assertEqual([item['quantity'] for item in lines[0]['items']], [1, 2])
+        self.assertEqual(lines[0]['customer_id'], self.customer.id)
+        self.assertEqual(lines[1]['items'], [])
+
+    def test_export_requires_valid_dates_and_admin(self):
+        response = self.client.get(self.url, {"start": "2025-13-01", "format": "csv"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.seller)
+        response = self.client.get(self.url, self._params('csv'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class OrderIdempotencyTests(BaseOrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self._disable_promotions()
+        self.payload = {"items": [{"product_id": self.product.id, "quantity": 2}]}
+
+    def _post(self, key, payload=None):
+        return self.client.post(self.list_url, payload or self.payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_returns_stored_response_without_creating_again(self):
+        first = self._post('till-1-abc')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        with mock.patch.object(OrderSerializer, 'create') as create:
+            retry = self._post('till-1-abc')
+            create.assert_not_called()
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['id'], first.data['id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 8)
+
+        # Misma llave con otro carrito: se rechaza
+        other = self._post('till-1-abc', {"items": [{"product_id": self.product.id, "quantity": 1}]})
+        self.assertEqual(other.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_failed_requests_are_not_stored_and_expired_keys_are_purged(self):
+        failed = self._post('till-1-xyz', {"items": [{"product_id": self.product.id, "quantity": 50}]})
+        self.assertEqual(failed.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        self.assertEqual(self._post('till-1-xyz').status_code, status.HTTP_201_CREATED)
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        call_command('purge_idempotency_keys', '--chunk-size', '1', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
@@ -0,0 +1,75 @@
+from functools import cache
+
+from django.core.cache import cache as render_cache
+from django.template.loader import get_template
+from django.utils import timezone
+
+
+PAYMENT_DISPLAY = {
+    'CASH': 'Efectivo',
+    'CARD': 'Tarjeta',
+    'STORE_CREDIT': 'Crédito Tienda',
+    'LOYALTY_POINTS': 'Puntos',
+}
+
+
+@cache
+def _templates():
+    """Las plantillas se cargan y compilan una sola vez por proceso."""
+    return get_template('orders/ticket.html'), get_template('orders/ticket.txt')
+
+
+class TicketRenderer:
+    """
+    Renderiza el ticket de una orden en HTML y texto plano.
+    El resultado se guarda en el caché de Django con llave (id, updated_at),
+    así reenvíos y reimpresiones no vuelven a consultar ítems ni a renderizar.
+    """
+    CACHE_TIMEOUT = 60 * 60 * 24
+
+    @staticmethod
+    def cache_key(order):
+        return f"orders:ticket:{order.pk}:{order.updated_at.timestamp()}"
+
+    @classmethod
+    def render(cls, order):
+        """Retorna {"html": str, "text": str}."""
+        key = cls.cache_key(order)
+        rendered = render_cache.get(key)
+        if rendered is None:
+            context = cls._build_context(order)
+            html_template, text_template = _templates()
+            rendered = {
+                "html": html_template.render(context),
+                "text": text_template.render(context),
+            }
+            render_cache.set(key, rendered, cls.CACHE_TIMEOUT)
+        return rendered
+
+    @classmethod
+    def build_email(cls, order):
+        """Retorna (subject, plain_message, html_message) para el correo del ticket."""
+        rendered = cls.render(order)
+        return f'Tu ticket de compra - Orden #{order.id}', rendered["text"], rendered["html"]
+
+    @staticmethod
+    def _build_context(order):
+        customer = order.customer
+
+        return {
+            "order_id": order.id,
+            "folio": order.ticket_folio,
+            "date": timezone.localtime(order.created_at).strftime('%d/%m/%Y %H:%M'),
+            "customer_name": f"{customer.first_name} {customer.last_name}" if customer else 'Cliente Visitante',
+            "items": [
+                {
+                    "name": item.product_name,
+                    "quantity": item.quantity,
+                    "unit_price": f"{item.unit_price:.2f}",
+                    "amount": f"{item.amount:.2f}",
+                }
+                for item in order.items.all()
+            ],
+            "payment_display": PAYMENT_DISPLAY.get(order.payment_method, order.payment_method or 'N/A'),
+            "total": f"{order.final_amount:.2f}",
+        }
@@ -1,13 +1,22 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer, StaticHTMLRenderer
 from django.db import transaction
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.conf import settings
-from .models import Order
-from .serializers import OrderSerializer, OrderPaymentSerializer, OrderCancelSerializer
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from datetime import date
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from .models import IdempotencyKey, Order
+from .serializers import (
+    OrderSerializer, OrderPaymentSerializer, OrderCancelSerializer, OrderBulkCancelSerializer, EmailOutboxSerializer
+)
+from .services import EmailOutboxService
+from .tickets import TicketRenderer
+from .renderers import PlainTextRenderer, CSVRenderer, NDJSONRenderer
+from .exports import OrderExportService
+from analytics.services import DateRangeService
 from .permissions import IsAdminOrOwner
 
 class OrderViewSet(viewsets.ModelViewSet):
@@ -15,17 +24,66 @@ class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
 
     def get_permissions(self):
-        if self.action in ['update', 'partial_update', 'destroy']:
+        if self.action in ['update', 'partial_update', 'destroy', 'bulk_cancel', 'export']:
             return [IsAdminOrOwner()]
         return [permissions.IsAuthenticated()]
 
+    def get_queryset(self):
+        if self.action in ('ticket', 'send_ticket_email'):
+            # El renderer solo carga los ítems si el ticket no está en caché
+            return Order.objects.select_related('customer')
+        return super().get_queryset()
+
     def get_serializer_class(self):
         if self.action == 'pay':
             return OrderPaymentSerializer
         if self.action == 'cancel':
             return OrderCancelSerializer
+        if self.action == 'bulk_cancel':
+            return OrderBulkCancelSerializer
         return OrderSerializer
 
+    def create(self, request, *args, **kwargs):
+        """
+        Con el header Idempotency-Key un reintento del POS regresa la orden ya creada
+        (con el header Idempotent-Replayed: true) en vez de crear otra y descontar stock dos veces.
+        """
+        key = request.headers.get('Idempotency-Key', '').strip()
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"error": "Idempotency-Key must be at most 255 characters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = IdempotencyKey.hash_request(request.method, request.path, request.data)
+        now = timezone.now()
+
+        # La llave y la orden se confirman juntas. Un reintento concurrente espera en el índice único
+        # hasta que termina el primero y después lee su respuesta guardada.
+        with transaction.atomic():
+            record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+                user=request.user, key=key,
+                defaults={"request_hash": request_hash, "expires_at": now + IdempotencyKey.ttl()}
+            )
+
+            if not created and record.expires_at > now:
+                if record.request_hash != request_hash:
+                    return Response(
+                        {"error": "Idempotency-Key was already used with a different request."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                return Response(record.response_body, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+            # Si falla (400) la transacción se revierte con todo y llave, así el reintento vuelve a ejecutarse
+            response = super().create(request, *args, **kwargs)
+
+            record.request_hash = request_hash
+            record.status_code = response.status_code
+            record.response_body = response.data
+            record.expires_at = now + IdempotencyKey.ttl()
+            record.save()
+
+        return response
+
     @action(detail=True, methods=['post'], url_path='pay')
     def pay(self, request, pk=None):
         """
@@ -67,10 +125,24 @@ class OrderViewSet(viewsets.ModelViewSet):
             
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], url_path='bulk-cancel')
+    def bulk_cancel(self, request):
+        """
+        Cancela varias órdenes PENDING en una sola transacción y devuelve su stock.
+        Ruta: POST /api/orders/bulk-cancel/
+        Body: { "order_ids": [101, 102, 103] }
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+
+        return Response(result, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'], url_path='send-email')
     def send_ticket_email(self, request, pk=None):
         """
-        Envía el ticket de una orden por correo electrónico.
+        Encola el ticket de una orden para enviarlo por correo electrónico.
+        El envío real lo hace el worker `send_queued_emails`; aquí solo se guarda en el outbox.
         Ruta: POST /api/orders/{id}/send-email/
         Body: { "email": "cliente@ejemplo.com" }
         """
@@ -83,72 +155,15 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        items = order.items.all()
-        payment_display = {
-            'CASH': 'Efectivo',
-            'CARD': 'Tarjeta',
-            'STORE_CREDIT': 'Crédito Tienda',
-            'LOYALTY_POINTS': 'Puntos',
-        }.get(order.payment_method, order.payment_method or 'N/A')
-
-        # Construir tabla de ítems en HTML
-        items_rows = ''.join(
-            f"""<tr>
-                <td style='padding:8px;border-bottom:1px solid #eee;'>{item.product_name}</td>
-                <td style='padding:8px;border-bottom:1px solid #eee;text-align:center;'>{item.quantity}</td>
-                <td style='padding:8px;border-bottom:1px solid #eee;text-align:right;'>${float(item.unit_price):.2f}</td>
-                <td style='padding:8px;border-bottom:1px solid #eee;text-align:right;'>${float(item.amount):.2f}</td>
-            </tr>"""
-            for item in items
-        )
+        try:
+            validate_email(recipient_email)
+        except DjangoValidationError:
+            return Response(
+                {'error': 'El campo "email" no es una dirección válida.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        customer_name = order.customer.first_name + ' ' + order.customer.last_name if order.customer else 'Cliente Visitante'
-
-        html_message = f"""
-        <html><body style='font-family:Arial,sans-serif;background:#f4f4f4;margin:0;padding:0;'>
-          <div style='max-width:600px;margin:30px auto;background:#fff;border-radius:10px;overflow:hidden;box-shadow:0 2px 8px rgba(0,0,0,0.1);'>
-            <div style='background:#1a1a2e;color:#fff;padding:24px;text-align:center;'>
-              <h1 style='margin:0;font-size:24px;letter-spacing:2px;'>🧾 TICKET DE VENTA</h1>
-              <p style='margin:6px 0 0;opacity:.75;'>Orden #{order.id} &nbsp;&bull;&nbsp; Folio: {order.ticket_folio}</p>
-            </div>
-            <div style='padding:24px;'>
-              <table style='width:100%;margin-bottom:16px;'>
-                <tr>
-                  <td><strong>Fecha:</strong> {order.created_at.strftime('%d/%m/%Y %H:%M')}</td>
-                  <td style='text-align:right;'><strong>Cliente:</strong> {customer_name}</td>
-                </tr>
-              </table>
-              <table style='width:100%;border-collapse:collapse;'>
-                <thead>
-                  <tr style='background:#f0f0f0;'>
-                    <th style='padding:10px;text-align:left;'>Producto</th>
-                    <th style='padding:10px;text-align:center;'>Cant.</th>
-                    <th style='padding:10px;text-align:right;'>P. Unitario</th>
-                    <th style='padding:10px;text-align:right;'>Subtotal</th>
-                  </tr>
-                </thead>
-                <tbody>{items_rows}</tbody>
-              </table>
-              <div style='margin-top:20px;text-align:right;'>
-                <p style='margin:4px 0;'><strong>Método de Pago:</strong> {payment_display}</p>
-                <p style='margin:4px 0;font-size:20px;font-weight:bold;color:#1a1a2e;'>TOTAL: ${float(order.final_amount):.2f}</p>
-              </div>
-            </div>
-            <div style='background:#f8f8f8;text-align:center;padding:16px;font-size:12px;color:#888;'>
-              Gracias por su compra. Este es un comprobante automático.
-            </div>
-          </div>
-        </body></html>
-        """
-
-        plain_message = strip_tags(html_message)
-
-        # Determinar la dirección remitente con fallbacks seguros
-        from_email = (
-            getattr(settings, 'DEFAULT_FROM_EMAIL', None)
-            or getattr(settings, 'EMAIL_HOST_USER', None)
-            or ''
-        ).strip()
+        from_email = EmailOutboxService.get_from_email()
 
         if not from_email:
             return Response(
@@ -157,21 +172,81 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        subject, plain_message, html_message = TicketRenderer.build_email(order)
+
+        email = EmailOutboxService.enqueue(
+            recipient=recipient_email,
+            subject=subject,
+            body_text=plain_message,
+            body_html=html_message,
+            from_email=from_email,
+            order=order,
+        )
+
+        return Response(
+            {
+                'detail': f'Ticket en cola de envío a {recipient_email}.',
+                'email': EmailOutboxSerializer(email).data,
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=True, methods=['get'], url_path='emails')
+    def emails(self, request, pk=None):
+        """
+        Estado de entrega de los correos de una orden.
+        Ruta: GET /api/orders/{id}/emails/
+        """
+        order = self.get_object()
+        return Response(EmailOutboxSerializer(order.emails.order_by('-created_at'), many=True).data)
+
+    @action(
+        detail=True, methods=['get'], url_path='ticket',
+        renderer_classes=[StaticHTMLRenderer, PlainTextRenderer, JSONRenderer]
+    )
+    def ticket(self, request, pk=None):
+        """
+        Ticket listo para imprimir.
+        Ruta: GET /api/orders/{id}/ticket/ (HTML), ?format=txt (texto plano) o ?format=json (ambos)
+        """
+        order = self.get_object()
+        rendered = TicketRenderer.render(order)
+
+        if request.accepted_renderer.format == 'txt':
+            return Response(rendered["text"])
+        if request.accepted_renderer.format == 'json':
+            return Response({"order": order.id, "html": rendered["html"], "text": rendered["text"]})
+        return Response(rendered["html"])
+
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Exporta órdenes e ítems en streaming, sin paginar ni serializar en memoria.
+        Ruta: GET /api/orders/export/?start=2025-01-01&end=2025-12-31&format=csv|ndjson
+        """
         try:
-            send_mail(
-                subject=f'Tu ticket de compra - Orden #{order.id}',
-                message=plain_message,
-                from_email=from_email,
-                recipient_list=[recipient_email],
-                html_message=html_message,
-                fail_silently=False,
-            )
+            start_date = date.fromisoformat(request.query_params.get('start', ''))
+            end_param = request.query_params.get('end')
+            end_date = date.fromisoformat(end_param) if end_param else timezone.localdate()
+        except ValueError:
             return Response(
-                {'detail': f'Ticket enviado exitosamente a {recipient_email}.'},
-                status=status.HTTP_200_OK
+                {"error": "Query params 'start' (required) and 'end' must be dates in YYYY-MM-DD format."},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        except Exception as e:
-            return Response(
-                {'error': f'Error al enviar el correo: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+        if end_date < start_date:
+            return Response({"error": "'end' must be on or after 'start'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        start, end = DateRangeService.get_bounds(start_date, end_date)
+        export_format = request.accepted_renderer.format
+
+        if export_format == 'ndjson':
+            stream = OrderExportService.stream_ndjson(start, end)
+        else:
+            stream = OrderExportService.stream_csv(start, end)
+
+        response = StreamingHttpResponse(stream, content_type=f'{request.accepted_renderer.media_type}; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename="orders_{start_date.isoformat()}_{end_date.isoformat()}.{export_format}"'
+        )
+        return response
+
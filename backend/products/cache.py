@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+
+class ProductLookupCache:
+    """
+    Caché LRU con TTL, local al proceso, para el escaneo de SKU en el punto de venta.
+    Guarda la proyección de precio ya calculada (dict) por SKU.
+
+    Al ser por proceso, cada worker tiene su propia copia: la invalidación explícita
+    solo limpia el proceso que hizo el cambio y el TTL acota lo que pueden tardar los demás.
+    """
+
+    def __init__(self, max_entries=2048, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # sku -> (expires_at, data)
+        self._skus_by_pk = {}
+        self._lock = threading.Lock()
+
+    def get(self, sku):
+        with self._lock:
+            entry = self._entries.get(sku)
+            if entry is None:
+                return None
+
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                self._pop(sku)
+                return None
+
+            self._entries.move_to_end(sku)
+            return data
+
+    def set(self, sku, data):
+        with self._lock:
+            self._pop(sku)
+            self._entries[sku] = (time.monotonic() + self.ttl, data)
+            self._skus_by_pk[data['id']] = sku
+
+            while len(self._entries) > self.max_entries:
+                oldest_sku = next(iter(self._entries))
+                self._pop(oldest_sku)
+
+    def invalidate(self, product_ids):
+        with self._lock:
+            for pk in product_ids:
+                sku = self._skus_by_pk.get(pk)
+                if sku is not None:
+                    self._pop(sku)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._skus_by_pk.clear()
+
+    def _pop(self, sku):
+        entry = self._entries.pop(sku, None)
+        if entry is not None:
+            self._skus_by_pk.pop(entry[1]['id'], None)
+
+
+product_lookup_cache = ProductLookupCache(
+    max_entries=getattr(settings, 'PRODUCT_LOOKUP_CACHE_MAX_ENTRIES', 2048),
+    ttl=getattr(settings, 'PRODUCT_LOOKUP_CACHE_TTL', 30),
+)
+
+
+def invalidate_product_lookup(product_ids):
+    """
+    Invalida la caché de lookup para los productos dados.
+    Se limpia de inmediato y otra vez al confirmar la transacción, para que una lectura
+    concurrente hecha antes del commit no deje guardado el valor viejo.
+    """
+    product_ids = [pk for pk in product_ids if pk is not None]
+    if not product_ids:
+        return
+
+    product_lookup_cache.invalidate(product_ids)
+    transaction.on_commit(lambda: product_lookup_cache.invalidate(product_ids))
@@ -0,0 +1,16 @@
+import django_filters
+
+from .models import Product
+
+
+class ProductFilter(django_filters.FilterSet):
+    """
+    Filtros del catálogo. Todos se resuelven con índices:
+    sku (unique), name (prefijo, db_index), supplier (FK) y low_stock (índice parcial).
+    """
+    sku = django_filters.CharFilter(field_name='sku', lookup_expr='exact')
+    name = django_filters.CharFilter(field_name='name', lookup_expr='startswith')
+
+    class Meta:
+        model = Product
+        fields = ['sku', 'name', 'supplier', 'low_stock']
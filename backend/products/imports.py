@@ -0,0 +1,238 @@
+import csv
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+
+from suppliers.models import Supplier
+from .cache import invalidate_product_lookup
+from .models import InventoryMovement, Product, ProductPrice
+
+
+class ProductImportService:
+    """
+    Importación masiva del catálogo desde CSV (comando import_products y /products/import/).
+
+    Columnas: sku, name, price, supplier (id o nombre exacto), tax_rate (opcional, default 16.00)
+    y current_stock (opcional, solo se usa al dar de alta).
+
+    Las filas se leen en streaming y se procesan por lotes: validación en memoria, proveedores
+    resueltos con una consulta por lote, final_price precalculado con el multiplicador de cada tasa
+    y un solo INSERT ... ON CONFLICT (sku) DO UPDATE por lote. Cada lote va en su propia transacción;
+    las filas inválidas no detienen la importación y quedan en el reporte de errores.
+    """
+    CHUNK_SIZE = 1000
+    # Campos que se sobrescriben cuando el SKU ya existe. El stock de un producto existente
+    # no se toca: los cambios de inventario van por la bitácora (ajustes).
+    UPDATE_FIELDS = ['name', 'price', 'tax_rate', 'discounted_price', 'final_price', 'supplier', 'updated_at']
+
+    TAX_ALIASES = {
+        '16': Product.TaxType.GENERAL, '16.0': Product.TaxType.GENERAL,
+        '8': Product.TaxType.FRONTIER, '8.0': Product.TaxType.FRONTIER,
+        '0': Product.TaxType.ZERO, '0.0': Product.TaxType.ZERO,
+        'EXENTO': Product.TaxType.EXEMPT,
+    }
+    TAX_MULTIPLIERS = {rate: Product.tax_multiplier(rate) for rate in Product.TaxType.values}
+
+    def __init__(self, chunk_size=None, dry_run=False):
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.dry_run = dry_run
+        self.errors = []
+        self.stats = {"rows": 0, "created": 0, "updated": 0, "failed": 0}
+        self._suppliers = {}
+        self._seen_skus = set()
+
+    def run(self, text_stream):
+        """
+        Importa un CSV (objeto de texto iterable). Retorna {"stats": {...}, "errors": [...]}
+        con un error por fila rechazada: {"row": n, "sku": ..., "errors": {campo: mensaje}}.
+        """
+        start = time.perf_counter()
+        reader = csv.DictReader(text_stream)
+
+        missing = {'sku', 'name', 'price', 'supplier'} - set(reader.fieldnames or [])
+        if missing:
+            self.errors.append({"row": 1, "sku": None, "errors": {"columns": f"Faltan columnas: {', '.join(sorted(missing))}"}})
+            return self.report(start)
+
+        chunk = []
+        # La fila 1 es el encabezado
+        for line_number, row in enumerate(reader, start=2):
+            chunk.append((line_number, row))
+            if len(chunk) >= self.chunk_size:
+                self._process_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._process_chunk(chunk)
+
+        return self.report(start)
+
+    def report(self, start):
+        elapsed = time.perf_counter() - start
+        self.stats["seconds"] = round(elapsed, 3)
+        self.stats["rows_per_second"] = round(self.stats["rows"] / elapsed, 1) if elapsed else 0
+        self.errors.sort(key=lambda error: error["row"])
+        return {"stats": self.stats, "errors": self.errors}
+
+    def _process_chunk(self, chunk):
+        self.stats["rows"] += len(chunk)
+
+        parsed = []
+        for line_number, row in chunk:
+            data, errors = self._parse_row(row)
+            if errors:
+                self._reject(line_number, row, errors)
+            else:
+                parsed.append((line_number, row, data))
+
+        suppliers = self._resolve_suppliers({data['supplier'] for _, _, data in parsed})
+
+        valid = []
+        for line_number, row, data in parsed:
+            supplier_id = suppliers.get(data['supplier'])
+            if supplier_id is None:
+                self._reject(line_number, row, {"supplier": f"Proveedor '{data['supplier']}' no encontrado."})
+                continue
+            data['supplier_id'] = supplier_id
+            valid.append(data)
+
+        if not valid:
+            return
+
+        with transaction.atomic():
+            existing = {
+                product['sku']: product
+                for product in Product.objects.filter(sku__in=[data['sku'] for data in valid]).values(
+                    'pk', 'sku', 'active_promotion__discount_percent'
+                )
+            }
+
+            products = [self._build_product(data, existing.get(data['sku'])) for data in valid]
+            created = [data for data in valid if data['sku'] not in existing]
+            self.stats["created"] += len(created)
+            self.stats["updated"] += len(valid) - len(created)
+
+            if self.dry_run:
+                return
+
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=self.UPDATE_FIELDS,
+            )
+            invalidate_product_lookup([product['pk'] for product in existing.values()])
+
+            new_pks = dict(
+                Product.objects.filter(sku__in=[data['sku'] for data in created]).values_list('sku', 'pk')
+            )
+            ProductPrice.refresh([product['pk'] for product in existing.values()] + list(new_pks.values()))
+
+            # Saldo inicial en la bitácora para los productos nuevos
+            InventoryMovement.record(
+                'INITIAL', [(new_pks[data['sku']], None, data['current_stock']) for data in created],
+                note='Importación'
+            )
+
+    def _build_product(self, data, existing):
+        """Precalcula discounted_price (si el producto tiene promoción activa) y final_price como lo haría save()."""
+        discounted_price = None
+        if existing and existing['active_promotion__discount_percent'] is not None:
+            discount_factor = Decimal(existing['active_promotion__discount_percent']) / Decimal('100.00')
+            discounted_price = data['price'] * (Decimal('1.00') - discount_factor)
+
+        base_amount = discounted_price if discounted_price is not None else data['price']
+
+        return Product(
+            sku=data['sku'],
+            name=data['name'],
+            price=data['price'],
+            tax_rate=data['tax_rate'],
+            discounted_price=discounted_price,
+            final_price=base_amount * self.TAX_MULTIPLIERS[data['tax_rate']],
+            current_stock=data['current_stock'],
+            supplier_id=data['supplier_id'],
+        )
+
+    def _parse_row(self, row):
+        errors = {}
+        data = {}
+
+        sku = (row.get('sku') or '').strip()
+        if not sku:
+            errors['sku'] = 'Campo obligatorio.'
+        elif len(sku) > 30:
+            errors['sku'] = 'Máximo 30 caracteres.'
+        elif sku in self._seen_skus:
+            errors['sku'] = 'SKU duplicado en el archivo.'
+        data['sku'] = sku
+
+        name = (row.get('name') or '').strip()
+        if not name:
+            errors['name'] = 'Campo obligatorio.'
+        elif len(name) > 200:
+            errors['name'] = 'Máximo 200 caracteres.'
+        data['name'] = name
+
+        try:
+            price = Decimal((row.get('price') or '').strip())
+            if not price.is_finite() or price < 0 or price >= Decimal('100000000'):
+                raise InvalidOperation
+            data['price'] = price.quantize(Decimal('0.01'))
+        except InvalidOperation:
+            errors['price'] = 'Debe ser un número positivo con máximo 8 enteros.'
+
+        tax_rate = (row.get('tax_rate') or '').strip().upper() or Product.TaxType.GENERAL
+        tax_rate = self.TAX_ALIASES.get(tax_rate, tax_rate)
+        if tax_rate not in self.TAX_MULTIPLIERS:
+            errors['tax_rate'] = f"Tasa inválida. Opciones: {', '.join(Product.TaxType.values)}."
+        data['tax_rate'] = tax_rate
+
+        stock = (row.get('current_stock') or '').strip() or '0'
+        try:
+            data['current_stock'] = int(stock)
+            if data['current_stock'] < 0:
+                raise ValueError
+        except ValueError:
+            errors['current_stock'] = 'Debe ser un entero mayor o igual a cero.'
+
+        supplier = (row.get('supplier') or '').strip()
+        if not supplier:
+            errors['supplier'] = 'Campo obligatorio.'
+        data['supplier'] = supplier
+
+        if not errors:
+            self._seen_skus.add(sku)
+        return data, errors
+
+    def _resolve_suppliers(self, keys):
+        """
+        Resuelve ids y nombres de proveedor con una consulta por lote; lo ya resuelto se reutiliza.
+        Una clave numérica es primero un id y, si ese id no existe, un nombre ("007", "2024").
+        El resultado se indexa con la clave tal como viene en el archivo.
+        """
+        pending = keys - self._suppliers.keys()
+        if pending:
+            ids = {key: int(key) for key in pending if key.isdecimal()}
+
+            by_pk, by_name = set(), {}
+            matches = Supplier.objects.filter(
+                Q(pk__in=set(ids.values())) | Q(name__in=pending)
+            ).order_by('pk').values_list('pk', 'name')
+            for pk, name in matches:
+                by_pk.add(pk)
+                # Con nombres repetidos gana el proveedor más antiguo
+                by_name.setdefault(name, pk)
+
+            for key in pending:
+                if key in ids and ids[key] in by_pk:
+                    self._suppliers[key] = ids[key]
+                else:
+                    self._suppliers[key] = by_name.get(key)
+
+        return self._suppliers
+
+    def _reject(self, line_number, row, errors):
+        self.stats["failed"] += 1
+        self.errors.append({"row": line_number, "sku": (row.get('sku') or '').strip() or None, "errors": errors})
@@ -0,0 +1,77 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from orders.models import Order, OrderItems
+from products.models import Product
+from suppliers.models import Supplier
+
+
+class Command(BaseCommand):
+    help = 'Compara consultas y tiempo entre update_low_stock por producto y en modo masivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000, help='Productos a generar (default: 2000)')
+
+    def handle(self, *args, **options):
+        total = options['products']
+
+        self.stdout.write(f"Benchmark de low stock con {total} productos...")
+
+        # Todo se crea dentro de una transacción que se revierte al final
+        with transaction.atomic():
+            product_ids = self._create_fixtures(total)
+            catalog = Product.objects.filter(pk__in=product_ids)
+
+            results = []
+            for label, run in (
+                ('per-product', lambda: sum(p.update_inventory_status() for p in catalog.iterator())),
+                ('bulk', lambda: sum(Product.bulk_update_inventory_status().values())),
+            ):
+                # Ambas rutas parten del mismo estado inicial
+                catalog.update(low_stock=False)
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    changed = run()
+                    elapsed = (time.perf_counter() - start) * 1000
+                results.append((label, len(ctx.captured_queries), changed, elapsed))
+
+            transaction.set_rollback(True)
+
+        for label, queries, changed, elapsed in results:
+            self.stdout.write(
+                f"{label:>11}: {queries} consultas | {changed} cambios | {elapsed:.2f} ms"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado.'))
+
+    def _create_fixtures(self, total):
+        suffix = uuid.uuid4().hex[:8]
+        supplier = Supplier.objects.create(
+            name=f'Bench {suffix}', phone_number='0', contact_person='Bench', rfc='BENCH', tax_address='N/A'
+        )
+        Product.objects.bulk_create([
+            Product(
+                name=f'Bench {suffix} {i}', sku=f'BENCH-{suffix}-{i}', price=Decimal('10.00'),
+                current_stock=10, supplier=supplier
+            )
+            for i in range(total)
+        ])
+        products = list(Product.objects.filter(supplier=supplier).values_list('pk', flat=True))
+
+        # Una orden pagada el mes pasado; la mitad de los productos vende más que su stock
+        start_prev_month, _ = Product._previous_month_bounds()
+        order = Order.objects.create(status='PAID', subtotal=0, final_amount=0)
+        Order.objects.filter(pk=order.pk).update(created_at=start_prev_month)
+        OrderItems.objects.bulk_create([
+            OrderItems(
+                order=order, product_id=pk, product_name='Bench', quantity=20 if i % 2 else 5,
+                unit_price=Decimal('10.00'), amount=Decimal('10.00')
+            )
+            for i, pk in enumerate(products)
+        ])
+        return products
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from products.models import InventorySnapshot
+
+
+class Command(BaseCommand):
+    help = 'Compacta la bitácora de inventario en snapshots por producto (Ideal para Cron Jobs diarios)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--as-of',
+            help='Fecha y hora ISO del corte (default: inicio del día de hoy)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Productos por lote (default: 1000)')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['as_of']:
+            as_of = parse_datetime(options['as_of'])
+            if as_of is None:
+                raise CommandError("--as-of debe ser una fecha y hora ISO, p.ej. 2025-01-31T00:00:00")
+            if timezone.is_naive(as_of):
+                as_of = timezone.make_aware(as_of)
+
+        self.stdout.write("Compactando bitácora de inventario...")
+        start = time.perf_counter()
+
+        created = InventorySnapshot.compact(as_of=as_of, chunk_size=options['chunk_size'])
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Proceso terminado en {elapsed:.2f}s. Snapshots creados: {created}'))
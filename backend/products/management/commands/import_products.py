@@ -0,0 +1,44 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.imports import ProductImportService
+
+
+class Command(BaseCommand):
+    help = 'Importa o actualiza productos desde un CSV (sku, name, price, supplier, tax_rate, current_stock)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Ruta del archivo CSV (UTF-8)')
+        parser.add_argument('--chunk-size', type=int, default=ProductImportService.CHUNK_SIZE, help='Filas por lote (default: 1000)')
+        parser.add_argument('--dry-run', action='store_true', help='Solo valida; no escribe en la base de datos')
+        parser.add_argument('--errors', help='Ruta donde guardar el reporte de filas rechazadas (CSV)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Importando productos desde {options['path']}...")
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as source:
+                result = ProductImportService(chunk_size=options['chunk_size'], dry_run=options['dry_run']).run(source)
+        except OSError as e:
+            raise CommandError(f"No se pudo leer el archivo: {e}")
+
+        stats, errors = result["stats"], result["errors"]
+
+        if options['errors']:
+            with open(options['errors'], 'w', newline='', encoding='utf-8') as report:
+                writer = csv.writer(report)
+                writer.writerow(['row', 'sku', 'field', 'error'])
+                for error in errors:
+                    for field, message in error["errors"].items():
+                        writer.writerow([error["row"], error["sku"] or '', field, message])
+        else:
+            for error in errors:
+                detail = '; '.join(f"{field}: {message}" for field, message in error["errors"].items())
+                self.stdout.write(self.style.WARNING(f"Fila {error['row']} ({error['sku'] or 'sin SKU'}): {detail}"))
+
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Proceso terminado en {stats['seconds']:.2f}s ({stats['rows_per_second']} filas/s). "
+            f"Filas: {stats['rows']}, nuevos: {stats['created']}, actualizados: {stats['updated']}, rechazados: {stats['failed']}"
+        ))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.models import ProductPrice
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la tabla de precios por nivel de cliente (PRODUCT_PRICES) para todo el catálogo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Productos por lote (default: 1000)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Recalculando precios por nivel...")
+        start = time.perf_counter()
+
+        written = ProductPrice.refresh_all(chunk_size=options['chunk_size'])
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Proceso terminado en {elapsed:.2f}s. Filas escritas: {written}'))
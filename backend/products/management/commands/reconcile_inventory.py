@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.models import InventoryMovement, InventorySnapshot
+
+
+class Command(BaseCommand):
+    help = 'Verifica current_stock y reserved_quantity contra la bitácora de inventario, por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Productos por lote (default: 1000)')
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Registra un movimiento ADJUSTMENT por cada diferencia para que la bitácora cuadre con el stock actual'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Conciliando inventario contra la bitácora...")
+        start = time.perf_counter()
+
+        drift = list(InventorySnapshot.find_drift(chunk_size=options['chunk_size']))
+
+        for pk, sku, (stock, reserved), (ledger_stock, ledger_reserved) in drift:
+            self.stdout.write(self.style.WARNING(
+                f"{sku} (id {pk}): stock {stock} vs bitácora {ledger_stock}, "
+                f"apartado {reserved} vs bitácora {ledger_reserved}"
+            ))
+
+        if drift and options['fix']:
+            with transaction.atomic():
+                InventoryMovement.record(
+                    'ADJUSTMENT', [(pk, None, actual[0] - ledger[0]) for pk, _, actual, ledger in drift],
+                    note='Conciliación'
+                )
+                InventoryMovement.record(
+                    'ADJUSTMENT', [(pk, None, actual[1] - ledger[1]) for pk, _, actual, ledger in drift],
+                    field='reserved', note='Conciliación'
+                )
+            self.stdout.write(f"Ajustes registrados: {len(drift)}")
+
+        elapsed = time.perf_counter() - start
+        style = self.style.SUCCESS if not drift or options['fix'] else self.style.ERROR
+        self.stdout.write(style(f'Proceso terminado en {elapsed:.2f}s. Productos con diferencias: {len(drift)}'))
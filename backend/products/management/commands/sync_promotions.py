@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from products.models import Promotion
+
+class Command(BaseCommand):
+    help = 'Aplica los cambios de día de las promociones (vencidas y nuevas). Ideal para Cron Jobs a medianoche'
+
+    def handle(self, *args, **options):
+        self.stdout.write("Sincronizando promociones del día...")
+
+        result = Promotion.apply_day_transitions()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Proceso terminado. Promociones vencidas: {result['expired']}, "
+            f"promociones activadas: {result['activated']}"
+        ))
@@ -1,18 +1,43 @@
+import time
+
 from django.core.management.base import BaseCommand
 from products.models import Product
 
 class Command(BaseCommand):
     help = 'Actualiza el estatus low_stock masivamente (Ideal para Cron Jobs)'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--per-product',
+            action='store_true',
+            help='Usa el cálculo anterior producto por producto (lento, solo para comparar)'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write("Iniciando cálculo de Low Stock...")
-        
-        products = Product.objects.all()
+        start = time.perf_counter()
+
+        if options['per_product']:
+            count = self._update_per_product()
+            detail = f'Productos actualizados: {count}'
+        else:
+            # Una subconsulta agrupada + dos UPDATE para todo el catálogo
+            result = Product.bulk_update_inventory_status()
+            count = result['activated'] + result['deactivated']
+            detail = (
+                f"Productos actualizados: {count} "
+                f"(low stock: {result['activated']}, normalizados: {result['deactivated']})"
+            )
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Proceso terminado en {elapsed:.2f}s. {detail}'))
+
+    def _update_per_product(self):
         count = 0
-        
+
         # Iteramos producto por producto usando la lógica del modelo
-        for p in products:
+        for p in Product.objects.all().iterator():
             if p.update_inventory_status():
                 count += 1
-                
-        self.stdout.write(self.style.SUCCESS(f'Proceso terminado. Productos actualizados: {count}'))
\ No newline at end of file
+
+        return count
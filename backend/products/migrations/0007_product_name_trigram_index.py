@@ -0,0 +1,34 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:35
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class AddIndexOnPostgres(migrations.AddIndex):
+    """El índice GIN con gin_trgm_ops solo existe en PostgreSQL; en SQLite se omite."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_catalog_indexes'),
+        ('suppliers', '0001_initial'),
+    ]
+
+    operations = [
+        # No hace nada fuera de PostgreSQL
+        TrigramExtension(),
+        AddIndexOnPostgres(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='products_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:40
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_holds_for_existing_reservations(apps, schema_editor):
+    """Las reservas previas no tenían registro: se crea un apartado por producto para que también venzan."""
+    Product = apps.get_model('products', 'Product')
+    StockReservation = apps.get_model('products', 'StockReservation')
+    expires_at = timezone.now() + datetime.timedelta(days=1)
+
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(product_id=pk, quantity=quantity, expires_at=expires_at)
+            for pk, quantity in Product.objects.filter(reserved_quantity__gt=0).values_list('pk', 'reserved_quantity').iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('ACTIVE', 'Activo'), ('RELEASED', 'Liberado'), ('EXPIRED', 'Vencido')], default='ACTIVE', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.product')),
+            ],
+            options={
+                'db_table': 'STOCK_RESERVATIONS',
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='stock_reservation_due_idx')],
+            },
+        ),
+        migrations.RunPython(create_holds_for_existing_reservations, migrations.RunPython.noop),
+    ]
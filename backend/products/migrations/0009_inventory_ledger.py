@@ -0,0 +1,65 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_opening_snapshots(apps, schema_editor):
+    """El stock previo a la bitácora queda como snapshot de apertura de cada producto."""
+    Product = apps.get_model('products', 'Product')
+    InventorySnapshot = apps.get_model('products', 'InventorySnapshot')
+    as_of = timezone.now()
+
+    InventorySnapshot.objects.bulk_create(
+        (
+            InventorySnapshot(product_id=pk, as_of=as_of, stock=stock, reserved=reserved)
+            for pk, stock, reserved in Product.objects.values_list('pk', 'current_stock', 'reserved_quantity').iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_updated_at'),
+        ('products', '0008_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_type', models.CharField(choices=[('INITIAL', 'Alta de producto'), ('SALE', 'Venta'), ('CANCELLATION', 'Cancelación'), ('RESERVATION', 'Apartado'), ('RELEASE', 'Liberación de apartado'), ('ADJUSTMENT', 'Ajuste manual')], max_length=15)),
+                ('stock_delta', models.IntegerField(default=0)),
+                ('reserved_delta', models.IntegerField(default=0)),
+                ('note', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_movements', to='orders.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='products.product')),
+            ],
+            options={
+                'db_table': 'INVENTORY_MOVEMENTS',
+                'indexes': [models.Index(fields=['product', 'created_at'], name='inventory_movement_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('stock', models.IntegerField()),
+                ('reserved', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='products.product')),
+            ],
+            options={
+                'db_table': 'INVENTORY_SNAPSHOTS',
+                'constraints': [models.UniqueConstraint(fields=('product', 'as_of'), name='inventory_snapshot_unique')],
+            },
+        ),
+        migrations.RunPython(create_opening_snapshots, migrations.RunPython.noop),
+    ]
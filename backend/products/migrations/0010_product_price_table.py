@@ -0,0 +1,62 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:51
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def populate_price_table(apps, schema_editor):
+    """Llena PRODUCT_PRICES con la misma regla de Product.get_dynamic_price."""
+    Product = apps.get_model('products', 'Product')
+    ProductPrice = apps.get_model('products', 'ProductPrice')
+
+    def taxed(amount, tax_rate):
+        if tax_rate == 'EXENT':
+            return amount
+        return amount * (Decimal('1.00') + Decimal(tax_rate) / Decimal('100.00'))
+
+    prices = []
+    rows = Product.objects.values_list(
+        'pk', 'price', 'tax_rate', 'discounted_price', 'final_price',
+        'promo_requires_frequent_customer', 'active_promotion__name'
+    )
+    for pk, price, tax_rate, discounted_price, final_price, requires_frequent, promotion_name in rows.iterator():
+        if discounted_price is None:
+            general = frequent = (price, final_price, None)
+        else:
+            promotion = (discounted_price, final_price, promotion_name or 'Oferta')
+            general = (price, taxed(price, tax_rate), None) if requires_frequent else promotion
+            frequent = promotion
+
+        for tier, (base, final, name) in (('GENERAL', general), ('FREQUENT', frequent)):
+            prices.append(ProductPrice(product_id=pk, tier=tier, base_price=base, final_price=final, promotion_name=name))
+
+    ProductPrice.objects.bulk_create(prices, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_inventory_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier', models.CharField(choices=[('GENERAL', 'Público general'), ('FREQUENT', 'Cliente frecuente')], max_length=10)),
+                ('base_price', models.DecimalField(decimal_places=2, help_text='Precio unitario sin impuestos', max_digits=10)),
+                ('final_price', models.DecimalField(decimal_places=2, help_text='Precio unitario con impuestos', max_digits=10)),
+                ('promotion_name', models.CharField(blank=True, max_length=50, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tier_prices', to='products.product')),
+            ],
+            options={
+                'db_table': 'PRODUCT_PRICES',
+                'constraints': [models.UniqueConstraint(fields=('product', 'tier'), name='product_price_tier_unique')],
+            },
+        ),
+        migrations.RunPython(populate_price_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:53
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_active_promotion_names(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Promotion = apps.get_model('products', 'Promotion')
+
+    Product.objects.filter(active_promotion__isnull=False).update(
+        active_promotion_name=Subquery(Promotion.objects.filter(pk=OuterRef('active_promotion')).values('name')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_price_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='active_promotion_name',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.RunPython(copy_active_promotion_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.1.2 on 2026-10-17 03:22
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def restore_unrounded_general_prices(apps, schema_editor):
+    """
+    Las filas GENERAL de promociones solo para frecuentes se guardaron redondeadas a 2 decimales;
+    se recalculan sin redondear como lo hace Product.get_dynamic_price.
+    """
+    ProductPrice = apps.get_model('products', 'ProductPrice')
+
+    def taxed(amount, tax_rate):
+        if tax_rate == 'EXENT':
+            return amount
+        return amount * (Decimal('1.00') + Decimal(tax_rate) / Decimal('100.00'))
+
+    rows = ProductPrice.objects.filter(
+        tier='GENERAL', product__discounted_price__isnull=False, product__promo_requires_frequent_customer=True
+    ).select_related('product')
+
+    prices = []
+    for row in rows.iterator(chunk_size=1000):
+        row.final_price = taxed(row.product.price, row.product.tax_rate)
+        prices.append(row)
+    ProductPrice.objects.bulk_update(prices, ['final_price'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_active_promotion_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productprice',
+            name='final_price',
+            field=models.DecimalField(decimal_places=4, help_text='Precio unitario con impuestos', max_digits=12),
+        ),
+        migrations.RunPython(restore_unrounded_general_prices, migrations.RunPython.noop),
+    ]
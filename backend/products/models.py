@@ -6,8 +6,12 @@ from django.db import transaction
 from django.core.exceptions import ValidationError
 from decimal import Decimal
 from django.core.management.base import BaseCommand
-from django.db.models import Sum
+from django.db.models import Sum, F, Q, Case, When, Value, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
 from orders.models import OrderItems
+from .cache import invalidate_product_lookup
 import datetime
 
 class Product(models.Model):
@@ -16,8 +20,20 @@ class Product(models.Model):
         FRONTIER = '8.00', 'Tasa Fronteriza (8%)'
         ZERO = '0.00', 'Tasa del 0%'
         EXEMPT = 'EXENT', 'Exento'
+
+    # Campos que tocan las promociones. Se guardan con update_fields para no pisar
+    # el stock que el checkout descuenta con UPDATE sin bloquear la fila.
+    PRICE_FIELDS = [
+        'discounted_price', 'active_promotion', 'active_promotion_name', 'promo_requires_frequent_customer',
+        'final_price', 'updated_at'
+    ]
+    # Campos de los que depende la tabla de precios por nivel (ProductPrice)
+    TIER_PRICE_FIELDS = {
+        'price', 'tax_rate', 'discounted_price', 'final_price', 'active_promotion', 'active_promotion_name',
+        'promo_requires_frequent_customer'
+    }
     
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, db_index=True)
     sku = models.CharField(max_length=30, unique=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.0,help_text="Precio Base sin Impuestos")
 
@@ -45,6 +61,8 @@ class Product(models.Model):
     active_promotion = models.ForeignKey(
         'products.Promotion', null=True, blank=True, on_delete=models.SET_NULL, related_name='active_on_products'
     )
+    # Copia del nombre de la promoción activa: el precio se resuelve sin cargar la promoción
+    active_promotion_name = models.CharField(max_length=50, null=True, blank=True)
     current_stock = models.IntegerField(default=0)
     reserved_quantity = models.IntegerField(default=0)
     low_stock = models.BooleanField(default=False)
@@ -63,29 +81,121 @@ class Product(models.Model):
         if amount is None:
             return Decimal("0.00")
 
-        if self.tax_rate == 'EXENT':
-            return Decimal(amount)
-        
-        tax_multiplier = Decimal(self.tax_rate) / Decimal("100.00")
-        
-        return Decimal(amount) * (Decimal("1.00") + tax_multiplier)
+        return Decimal(amount) * self.tax_multiplier(self.tax_rate)
+
+    @staticmethod
+    def tax_multiplier(tax_rate):
+        """Factor por el que se multiplica el precio base: 1.16, 1.08, 1.00..."""
+        if tax_rate == 'EXENT':
+            return Decimal("1.00")
+        return Decimal("1.00") + Decimal(tax_rate) / Decimal("100.00")
     
-    def save(self, *args, **kwargs):
+    # Niveles de inventario cuyos cambios registra save() en la bitácora
+    LEVEL_FIELDS = ('current_stock', 'reserved_quantity')
+
+    # Entradas del precio: final_price se deriva de ellas en save()
+    PRICE_INPUT_FIELDS = (
+        'price', 'tax_rate', 'discounted_price', 'active_promotion_id', 'active_promotion_name',
+        'promo_requires_frequent_customer'
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Niveles leídos de la base: save() registra la diferencia contra ellos
+        instance._loaded_levels = {field: instance.__dict__.get(field) for field in cls.LEVEL_FIELDS}
+        # Entradas del precio leídas de la base: save() solo recalcula ProductPrice si cambian
+        instance._loaded_prices = instance._price_inputs()
+        return instance
+
+    def _price_inputs(self):
+        return {field: self.__dict__.get(field) for field in self.PRICE_INPUT_FIELDS}
+
+    def save(self, *args, movement=None, **kwargs):
         """
         Calcular el precio del producto cada que se haga un cambio
         ya sea en promocion,impuesto o precio
+
+        Los cambios de current_stock y reserved_quantity quedan en la bitácora de inventario:
+        el saldo inicial al crear y, al actualizar, la diferencia contra lo leído de la base
+        (alta y edición desde la API, el admin o el ORM). movement = (tipo, nota) del movimiento;
+        por omisión INITIAL al crear y ADJUSTMENT al editar. Los niveles asignados con
+        expresiones F no se registran porque su delta no se conoce.
         """
+        loaded = getattr(self, '_loaded_prices', None)
+        if (
+            not self._state.adding and kwargs.get('update_fields') is None
+            and self.active_promotion_id is not None and loaded is not None and loaded['price'] != self.price
+        ):
+            # Precio editado con la promoción corriendo: el descuento se recalcula sobre el precio nuevo
+            promotion = self.active_promotion
+            promotion.product = self
+            self.discounted_price = promotion._calculate_discounted_price()
+
         base_amount = self.discounted_price if self.discounted_price is not None else self.price
         
         self.final_price = self._calculate_taxed_price(base_amount)
-        
-        super().save(*args, **kwargs)
+
+        adding = self._state.adding
+        deltas = self._level_deltas(adding, kwargs.get('update_fields'))
+
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+            if any(deltas.values()):
+                movement_type, note = movement or (('INITIAL', '') if adding else ('ADJUSTMENT', 'Edición de producto'))
+                InventoryMovement.record(
+                    movement_type, [(self.pk, None, deltas.get('current_stock', 0))], note=note
+                )
+                InventoryMovement.record(
+                    movement_type, [(self.pk, None, deltas.get('reserved_quantity', 0))], field='reserved', note=note
+                )
+
+        self._loaded_levels = {
+            field: value if isinstance(value, int) else None
+            for field, value in ((field, self.__dict__.get(field)) for field in self.LEVEL_FIELDS)
+        }
+
+        if self._tier_prices_changed(adding, kwargs.get('update_fields')):
+            ProductPrice.refresh([self.pk])
+        self._loaded_prices = self._price_inputs()
+
+        invalidate_product_lookup([self.pk])
+
+    def _tier_prices_changed(self, adding, update_fields):
+        """
+        True si el guardado puede cambiar la tabla ProductPrice: al crear, si update_fields
+        incluye campos del precio o, en un save() completo, si cambió alguna entrada del precio
+        respecto a lo leído de la base (un save() de stock o banderas no la toca).
+        """
+        if update_fields is not None:
+            return bool(self.TIER_PRICE_FIELDS.intersection(update_fields))
+
+        loaded = getattr(self, '_loaded_prices', None)
+        return adding or loaded is None or loaded != self._price_inputs()
+
+    def _level_deltas(self, adding, update_fields):
+        """Cambio de cada nivel que va a escribir save(): {campo: delta}."""
+        loaded = getattr(self, '_loaded_levels', {})
+        deltas = {}
+        for field in self.LEVEL_FIELDS:
+            value = self.__dict__.get(field)
+            if not isinstance(value, int):
+                continue
+            if adding:
+                deltas[field] = value
+            elif (update_fields is None or field in update_fields) and loaded.get(field) is not None:
+                deltas[field] = value - loaded[field]
+        return deltas
+
+    def delete(self, *args, **kwargs):
+        invalidate_product_lookup([self.pk])
+        return super().delete(*args, **kwargs)
     
-    def reduce_stock(self, quantity, consume_reservation=False):
+    def check_stock(self, quantity):
         """
-        Reduce el stock físico.
-        :param quantity: Cantidad a restar.
-        :param consume_reservation: Bool. Si es True, también resta de 'reserved_quantity'.
+        Valida que la cantidad solicitada sea positiva y que exista stock físico suficiente.
+        Lanza ValidationError si no se cumple.
         """
         if quantity <= 0:
             raise ValidationError("La cantidad debe ser mayor a cero.")
@@ -93,6 +203,105 @@ class Product(models.Model):
         if self.current_stock < quantity:
             raise ValidationError(f"Stock insuficiente en {self.name}. Disponible: {self.current_stock}")
 
+    @classmethod
+    def apply_stock_deltas(cls, deltas, movement_type='ADJUSTMENT', entries=None, note=''):
+        """
+        Aplica en un solo UPDATE los cambios de stock de varios productos y los registra en la bitácora.
+        :param deltas: dict {product_id: cantidad}. Negativa para restar, positiva para devolver.
+        :param entries: renglones de la bitácora (product_id, order_id, cantidad) si no son uno por producto.
+        Retorna el número de filas actualizadas.
+        """
+        if not deltas:
+            return 0
+
+        stock_change = Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            default=Value(0),
+            output_field=models.IntegerField()
+        )
+
+        updated = cls.objects.filter(pk__in=list(deltas)).update(
+            current_stock=F('current_stock') + stock_change,
+            updated_at=timezone.now()
+        )
+        if entries is None:
+            entries = [(pk, None, delta) for pk, delta in deltas.items()]
+        InventoryMovement.record(movement_type, entries, note=note)
+        invalidate_product_lookup(list(deltas))
+        return updated
+
+    @classmethod
+    def release_reserved(cls, deltas, note=''):
+        """
+        Descuenta en un solo UPDATE unidades apartadas de varios productos (sin bajar de cero)
+        y registra la liberación (RELEASE) en la bitácora.
+        :param deltas: dict {product_id: unidades a liberar}.
+        """
+        if not deltas:
+            return 0
+
+        release = Case(
+            *[When(pk=pk, then=Value(units)) for pk, units in deltas.items()],
+            default=Value(0),
+            output_field=models.IntegerField()
+        )
+
+        updated = cls.objects.filter(pk__in=list(deltas)).update(
+            reserved_quantity=Greatest(F('reserved_quantity') - release, Value(0)),
+            updated_at=timezone.now()
+        )
+        InventoryMovement.record(
+            'RELEASE', [(pk, None, -units) for pk, units in deltas.items()], field='reserved', note=note
+        )
+        invalidate_product_lookup(list(deltas))
+        return updated
+
+    @classmethod
+    def try_decrement_stock(cls, quantities, order_id=None):
+        """
+        Descuento optimista, sin select_for_update ni save() de la fila completa:
+        UPDATE ... SET current_stock = current_stock - n WHERE id = .. AND current_stock >= n
+        para todos los productos en una sola sentencia. Si el número de filas afectadas
+        no coincide, algún producto no alcanzó y se revierte todo el descuento.
+        :param quantities: dict {product_id: cantidad a restar}.
+        Si se descuenta, registra la venta (SALE) en la bitácora ligada a order_id.
+        Retorna True si se descontó todo, False si no se descontó nada.
+        """
+        if not quantities:
+            return True
+
+        available = Q()
+        for pk, quantity in quantities.items():
+            available |= Q(pk=pk, current_stock__gte=quantity)
+
+        stock_change = Case(
+            *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+            default=Value(0),
+            output_field=models.IntegerField()
+        )
+
+        with transaction.atomic():
+            updated = cls.objects.filter(available).update(
+                current_stock=F('current_stock') - stock_change,
+                updated_at=timezone.now()
+            )
+            if updated != len(quantities):
+                transaction.set_rollback(True)
+                return False
+
+            InventoryMovement.record('SALE', [(pk, order_id, -quantity) for pk, quantity in quantities.items()])
+
+        invalidate_product_lookup(list(quantities))
+        return True
+
+    def reduce_stock(self, quantity, consume_reservation=False):
+        """
+        Reduce el stock físico.
+        :param quantity: Cantidad a restar.
+        :param consume_reservation: Bool. Si es True, también resta de 'reserved_quantity'.
+        """
+        self.check_stock(quantity)
+
         if consume_reservation:
             if self.reserved_quantity < quantity:
                 raise ValidationError(f"No hay suficiente stock reservado para confirmar esta venta en {self.name}.")
@@ -100,7 +309,7 @@ class Product(models.Model):
             self.reserved_quantity -= quantity
 
         self.current_stock -= quantity
-        self.save()
+        self.save(movement=('SALE', ''))
     
     def get_dynamic_price(self, customer=None):
         """
@@ -111,7 +320,7 @@ class Product(models.Model):
         if self.discounted_price is None:
             return self.price, self.final_price, None
 
-        promo_name = self.active_promotion.name if self.active_promotion else "Oferta"
+        promo_name = self.active_promotion_name or "Oferta"
 
         #PROMOCION CLIENTE FRECUENTE
         if self.promo_requires_frequent_customer:
@@ -124,18 +333,22 @@ class Product(models.Model):
         #PROMOCIÓN GENERAL
         return self.discounted_price, self.final_price, promo_name
 
+    @staticmethod
+    def _previous_month_bounds():
+        """Rango [inicio del mes pasado, inicio del mes actual) en hora local."""
+        now = timezone.localtime(timezone.now())
+        start_current_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_prev_month = start_current_month - datetime.timedelta(days=1)
+        start_prev_month = end_prev_month.replace(day=1)
+        return start_prev_month, start_current_month
+
     def update_inventory_status(self):
         """
         Calcula si el producto debe ser Low Stock.
         Retorna True si cambió el estatus, False si sigue igual.
         """
-        from orders.models import OrderItems # Import local para evitar ciclos
-        
         # 1. Fechas del mes pasado
-        now = timezone.localtime(timezone.now())
-        start_current_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_prev_month = start_current_month - datetime.timedelta(days=1)
-        start_prev_month = end_prev_month.replace(day=1)
+        start_prev_month, start_current_month = self._previous_month_bounds()
 
         # 2. Sumar ventas PAGADAS del mes pasado
         total_sold = OrderItems.objects.filter(
@@ -158,9 +371,50 @@ class Product(models.Model):
             self.save(update_fields=['low_stock'])
             return True 
         return False
-    
+
+    @classmethod
+    def bulk_update_inventory_status(cls):
+        """
+        Versión masiva de update_inventory_status para todo el catálogo.
+        Las ventas del mes pasado se calculan con una subconsulta agrupada por producto
+        y el flag se voltea con dos UPDATE (activar / desactivar), sin cargar productos en memoria.
+        Retorna {"activated": n, "deactivated": m}.
+        """
+        start_prev_month, start_current_month = cls._previous_month_bounds()
+
+        sold_last_month = Coalesce(
+            Subquery(
+                OrderItems.objects.filter(
+                    product=OuterRef('pk'),
+                    order__created_at__gte=start_prev_month,
+                    order__created_at__lt=start_current_month,
+                    order__status='PAID'
+                ).values('product').annotate(
+                    total=Sum('quantity')
+                ).values('total')[:1],
+                output_field=models.IntegerField()
+            ),
+            Value(0)
+        )
+
+        with transaction.atomic():
+            activated = cls.objects.filter(
+                low_stock=False, current_stock__lt=sold_last_month
+            ).update(low_stock=True)
+            deactivated = cls.objects.filter(
+                low_stock=True, current_stock__gte=sold_last_month
+            ).update(low_stock=False)
+
+        return {"activated": activated, "deactivated": deactivated}
+
     class Meta:
         db_table = 'PRODUCTS'
+        indexes = [
+            # Solo una fracción del catálogo está en low stock: índice parcial pequeño
+            models.Index(fields=['low_stock'], condition=models.Q(low_stock=True), name='products_low_stock_idx'),
+            # Búsqueda difusa por nombre (pg_trgm). Solo se crea en PostgreSQL, ver products.search
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='products_name_trgm_idx'),
+        ]
 
     def get_absolute_url(self):
         return reverse("product_detail", kwargs={"pk": self.pk})
@@ -191,19 +445,21 @@ class Promotion(models.Model):
     class Meta:
         db_table = 'PROMOTIONS' 
 
-    def sync_product_price(self):
+    def sync_product_price(self, today=None):
         """
         Orquestador principal: Decide si aplicar o quitar la promoción
-        basado en su validez actual.
+        basado en su validez actual (o en la fecha `today` si se indica).
         """
-        if self.is_valid_today():
+        if self.is_valid_today(today):
             self._apply_promotion()
         else:
             self._remove_promotion()
 
-    def is_valid_today(self):
-        """Retorna True si la promoción está activa y dentro del rango de fechas hoy."""
-        today = timezone.now().date()
+        invalidate_product_lookup([self.product_id])
+
+    def is_valid_today(self, today=None):
+        """Retorna True si la promoción está activa y dentro del rango de fechas hoy (o en `today`)."""
+        today = today or timezone.now().date()
         return self.is_active and (self.start_date <= today <= self.end_date)
 
     def _calculate_discounted_price(self):
@@ -211,39 +467,58 @@ class Promotion(models.Model):
         discount_factor = Decimal(self.discount_percent) / Decimal("100.00")
         return Decimal(self.product.price) * (Decimal("1.00") - discount_factor)
 
+    def _is_applied(self):
+        """
+        True si el producto ya tiene esta promoción con el descuento calculado sobre su precio actual.
+        Detecta también el precio editado con la promoción corriendo (el descuento quedó sobre el precio anterior).
+        """
+        product = self.product
+        return (
+            product.active_promotion_id == self.pk
+            and product.active_promotion_name == self.name
+            and product.promo_requires_frequent_customer == (self.target_audience == 'FREQUENT_ONLY')
+            and product.discounted_price is not None
+            and Decimal(product.discounted_price).quantize(Decimal("0.01"))
+            == self._calculate_discounted_price().quantize(Decimal("0.01"))
+        )
+
     def _apply_promotion(self):
         """Inyecta los datos de la promoción en el producto."""
         new_price = self._calculate_discounted_price()
         
         self.product.discounted_price = new_price
         self.product.active_promotion = self
+        self.product.active_promotion_name = self.name
         
         # Mapeo de target_audience a booleano
         self.product.promo_requires_frequent_customer = (self.target_audience == 'FREQUENT_ONLY')
         
-        self.product.save()
+        self.product.save(update_fields=Product.PRICE_FIELDS)
 
     def _remove_promotion(self):
         """Limpia los datos del producto SOLO si esta es la promoción activa."""
         if self.product.active_promotion_id == self.pk:
             self.product.discounted_price = None
             self.product.active_promotion = None
+            self.product.active_promotion_name = None
             self.product.promo_requires_frequent_customer = False
             
-            self.product.save()
+            self.product.save(update_fields=Product.PRICE_FIELDS)
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, today=None, **kwargs):
+        """Guarda y sincroniza el producto; `today` fija la fecha con la que se evalúa la vigencia."""
         super().save(*args, **kwargs)
 
-        self.sync_product_price()
+        self.sync_product_price(today)
 
     def delete(self, *args, **kwargs):
         # Si borran la promo, limpiamos el producto antes de que desaparezca la instancia
         if self.product.active_promotion_id == self.pk:
             self.product.discounted_price = None
             self.product.active_promotion = None
-            self.product.requires_frequent_customer = False
-            self.product.save()
+            self.product.active_promotion_name = None
+            self.product.promo_requires_frequent_customer = False
+            self.product.save(update_fields=Product.PRICE_FIELDS)
             
         super().delete(*args, **kwargs)
     
@@ -268,6 +543,75 @@ class Promotion(models.Model):
                 promo.is_active = False 
                 promo.save()
 
+    @classmethod
+    def apply_day_transitions(cls, today=None):
+        """
+        Scheduler diario (fuera del checkout). Solo aplica los cambios de día:
+        - Apaga las promociones vencidas y limpia su producto.
+        - Aplica las promociones vigentes que aún no están activas en su producto.
+        Las promociones que ya están aplicadas no se vuelven a guardar.
+        `today` (por omisión la fecha actual) se usa tanto para elegir las transiciones
+        como para la validez con la que se sincroniza cada producto.
+        Retorna un dict con los conteos de cada transición.
+        """
+        today = today or timezone.now().date()
+
+        expired_promos = cls.objects.filter(is_active=True, end_date__lt=today).select_related('product')
+        starting_promos = cls.objects.filter(
+            is_active=True,
+            start_date__lte=today,
+            end_date__gte=today
+        ).exclude(product__active_promotion=F('pk')).select_related('product')
+
+        expired = 0
+        activated = 0
+        with transaction.atomic():
+            for promo in expired_promos:
+                promo.is_active = False
+                promo.save(today=today)
+                expired += 1
+
+            for promo in starting_promos:
+                promo._apply_promotion()
+                activated += 1
+
+        return {"expired": expired, "activated": activated}
+
+    @classmethod
+    def sync_products(cls, products):
+        """
+        Resolución perezosa de precios para el checkout: revisa solo los productos
+        recibidos y corrige los que quedaron desfasados (ej. el scheduler aún no corre hoy
+        o el precio cambió sin recalcular el descuento).
+        Los productos se modifican en memoria y solo se guardan si cambiaron.
+        """
+        today = timezone.now().date()
+        valid_promos = {
+            promo.product_id: promo
+            for promo in cls.objects.filter(
+                product__in=products,
+                is_active=True,
+                start_date__lte=today,
+                end_date__gte=today
+            )
+        }
+
+        for product in products:
+            promo = valid_promos.get(product.pk)
+
+            if promo is not None:
+                promo.product = product
+                if not promo._is_applied():
+                    promo._apply_promotion()
+                else:
+                    product.active_promotion = promo
+            elif product.active_promotion_id is not None:
+                product.discounted_price = None
+                product.active_promotion = None
+                product.active_promotion_name = None
+                product.promo_requires_frequent_customer = False
+                product.save(update_fields=Product.PRICE_FIELDS)
+
     @classmethod
     def check_and_activate_promotions(cls):
         """
@@ -290,3 +634,369 @@ class Promotion(models.Model):
                 count += 1
         
         return count
+
+
+class ProductPrice(models.Model):
+    """
+    Tabla materializada de precios de venta: una fila por (producto, nivel de cliente).
+    Se recalcula cuando cambia el precio, el impuesto o la promoción del producto
+    (Product.save, repricing masivo e importación); el checkout y el lookup del POS
+    leen el precio listo en vez de resolverlo línea por línea.
+    """
+    GENERAL = 'GENERAL'
+    FREQUENT = 'FREQUENT'
+    TIER_CHOICES = [
+        (GENERAL, 'Público general'),
+        (FREQUENT, 'Cliente frecuente'),
+    ]
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="tier_prices"
+    )
+    tier = models.CharField(max_length=10, choices=TIER_CHOICES)
+    base_price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Precio unitario sin impuestos")
+    # 4 decimales: el precio general de una promoción solo para frecuentes es price * (1 + IVA)
+    # sin redondear, igual que Product.get_dynamic_price; con 2 el total del checkout cambiaría
+    final_price = models.DecimalField(max_digits=12, decimal_places=4, help_text="Precio unitario con impuestos")
+    promotion_name = models.CharField(max_length=50, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'PRODUCT_PRICES'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'tier'], name='product_price_tier_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.tier}: {self.final_price}"
+
+    @classmethod
+    def tier_for(cls, customer):
+        return cls.FREQUENT if customer is not None and customer.is_frequent else cls.GENERAL
+
+    @classmethod
+    def refresh(cls, product_ids, chunk_size=1000):
+        """
+        Recalcula las filas de los productos dados: por lote, un SELECT y un upsert.
+        Retorna el número de filas escritas.
+        """
+        product_ids = [pk for pk in product_ids if pk is not None]
+        written = 0
+
+        for start in range(0, len(product_ids), chunk_size):
+            rows = Product.objects.filter(pk__in=product_ids[start:start + chunk_size]).values_list(
+                'pk', 'price', 'tax_rate', 'discounted_price', 'final_price',
+                'promo_requires_frequent_customer', 'active_promotion_name'
+            )
+            prices = [price for row in rows for price in cls.build_rows(*row)]
+            written += len(cls.objects.bulk_create(
+                prices,
+                update_conflicts=True,
+                unique_fields=['product', 'tier'],
+                update_fields=['base_price', 'final_price', 'promotion_name', 'updated_at'],
+            ))
+
+        return written
+
+    @classmethod
+    def refresh_all(cls, chunk_size=1000):
+        product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+        return cls.refresh(product_ids, chunk_size=chunk_size)
+
+    @classmethod
+    def build_rows(cls, product_id, price, tax_rate, discounted_price, final_price, requires_frequent, promotion_name):
+        """Misma regla que Product.get_dynamic_price, resuelta una vez por nivel."""
+        if discounted_price is None:
+            general = frequent = (price, final_price, None)
+        else:
+            promotion = (discounted_price, final_price, promotion_name or "Oferta")
+            if requires_frequent:
+                general = (price, price * Product.tax_multiplier(tax_rate), None)
+                frequent = promotion
+            else:
+                general = frequent = promotion
+
+        return [
+            cls(product_id=product_id, tier=tier, base_price=base, final_price=final, promotion_name=name)
+            for tier, (base, final, name) in ((cls.GENERAL, general), (cls.FREQUENT, frequent))
+        ]
+
+
+class StockReservation(models.Model):
+    """
+    Apartado de stock con vencimiento (creado desde /products/{id}/reserve/).
+    Product.reserved_quantity es la suma de los apartados ACTIVE; el comando
+    release_expired_holds libera los vencidos.
+    """
+    STATUS_CHOICES = [
+        ('ACTIVE', 'Activo'),
+        ('RELEASED', 'Liberado'),
+        ('EXPIRED', 'Vencido'),
+    ]
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="reservations"
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ACTIVE')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'STOCK_RESERVATIONS'
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='stock_reservation_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} ({self.status})"
+
+    @staticmethod
+    def hold_duration():
+        return datetime.timedelta(minutes=getattr(settings, 'RESERVATION_HOLD_MINUTES', 24 * 60))
+
+    @classmethod
+    def release(cls, product, quantity):
+        """
+        Libera `quantity` unidades de los apartados activos del producto, empezando por los más recientes.
+        Debe llamarse con el producto bloqueado (select_for_update).
+        """
+        pending = quantity
+        for reservation in cls.objects.filter(product=product, status='ACTIVE').order_by('-created_at', '-pk'):
+            if pending <= 0:
+                break
+            if reservation.quantity <= pending:
+                pending -= reservation.quantity
+                reservation.status = 'RELEASED'
+                reservation.save(update_fields=['status'])
+            else:
+                reservation.quantity -= pending
+                reservation.save(update_fields=['quantity'])
+                pending = 0
+
+    @classmethod
+    def release_expired(cls, now=None, chunk_size=500):
+        """
+        Libera los apartados vencidos por lotes: en cada lote un SUM agrupado por producto,
+        un UPDATE de reserved_quantity y un UPDATE de estado.
+        Retorna {"reservations": n, "units": m}.
+        """
+        now = now or timezone.now()
+        stats = {"reservations": 0, "units": 0}
+
+        while True:
+            with transaction.atomic():
+                chunk = list(
+                    cls.objects.select_for_update(skip_locked=True).filter(
+                        status='ACTIVE', expires_at__lte=now
+                    ).order_by('expires_at').values_list('pk', flat=True)[:chunk_size]
+                )
+                if not chunk:
+                    break
+
+                released = dict(
+                    cls.objects.filter(pk__in=chunk)
+                    .values('product')
+                    .annotate(total=Sum('quantity'))
+                    .values_list('product', 'total')
+                )
+                Product.release_reserved(released, note='Apartado vencido')
+                cls.objects.filter(pk__in=chunk).update(status='EXPIRED')
+
+            stats["reservations"] += len(chunk)
+            stats["units"] += sum(released.values())
+
+            if len(chunk) < chunk_size:
+                break
+
+        return stats
+
+
+class InventoryMovement(models.Model):
+    """
+    Bitácora de inventario de solo inserción: cada venta, cancelación, apartado y ajuste manual
+    deja un renglón con el cambio firmado de current_stock y/o reserved_quantity.
+    El stock de una fecha es el último InventorySnapshot más la suma de movimientos posteriores.
+    """
+    TYPE_CHOICES = [
+        ('INITIAL', 'Alta de producto'),
+        ('SALE', 'Venta'),
+        ('CANCELLATION', 'Cancelación'),
+        ('RESERVATION', 'Apartado'),
+        ('RELEASE', 'Liberación de apartado'),
+        ('ADJUSTMENT', 'Ajuste manual'),
+    ]
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="movements"
+    )
+    order = models.ForeignKey(
+        'orders.Order',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="inventory_movements"
+    )
+    movement_type = models.CharField(max_length=15, choices=TYPE_CHOICES)
+    stock_delta = models.IntegerField(default=0)
+    reserved_delta = models.IntegerField(default=0)
+    note = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'INVENTORY_MOVEMENTS'
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='inventory_movement_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movement_type} {self.product_id}: {self.stock_delta:+d} / {self.reserved_delta:+d}"
+
+    @classmethod
+    def record(cls, movement_type, entries, field='stock', note=''):
+        """
+        Registra los movimientos con un solo bulk insert.
+        entries: iterable de (product_id, order_id, cantidad firmada); field: 'stock' o 'reserved'.
+        Las cantidades en cero se omiten.
+        """
+        now = timezone.now()
+        movements = [
+            cls(
+                product_id=product_id,
+                order_id=order_id,
+                movement_type=movement_type,
+                note=note,
+                created_at=now,
+                **{f'{field}_delta': quantity}
+            )
+            for product_id, order_id, quantity in entries
+            if quantity
+        ]
+        return cls.objects.bulk_create(movements)
+
+
+class InventorySnapshot(models.Model):
+    """
+    Saldo compactado de un producto a una fecha: acumula todos los movimientos hasta as_of.
+    Lo genera periódicamente el comando compact_inventory_ledger.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="inventory_snapshots"
+    )
+    as_of = models.DateTimeField()
+    stock = models.IntegerField()
+    reserved = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'INVENTORY_SNAPSHOTS'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'as_of'], name='inventory_snapshot_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.as_of}: {self.stock} / {self.reserved}"
+
+    @classmethod
+    def levels(cls, product_ids, as_of=None):
+        """
+        Stock y apartados según la bitácora para cada producto, al momento as_of (default: ahora).
+        Una sola consulta: por producto, el último snapshot <= as_of (índice único product, as_of)
+        más la suma de movimientos entre ese snapshot y as_of (índice product, created_at).
+        Retorna {product_id: (stock, reserved)}.
+        """
+        as_of = as_of or timezone.now()
+
+        latest = cls.objects.filter(product=OuterRef('pk'), as_of__lte=as_of).order_by('-as_of')
+        # Sin snapshot se suman todos los movimientos del producto
+        since = Coalesce(
+            OuterRef('snapshot_as_of'),
+            Value(datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)),
+            output_field=models.DateTimeField()
+        )
+        movements = InventoryMovement.objects.filter(
+            product=OuterRef('pk'), created_at__gt=since, created_at__lte=as_of
+        ).order_by().values('product')
+
+        rows = Product.objects.filter(pk__in=list(product_ids)).annotate(
+            snapshot_as_of=Subquery(latest.values('as_of')[:1]),
+            snapshot_stock=Coalesce(Subquery(latest.values('stock')[:1]), 0),
+            snapshot_reserved=Coalesce(Subquery(latest.values('reserved')[:1]), 0),
+            delta_stock=Coalesce(Subquery(movements.annotate(total=Sum('stock_delta')).values('total')), 0),
+            delta_reserved=Coalesce(Subquery(movements.annotate(total=Sum('reserved_delta')).values('total')), 0),
+        ).values_list('pk', 'snapshot_stock', 'snapshot_reserved', 'delta_stock', 'delta_reserved')
+
+        return {
+            pk: (snapshot_stock + delta_stock, snapshot_reserved + delta_reserved)
+            for pk, snapshot_stock, snapshot_reserved, delta_stock, delta_reserved in rows
+        }
+
+    @classmethod
+    def stock_as_of(cls, product, as_of):
+        """Stock y apartados de un producto a una fecha: retorna (stock, reserved)."""
+        return cls.levels([product.pk], as_of).get(product.pk, (0, 0))
+
+    @classmethod
+    def compact(cls, as_of=None, chunk_size=1000):
+        """
+        Crea snapshots a la fecha as_of (default: inicio del día local) para los productos
+        con movimientos desde la compactación anterior. Los productos sin movimientos conservan
+        su snapshot previo. Idempotente: volver a correr con la misma fecha no duplica.
+        Retorna el número de snapshots creados.
+        """
+        if as_of is None:
+            as_of = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        previous = cls.objects.filter(as_of__lt=as_of).aggregate(last=models.Max('as_of'))['last']
+        moved = InventoryMovement.objects.filter(created_at__lte=as_of)
+        if previous is not None:
+            moved = moved.filter(created_at__gt=previous)
+        product_ids = sorted(set(moved.values_list('product', flat=True)))
+
+        created = 0
+        for start in range(0, len(product_ids), chunk_size):
+            chunk = product_ids[start:start + chunk_size]
+            snapshots = [
+                cls(product_id=pk, as_of=as_of, stock=stock, reserved=reserved)
+                for pk, (stock, reserved) in cls.levels(chunk, as_of).items()
+            ]
+            with transaction.atomic():
+                existing = set(
+                    cls.objects.filter(product__in=chunk, as_of=as_of).values_list('product', flat=True)
+                )
+                created += len(cls.objects.bulk_create(
+                    [snapshot for snapshot in snapshots if snapshot.product_id not in existing],
+                    ignore_conflicts=True
+                ))
+
+        return created
+
+    @classmethod
+    def find_drift(cls, chunk_size=1000):
+        """
+        Recorre el catálogo en lotes (iterator, sin cargarlo completo) y compara current_stock y
+        reserved_quantity contra la bitácora: una consulta levels() por lote.
+        Genera (product_id, sku, (stock, reserved) actual, (stock, reserved) según bitácora)
+        para cada producto que no cuadra.
+        """
+        def check(chunk):
+            expected = cls.levels([pk for pk, _, _, _ in chunk])
+            for pk, sku, stock, reserved in chunk:
+                ledger = expected.get(pk, (0, 0))
+                if ledger != (stock, reserved):
+                    yield pk, sku, (stock, reserved), ledger
+
+        chunk = []
+        products = Product.objects.order_by('pk').values_list('pk', 'sku', 'current_stock', 'reserved_quantity')
+        for row in products.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield from check(chunk)
+                chunk = []
+        if chunk:
+            yield from check(chunk)
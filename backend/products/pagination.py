@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ProductCursorPagination(CursorPagination):
+    """
+    Paginación por cursor sobre el id (estable aunque se inserten productos).
+    Siempre pagina: 50 productos por omisión y hasta 500 con `page_size`; el catálogo
+    completo se recorre siguiendo `next`.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
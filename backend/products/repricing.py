@@ -0,0 +1,123 @@
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Round
+from django.utils import timezone
+
+from .cache import invalidate_product_lookup
+from .models import Product, ProductPrice, Promotion
+
+
+MONEY = models.DecimalField(max_digits=10, decimal_places=2)
+
+
+class BulkRepricingService:
+    """
+    Cambio masivo de precio y/o tasa de impuesto sobre un queryset de productos.
+
+    price, discounted_price y final_price se calculan con expresiones SQL a partir de los
+    valores actuales de cada fila, así el cambio completo es un solo UPDATE (sin save() por producto).
+    Los productos con promoción activa conservan su descuento, recalculado sobre el nuevo precio.
+
+    rule: dict con a lo más una regla de precio (price_percent, price_amount o price) y/o tax_rate.
+    """
+    PREVIEW_LIMIT = 50
+
+    @classmethod
+    def preview(cls, queryset, rule, limit=None):
+        """Retorna (productos afectados, lista de {id, sku, name, antes y después}) sin escribir nada."""
+        expressions = cls._expressions(rule)
+
+        rows = queryset.order_by('pk').annotate(
+            new_price=expressions['price'],
+            new_tax_rate=expressions['tax_rate'],
+            new_discounted_price=expressions['discounted_price'],
+            new_final_price=expressions['final_price'],
+        ).values(
+            'id', 'sku', 'name', 'price', 'tax_rate', 'discounted_price', 'final_price',
+            'new_price', 'new_tax_rate', 'new_discounted_price', 'new_final_price',
+        )[:limit or cls.PREVIEW_LIMIT]
+
+        return queryset.count(), list(rows)
+
+    @classmethod
+    def apply(cls, queryset, rule):
+        """
+        Aplica la regla en una transacción: bloquea los productos del filtro y los actualiza con un UPDATE.
+        Retorna el número de productos actualizados.
+        """
+        expressions = cls._expressions(rule)
+
+        with transaction.atomic():
+            # El bloqueo evita que una promoción cambie el precio a medio UPDATE
+            product_ids = list(queryset.select_for_update().order_by('pk').values_list('pk', flat=True))
+            if not product_ids:
+                return 0
+
+            updated = Product.objects.filter(pk__in=product_ids).update(
+                price=expressions['price'],
+                tax_rate=expressions['tax_rate'],
+                discounted_price=expressions['discounted_price'],
+                final_price=expressions['final_price'],
+                updated_at=timezone.now(),
+            )
+            ProductPrice.refresh(product_ids)
+            invalidate_product_lookup(product_ids)
+
+        return updated
+
+    @classmethod
+    def _expressions(cls, rule):
+        """
+        Expresiones por fila. En un UPDATE todas leen los valores previos de la fila,
+        por eso final_price se arma con las expresiones del nuevo precio y de la nueva tasa.
+        """
+        price = cls._price_expression(rule)
+
+        discount_percent = Subquery(
+            Promotion.objects.filter(pk=OuterRef('active_promotion')).values('discount_percent')[:1]
+        )
+        discounted_price = Case(
+            When(active_promotion__isnull=True, then=Value(None, output_field=MONEY)),
+            default=Round(price * (Value(Decimal('1.00')) - discount_percent / Value(Decimal('100.00'))), 2),
+            output_field=MONEY,
+        )
+
+        if rule.get('tax_rate'):
+            tax_rate = Value(rule['tax_rate'], output_field=models.CharField())
+            multiplier = Value(Product.tax_multiplier(rule['tax_rate']), output_field=MONEY)
+        else:
+            tax_rate = F('tax_rate')
+            multiplier = Case(
+                *[When(tax_rate=rate, then=Value(Product.tax_multiplier(rate))) for rate in Product.TaxType.values],
+                default=Value(Decimal('1.00')),
+                output_field=MONEY,
+            )
+
+        final_price = Round(Coalesce(discounted_price, price) * multiplier, 2, output_field=MONEY)
+
+        return {
+            'price': price,
+            'tax_rate': tax_rate,
+            'discounted_price': discounted_price,
+            'final_price': final_price,
+        }
+
+    @staticmethod
+    def _price_expression(rule):
+        if rule.get('price') is not None:
+            return Value(rule['price'], output_field=MONEY)
+
+        if rule.get('price_percent') is not None:
+            factor = Value(
+                Decimal('1.00') + rule['price_percent'] / Decimal('100.00'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=6)
+            )
+            change = F('price') * factor
+        elif rule.get('price_amount') is not None:
+            change = F('price') + Value(rule['price_amount'], output_field=MONEY)
+        else:
+            return F('price')
+
+        return Round(Greatest(change, Value(Decimal('0.00'), output_field=MONEY)), 2, output_field=MONEY)
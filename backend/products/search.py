@@ -0,0 +1,144 @@
+import heapq
+import re
+
+from django.contrib.postgres.search import TrigramSimilarity, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Product
+
+
+class ProductSearchService:
+    """
+    Búsqueda difusa de productos por nombre (tolera errores de dedo y nombres parciales).
+
+    En PostgreSQL usa pg_trgm con el índice GIN `products_name_trgm_idx`.
+    En cualquier otro motor (SQLite en pruebas/desarrollo) calcula los mismos trigramas
+    en memoria recorriendo el catálogo, con los umbrales por defecto de pg_trgm.
+    """
+    SIMILARITY_THRESHOLD = 0.3
+    WORD_SIMILARITY_THRESHOLD = 0.6
+    # resolve() solo acepta un resultado difuso si es el único por encima de este umbral
+    RESOLVE_THRESHOLD = 0.4
+    MAX_CANDIDATES = 5
+
+    @classmethod
+    def search(cls, query, limit=20, queryset=None):
+        """
+        Retorna una lista de productos ordenados por relevancia, cada uno con el atributo `rank` (0 a 1).
+        Un SKU exacto siempre queda primero con rank 1.
+        """
+        query = (query or '').strip()
+        if not query:
+            return []
+
+        if queryset is None:
+            queryset = Product.objects.all()
+
+        if connections[queryset.db].vendor == 'postgresql':
+            return cls._search_postgres(queryset, query, limit)
+        return cls._search_in_memory(queryset, query, limit)
+
+    @classmethod
+    def resolve(cls, identifier, queryset=None):
+        """
+        Resuelve un identificador de analytics (SKU o nombre) a un único producto.
+        Orden: SKU exacto (índice único), nombre exacto sin distinguir mayúsculas y, por último,
+        la búsqueda difusa solo si exactamente un producto supera RESOLVE_THRESHOLD.
+
+        Retorna la tupla (producto, candidatos):
+        - (producto, []) si la resolución no es ambigua.
+        - (None, candidatos) si varios productos coinciden; el llamador debe pedir un identificador más preciso.
+        - (None, []) si no hay coincidencias.
+        """
+        if queryset is None:
+            queryset = Product.objects.all()
+
+        product = queryset.filter(sku=identifier).first()
+        if product is not None:
+            return product, []
+
+        exact_names = list(queryset.filter(name__iexact=identifier).order_by('pk')[:cls.MAX_CANDIDATES])
+        if len(exact_names) == 1:
+            return exact_names[0], []
+        if exact_names:
+            return None, exact_names
+
+        candidates = [
+            product for product in cls.search(identifier, limit=cls.MAX_CANDIDATES, queryset=queryset)
+            if product.rank >= cls.RESOLVE_THRESHOLD
+        ]
+        if len(candidates) == 1:
+            return candidates[0], []
+        return None, candidates
+
+    @staticmethod
+    def _search_postgres(queryset, query, limit):
+        rank = Greatest(TrigramSimilarity('name', query), TrigramWordSimilarity(query, 'name'))
+
+        return list(
+            queryset.filter(
+                Q(sku=query) | Q(name__trigram_similar=query) | Q(name__trigram_word_similar=query)
+            ).annotate(
+                rank=Case(When(sku=query, then=Value(1.0)), default=rank, output_field=FloatField())
+            ).order_by('-rank', 'name', 'pk')[:limit]
+        )
+
+    @classmethod
+    def _search_in_memory(cls, queryset, query, limit):
+        query_trigrams = _trigrams(query)
+
+        scored = []
+        for pk, name, sku in queryset.values_list('pk', 'name', 'sku').iterator():
+            rank = 1.0 if sku == query else cls._rank(query_trigrams, name)
+            if rank is not None:
+                scored.append((-rank, name, pk))
+
+        top = heapq.nsmallest(limit, scored)
+        products = queryset.in_bulk([pk for _, _, pk in top])
+
+        results = []
+        for negative_rank, _, pk in top:
+            product = products[pk]
+            product.rank = round(-negative_rank, 4)
+            results.append(product)
+        return results
+
+    @classmethod
+    def _rank(cls, query_trigrams, name):
+        similarity = _similarity(query_trigrams, _trigrams(name))
+
+        # Similitud por palabras: mejor ventana continua de palabras del nombre
+        words = _words(name)
+        word_similarity = max(
+            (
+                _similarity(query_trigrams, _trigrams(' '.join(words[start:end])))
+                for start in range(len(words))
+                for end in range(start + 1, len(words) + 1)
+            ),
+            default=0.0
+        )
+
+        if similarity < cls.SIMILARITY_THRESHOLD and word_similarity < cls.WORD_SIMILARITY_THRESHOLD:
+            return None
+        return max(similarity, word_similarity)
+
+
+def _words(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def _trigrams(text):
+    """Trigramas al estilo pg_trgm: cada palabra con dos espacios al inicio y uno al final."""
+    trigrams = set()
+    for word in _words(text):
+        padded = f'  {word} '
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def _similarity(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
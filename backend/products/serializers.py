@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from datetime import timedelta
+from decimal import Decimal
 from .models import Product, Promotion
 
 class PromotionSerializer(serializers.ModelSerializer):
@@ -74,4 +75,111 @@ class ProductSerializer(serializers.ModelSerializer):
             'low_stock', 'supplier', 'updated_at', 'promotions'
         ]
 
-    
\ No newline at end of file
+    
+
+class ProductPOSSerializer(serializers.ModelSerializer):
+    """Proyección ligera para el punto de venta: sin promociones anidadas."""
+    available_to_sell = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'sku', 'final_price', 'current_stock', 'available_to_sell', 'low_stock']
+        read_only_fields = fields
+
+
+class ProductSearchResultSerializer(ProductPOSSerializer):
+    """Proyección POS más la relevancia del resultado de búsqueda."""
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(ProductPOSSerializer.Meta):
+        fields = ProductPOSSerializer.Meta.fields + ['rank']
+        read_only_fields = fields
+
+
+class ProductLookupSerializer(serializers.ModelSerializer):
+    """Proyección lista para cobrar al escanear un SKU."""
+    available_to_sell = serializers.SerializerMethodField()
+    prices = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'sku', 'name', 'price', 'discounted_price', 'final_price',
+            'promo_requires_frequent_customer', 'current_stock', 'available_to_sell', 'prices'
+        ]
+        read_only_fields = fields
+
+    def get_available_to_sell(self, obj):
+        return obj.current_stock - obj.reserved_quantity
+
+    def get_prices(self, obj):
+        """Precio por nivel de cliente: {"general": {...}, "frequent": {...}}."""
+        rows = getattr(obj, 'tier_price_rows', None)
+        if rows is None:
+            rows = obj.tier_prices.all()
+        return {
+            row.tier.lower(): {
+                "base_price": f"{row.base_price:.2f}",
+                "final_price": f"{row.final_price:.2f}",
+                "promotion_name": row.promotion_name,
+            }
+            for row in rows
+        }
+
+
+class BulkRepriceSerializer(serializers.Serializer):
+    """
+    Filtro + regla para /products/reprice/.
+    Filtro: ids, skus, supplier, current_tax_rate o all_products=true (todo el catálogo).
+    Regla: una de price_percent / price_amount / price, y/o tax_rate.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    skus = serializers.ListField(child=serializers.CharField(max_length=30), required=False, allow_empty=False)
+    supplier = serializers.IntegerField(required=False)
+    current_tax_rate = serializers.ChoiceField(choices=Product.TaxType.choices, required=False)
+    all_products = serializers.BooleanField(default=False)
+
+    price_percent = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=Decimal('-99.99'), required=False)
+    price_amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.00'), required=False)
+    tax_rate = serializers.ChoiceField(choices=Product.TaxType.choices, required=False)
+
+    dry_run = serializers.BooleanField(default=False)
+
+    FILTER_FIELDS = ['ids', 'skus', 'supplier', 'current_tax_rate']
+    PRICE_RULES = ['price_percent', 'price_amount', 'price']
+
+    def validate(self, attrs):
+        if not attrs['all_products'] and not any(field in attrs for field in self.FILTER_FIELDS):
+            raise serializers.ValidationError(
+                "Indica un filtro (ids, skus, supplier, current_tax_rate) o all_products=true."
+            )
+
+        price_rules = [field for field in self.PRICE_RULES if field in attrs]
+        if len(price_rules) > 1:
+            raise serializers.ValidationError("Solo se permite una regla de precio: price_percent, price_amount o price.")
+        if not price_rules and 'tax_rate' not in attrs:
+            raise serializers.ValidationError("Indica una regla de precio y/o tax_rate.")
+
+        return attrs
+
+    def get_queryset(self):
+        data = self.validated_data
+        queryset = Product.objects.all()
+
+        if 'ids' in data:
+            queryset = queryset.filter(pk__in=data['ids'])
+        if 'skus' in data:
+            queryset = queryset.filter(sku__in=data['skus'])
+        if 'supplier' in data:
+            queryset = queryset.filter(supplier_id=data['supplier'])
+        if 'current_tax_rate' in data:
+            queryset = queryset.filter(tax_rate=data['current_tax_rate'])
+        return queryset
+
+    def get_rule(self):
+        return {
+            field: self.validated_data[field]
+            for field in self.PRICE_RULES + ['tax_rate']
+            if field in self.validated_data
+        }
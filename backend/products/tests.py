@@ -7,10 +7,19 @@ from django.utils import timezone
 from decimal import Decimal
 from datetime import timedelta
 from django.core.management import call_command
+from io import StringIO
+import os
+import tempfile
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
 
 from suppliers.models import Supplier
-from .models import Product, Promotion
+from .models import Product, Promotion, StockReservation, InventoryMovement, InventorySnapshot, ProductPrice
+from .cache import product_lookup_cache, ProductLookupCache
+from .imports import ProductImportService
+from .pagination import ProductCursorPagination
 from orders.models import Order, OrderItems
+from orders.services import OrderCancellationService
 
 User = get_user_model()
 
@@ -18,6 +27,7 @@ User = get_user_model()
 class BaseProductTestCase(APITestCase):
     def setUp(self):
         self.client = APIClient()
+        product_lookup_cache.clear()
         self.today = timezone.now().date()
         self.tomorrow = self.today + timedelta(days=1)
         self.next_month = self.today + timedelta(days=30)
@@ -116,7 +126,9 @@ class ProductUnitTests(BaseProductTestCase):
         )
         self.product.refresh_from_db()
 
-        _, final_n, name_n = self.product.get_dynamic_price(self.regular_customer)
+        # El nombre de la promoción viene desnormalizado en el producto: sin consultas extra
+        with self.assertNumQueries(0):
+            _, final_n, name_n = self.product.get_dynamic_price(self.regular_customer)
         self.assertEqual(final_n, Decimal("92.80"))
         self.assertEqual(name_n, "Promo General Verano")
 
@@ -134,6 +146,22 @@ class ProductUnitTests(BaseProductTestCase):
         self.assertIsNone(name)
 
 
+    def test_lookup_cache_evicts_lru_and_expires(self):
+        cache = ProductLookupCache(max_entries=2, ttl=60)
+        cache.set("A", {"id": 1})
+        cache.set("B", {"id": 2})
+        cache.get("A")
+        cache.set("C", {"id": 3})
+        self.assertIsNone(cache.get("B"))
+        self.assertEqual(cache.get("A"), {"id": 1})
+
+        cache.invalidate([1])
+        self.assertIsNone(cache.get("A"))
+
+        expired = ProductLookupCache(ttl=0)
+        expired.set("A", {"id": 1})
+        self.assertIsNone(expired.get("A"))
+
 class ProductIntegrationTests(BaseProductTestCase):
 
     def test_final_price_is_readonly(self):
@@ -243,6 +271,131 @@ class ProductFunctionalTests(BaseProductTestCase):
         self.product.refresh_from_db()
         self.assertEqual(self.product.reserved_quantity, 3) 
 
+    def test_reservations_expire_and_release_reserved_stock(self):
+        self.client.force_authenticate(user=self.employee_user)
+        url = reverse('product-manage-reservation', kwargs={'pk': self.product.id})
+
+        response = self.client.post(url, {"amount": 5})
+        self.assertIsNotNone(response.data['expires_at'])
+        self.client.post(url, {"amount": 3})
+        self.client.post(url, {"amount": -4})
+
+        # Se libera primero el apartado más reciente (3) y luego 1 del anterior
+        self.assertEqual(
+            list(StockReservation.objects.order_by('pk').values_list('quantity', 'status')),
+            [(4, 'ACTIVE'), (3, 'RELEASED')]
+        )
+
+        self.assertEqual(StockReservation.release_expired(), {"reservations": 0, "units": 0})
+        stats = StockReservation.release_expired(now=timezone.now() + timedelta(days=2), chunk_size=1)
+
+        self.assertEqual(stats, {"reservations": 1, "units": 4})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 0)
+        self.assertEqual(StockReservation.objects.get(quantity=4).status, 'EXPIRED')
+
+    def test_product_list_is_always_paginated_by_cursor(self):
+        self.client.force_authenticate(user=self.employee_user)
+        for i in range(3):
+            Product.objects.create(name=f"Extra {i}", sku=f"EXTRA-{i}", price=10, supplier=self.supplier)
+
+        # Sin parámetros se entrega la primera página de 50, nunca el catálogo completo
+        response = self.client.get(self.products_list_url)
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertIsNone(response.data['next'])
+
+        with mock.patch.object(ProductCursorPagination, 'page_size', 2):
+            response = self.client.get(reverse('product-pos'))
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(self.products_list_url, {"page_size": 3})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([p['sku'] for p in response.data['results']], ["EXTRA-2"])
+
+    def test_product_list_prefetches_promotions(self):
+        self.client.force_authenticate(user=self.employee_user)
+        for i in range(5):
+            product = Product.objects.create(name=f"Promo {i}", sku=f"PROMO-{i}", price=10, supplier=self.supplier)
+            Promotion.objects.create(name=f"P{i}", product=product, discount_percent=10, start_date=self.today, end_date=self.next_month, target_audience="ALL", is_active=True)
+
+        # Una consulta de productos + una de promociones, sin importar el tamaño del catálogo
+        with self.assertNumQueries(2):
+            response = self.client.get(self.products_list_url, {"page_size": 50})
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_filter_products_by_sku_name_prefix_supplier_and_low_stock(self):
+        self.client.force_authenticate(user=self.employee_user)
+        other_supplier = Supplier.objects.create(name="Otro", phone_number="1", contact_person="X", rfc="XEXX010101000", tax_address="N/A")
+        Product.objects.create(name="Refresco Cola", sku="REF-1", price=10, supplier=other_supplier, low_stock=True)
+        Product.objects.create(name="Galletas", sku="GAL-1", price=10, supplier=self.supplier)
+
+        self.assertEqual([p['sku'] for p in self.client.get(self.products_list_url, {"sku": "GAL-1"}).data['results']], ["GAL-1"])
+        self.assertEqual([p['sku'] for p in self.client.get(self.products_list_url, {"name": "Refr"}).data['results']], ["REF-1"])
+        self.assertEqual([p['sku'] for p in self.client.get(self.products_list_url, {"supplier": other_supplier.id}).data['results']], ["REF-1"])
+        self.assertEqual([p['sku'] for p in self.client.get(self.products_list_url, {"low_stock": "true"}).data['results']], ["REF-1"])
+
+    def test_pos_projection_omits_promotions(self):
+        self.client.force_authenticate(user=self.employee_user)
+        self.product.reserved_quantity = 5
+        self.product.save()
+
+        response = self.client.get(reverse('product-pos'), {"sku": "BASE-001"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('promotions', response.data['results'][0])
+        self.assertEqual(response.data['results'][0]['available_to_sell'], 45)
+        self.assertEqual(response.data['results'][0]['final_price'], "116.00")
+
+    def test_sku_lookup_is_served_from_cache_until_product_changes(self):
+        self.client.force_authenticate(user=self.employee_user)
+        url = reverse('product-lookup')
+
+        response = self.client.get(url, {"sku": "BASE-001"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['final_price'], "116.00")
+        self.assertEqual(response.data['available_to_sell'], 50)
+
+        with self.assertNumQueries(0):
+            self.client.get(url, {"sku": "BASE-001"})
+
+        # Promoción (sync_product_price) y venta (UPDATE masivo de stock) invalidan la entrada
+        Promotion.objects.create(name="Promo", product=self.product, discount_percent=50, start_date=self.today, end_date=self.next_month, target_audience="FREQUENT_ONLY", is_active=True)
+        response = self.client.get(url, {"sku": "BASE-001"})
+        self.assertEqual(response.data['discounted_price'], "50.00")
+        self.assertTrue(response.data['promo_requires_frequent_customer'])
+
+        Product.apply_stock_deltas({self.product.pk: -5})
+        response = self.client.get(url, {"sku": "BASE-001"})
+        self.assertEqual(response.data['current_stock'], 45)
+
+    def test_sku_lookup_errors(self):
+        self.client.force_authenticate(user=self.employee_user)
+        url = reverse('product-lookup')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {"sku": "NOPE"}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_ranks_exact_sku_partial_names_and_typos(self):
+        self.client.force_authenticate(user=self.employee_user)
+        Product.objects.create(name="Coca Cola 600ml", sku="KO-600", price=18, supplier=self.supplier)
+        Product.objects.create(name="Galletas de Chocolate", sku="GAL-CH", price=25, supplier=self.supplier)
+        url = reverse('product-search')
+
+        response = self.client.get(url, {"q": "coca"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['sku'] for p in response.data], ["KO-600"])
+
+        response = self.client.get(url, {"q": "galetas chocolate"})
+        self.assertEqual(response.data[0]['sku'], "GAL-CH")
+        self.assertNotIn('promotions', response.data[0])
+
+        response = self.client.get(url, {"q": "GAL-CH"})
+        self.assertEqual(response.data[0]['rank'], 1.0)
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+
 class ProductSystemAndCronTests(BaseProductTestCase):
 
     def test_cron_activates_sleeping_promotion(self):
@@ -262,6 +415,48 @@ class ProductSystemAndCronTests(BaseProductTestCase):
         self.assertEqual(count, 0)
         self.assertIsNone(self.product.discounted_price)
 
+    def test_day_transitions_only_apply_changes(self):
+        Promotion.objects.create(name="Vigente", product=self.product, discount_percent=10, start_date=self.today, end_date=self.next_month, target_audience="ALL", is_active=True)
+
+        product_expired = Product.objects.create(name="Vencido", sku="EXP-1", price=Decimal("100.00"), supplier=self.supplier)
+        expired = Promotion.objects.create(name="Vencida", product=product_expired, discount_percent=10, start_date=self.today, end_date=self.tomorrow, target_audience="ALL", is_active=True)
+        Promotion.objects.filter(pk=expired.pk).update(start_date=self.today - timedelta(days=5), end_date=self.today - timedelta(days=1))
+
+        product_starting = Product.objects.create(name="Nuevo", sku="NEW-1", price=Decimal("100.00"), supplier=self.supplier)
+        starting = Promotion.objects.create(name="Empieza", product=product_starting, discount_percent=10, start_date=self.tomorrow, end_date=self.next_month, target_audience="ALL", is_active=True)
+        Promotion.objects.filter(pk=starting.pk).update(start_date=self.today)
+
+        untouched_at = Product.objects.get(pk=self.product.pk).updated_at
+
+        result = Promotion.apply_day_transitions()
+
+        self.assertEqual(result, {"expired": 1, "activated": 1})
+        self.assertEqual(Product.objects.get(pk=self.product.pk).updated_at, untouched_at)
+        product_expired.refresh_from_db()
+        self.assertIsNone(product_expired.discounted_price)
+        product_starting.refresh_from_db()
+        self.assertEqual(product_starting.discounted_price, Decimal("90.00"))
+
+        call_command('sync_promotions')
+        self.assertEqual(Promotion.apply_day_transitions(), {"expired": 0, "activated": 0})
+
+    def test_day_transitions_use_the_given_date(self):
+        ending = Promotion.objects.create(name="Termina hoy", product=self.product, discount_percent=10, start_date=self.today, end_date=self.today, target_audience="ALL", is_active=True)
+        product_starting = Product.objects.create(name="Mañana", sku="TMR-1", price=Decimal("100.00"), supplier=self.supplier)
+        starting = Promotion.objects.create(name="Empieza mañana", product=product_starting, discount_percent=20, start_date=self.tomorrow, end_date=self.next_month, target_audience="ALL", is_active=True)
+
+        self.assertTrue(ending.is_valid_today(self.today))
+        self.assertFalse(ending.is_valid_today(self.tomorrow))
+        self.assertTrue(starting.is_valid_today(self.tomorrow))
+
+        result = Promotion.apply_day_transitions(today=self.tomorrow)
+
+        self.assertEqual(result, {"expired": 1, "activated": 1})
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.active_promotion_id)
+        product_starting.refresh_from_db()
+        self.assertEqual(product_starting.discounted_price, Decimal("80.00"))
+
     def test_low_stock_se_activa_via_comando(self):
         first_this_month = timezone.localtime(timezone.now()).replace(day=1)
         fecha_mes_pasado = first_this_month - timedelta(days=15)
@@ -275,4 +470,331 @@ class ProductSystemAndCronTests(BaseProductTestCase):
         call_command('update_low_stock')
 
         self.product.refresh_from_db()
-        self.assertTrue(self.product.low_stock)
\ No newline at end of file
+        self.assertTrue(self.product.low_stock)
+
+    def test_bulk_low_stock_matches_per_product_and_resets_flag(self):
+        first_this_month = timezone.localtime(timezone.now()).replace(day=1)
+        order = Order.objects.create(status='PAID', subtotal=1500, final_amount=1500)
+        Order.objects.filter(pk=order.pk).update(created_at=first_this_month - timedelta(days=15))
+        OrderItems.objects.create(order=order, product=self.product, quantity=100, product_name=self.product.name, unit_price=self.product.price, amount=1500)
+
+        restocked = Product.objects.create(
+            name="Reabastecido", sku="RESTOCK-1", price=Decimal('10.00'), current_stock=500,
+            low_stock=True, supplier=self.supplier
+        )
+
+        self.assertTrue(self.product.update_inventory_status())
+        Product.objects.filter(pk=self.product.pk).update(low_stock=False)
+
+        # Savepoint + 2 UPDATE con subconsulta correlacionada, sin importar el tamaño del catálogo
+        with self.assertNumQueries(4):
+            result = Product.bulk_update_inventory_status()
+
+        self.assertEqual(result, {"activated": 1, "deactivated": 1})
+        self.product.refresh_from_db()
+        restocked.refresh_from_db()
+        self.assertTrue(self.product.low_stock)
+        self.assertFalse(restocked.low_stock)
+        self.assertEqual(Product.bulk_update_inventory_status(), {"activated": 0, "deactivated": 0})
+
+
+class InventoryLedgerTests(BaseProductTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.employee_user)
+
+    def test_model_layer_records_orm_changes(self):
+        # Alta por ORM, venta directa, edición tipo admin y deltas en bloque: sin pasar por la API
+        self.product.reduce_stock(5)
+        product = Product.objects.get(pk=self.product.pk)
+        product.current_stock = 60
+        product.reserved_quantity = 4
+        product.save()
+        Product.apply_stock_deltas({product.pk: -10})
+        Product.release_reserved({product.pk: 1})
+        product = Product.objects.get(pk=self.product.pk)
+        product.save(update_fields=['name'])
+
+        self.assertEqual(
+            list(InventoryMovement.objects.filter(product=self.product).order_by('pk').values_list(
+                'movement_type', 'stock_delta', 'reserved_delta'
+            )),
+            [('INITIAL', 50, 0), ('SALE', -5, 0), ('ADJUSTMENT', 15, 0), ('ADJUSTMENT', 0, 4),
+             ('ADJUSTMENT', -10, 0), ('RELEASE', 0, -1)]
+        )
+        self.assertEqual(list(InventorySnapshot.find_drift()), [])
+
+    def test_every_stock_change_is_recorded_and_reconciles(self):
+        response = self.client.post(self.products_list_url, {
+            "name": "Nuevo", "sku": "LEDGER-1", "price": "10.00", "tax_rate": "16.00",
+            "current_stock": 20, "supplier": self.supplier.id
+        })
+        new_product = Product.objects.get(pk=response.data['id'])
+
+        self.client.patch(reverse('product-detail', kwargs={'pk': new_product.pk}), {"current_stock": 25})
+        self.client.post(reverse('product-manage-reservation', kwargs={'pk': self.product.pk}), {"amount": 5})
+
+        response = self.client.post(reverse('order-list'), {
+            "items": [{"product_id": self.product.id, "quantity": 3}, {"product_id": new_product.id, "quantity": 2}]
+        }, format='json')
+        OrderCancellationService.cancel([response.data['id']])
+        self.client.post(reverse('order-list'), {"items": [{"product_id": self.product.id, "quantity": 4}]}, format='json')
+
+        self.assertEqual(
+            sorted(InventoryMovement.objects.filter(product=new_product).values_list('movement_type', 'stock_delta')),
+            [('ADJUSTMENT', 5), ('CANCELLATION', 2), ('INITIAL', 20), ('SALE', -2)]
+        )
+        self.assertEqual(
+            InventorySnapshot.levels([self.product.pk, new_product.pk]),
+            {self.product.pk: (46, 5), new_product.pk: (25, 0)}
+        )
+        self.assertEqual(list(InventorySnapshot.find_drift(chunk_size=1)), [])
+
+    def test_stock_as_of_uses_snapshot_plus_later_movements(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        InventoryMovement.objects.update(created_at=yesterday - timedelta(hours=1))
+
+        self.assertEqual(InventorySnapshot.compact(as_of=yesterday), 1)
+        self.assertEqual(InventorySnapshot.compact(as_of=yesterday), 0)
+
+        InventoryMovement.record('SALE', [(self.product.pk, None, -7)])
+        # Un movimiento anterior al snapshot ya está compactado y no se vuelve a sumar
+        InventoryMovement.objects.create(
+            product=self.product, movement_type='ADJUSTMENT', stock_delta=-100, created_at=yesterday - timedelta(hours=2)
+        )
+
+        self.assertEqual(InventorySnapshot.stock_as_of(self.product, yesterday), (50, 0))
+        self.assertEqual(InventorySnapshot.stock_as_of(self.product, timezone.now()), (43, 0))
+
+        response = self.client.get(
+            reverse('product-stock-as-of', kwargs={'pk': self.product.pk}), {"as_of": yesterday.date().isoformat()}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stock'], 50)
+
+    def test_reconcile_command_reports_and_fixes_drift(self):
+        # Cambio de stock por fuera de la bitácora
+        Product.objects.filter(pk=self.product.pk).update(current_stock=42)
+
+        drift = list(InventorySnapshot.find_drift())
+        self.assertEqual(drift, [(self.product.pk, 'BASE-001', (42, 0), (50, 0))])
+
+        call_command('reconcile_inventory', '--fix', stdout=StringIO())
+
+        self.assertEqual(list(InventorySnapshot.find_drift()), [])
+        adjustment = InventoryMovement.objects.get(movement_type='ADJUSTMENT')
+        self.assertEqual(adjustment.stock_delta, -8)
+
+
+
+class ProductImportTests(BaseProductTestCase):
+    CSV = (
+        "sku,name,price,supplier,tax_rate,current_stock\n"
+        "BASE-001,Producto Base Renombrado,200.00,Proveedor General,16,999\n"
+        "NEW-001,Nuevo Uno,10.00,{supplier_id},EXENT,5\n"
+        "NEW-002,Nuevo Dos,abc,Proveedor General,,\n"
+        "NEW-003,Nuevo Tres,5.00,Proveedor Fantasma,8,\n"
+        "NEW-001,Duplicado,1.00,Proveedor General,,\n"
+        "NEW-004,Nuevo Cuatro,50.00,Proveedor General,,\n"
+    )
+
+    def _write_csv(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8')
+        source.write(self.CSV.format(supplier_id=self.supplier.id))
+        source.close()
+        self.addCleanup(os.remove, source.name)
+        return source.name
+
+    def test_command_upserts_in_chunks_and_reports_row_errors(self):
+        Promotion.objects.create(
+            name="Promo", description="D", discount_percent=10, start_date=self.today, end_date=self.next_month,
+            target_audience="ALL", product=self.product, is_active=True
+        )
+        out = StringIO()
+
+        call_command('import_products', self._write_csv(), '--chunk-size', '2', stdout=out)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, "Producto Base Renombrado")
+        self.assertEqual(self.product.discounted_price, Decimal('180.00'))
+        self.assertEqual(self.product.final_price, Decimal('208.80'))
+        # El stock de un producto existente no se sobrescribe
+        self.assertEqual(self.product.current_stock, 50)
+
+        exempt = Product.objects.get(sku='NEW-001')
+        self.assertEqual((exempt.final_price, exempt.current_stock, exempt.supplier_id), (Decimal('10.00'), 5, self.supplier.id))
+        self.assertEqual(Product.objects.get(sku='NEW-004').final_price, Decimal('58.00'))
+        self.assertFalse(Product.objects.filter(sku__in=['NEW-002', 'NEW-003']).exists())
+        self.assertEqual(
+            list(InventoryMovement.objects.filter(movement_type='INITIAL', note='Importación').values_list('product__sku', 'stock_delta')),
+            [('NEW-001', 5)]
+        )
+
+        output = out.getvalue()
+        self.assertIn("Fila 4 (NEW-002): price", output)
+        self.assertIn("Fila 5 (NEW-003): supplier", output)
+        self.assertIn("Fila 6 (NEW-001): sku: SKU duplicado", output)
+        self.assertIn("Filas: 6, nuevos: 2, actualizados: 1, rechazados: 3", output)
+
+    def test_upload_endpoint_dry_run_and_permissions(self):
+        url = reverse('product-import-catalog')
+        upload = lambda: SimpleUploadedFile('catalogo.csv', self.CSV.format(supplier_id=self.supplier.id).encode())
+
+        self.client.force_authenticate(user=self.employee_user)
+        self.assertEqual(self.client.post(url, {"file": upload()}).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(url, {"file": upload(), "dry_run": "true"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stats']['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4, 5, 6])
+        self.assertFalse(Product.objects.filter(sku='NEW-001').exists())
+
+    def test_numeric_supplier_keys_fall_back_to_names(self):
+        # Nombres numéricos que no son ids existentes (el id 0 no existe; "000" se mantiene tal cual)
+        zeros = Supplier.objects.create(name="000", phone_number="1", rfc="ZEROS")
+        digits = Supplier.objects.create(name="99999999", phone_number="2", rfc="DIGITS")
+        csv_text = (
+            "sku,name,price,supplier\n"
+            f"NUM-1,Por id,1.00,{self.supplier.id}\n"
+            "NUM-2,Por nombre con ceros,1.00,000\n"
+            "NUM-3,Por nombre numérico,1.00,99999999\n"
+        )
+
+        report = ProductImportService(chunk_size=10).run(StringIO(csv_text))
+
+        self.assertEqual(report['errors'], [])
+        self.assertEqual(
+            dict(Product.objects.filter(sku__startswith='NUM-').values_list('sku', 'supplier_id')),
+            {'NUM-1': self.supplier.id, 'NUM-2': zeros.id, 'NUM-3': digits.id}
+        )
+
+
+class BulkRepricingTests(BaseProductTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse('product-reprice')
+
+        self.promo_product = Product.objects.create(
+            name="Con Promo", sku="PROMO-1", price=Decimal('200.00'), current_stock=5, supplier=self.supplier
+        )
+        Promotion.objects.create(
+            name="Promo", description="D", discount_percent=10, start_date=self.today, end_date=self.next_month,
+            target_audience="ALL", product=self.promo_product, is_active=True
+        )
+        other_supplier = Supplier.objects.create(name="Otro", phone_number="1", contact_person="X", rfc="X", tax_address="N/A")
+        self.untouched = Product.objects.create(
+            name="Otro proveedor", sku="OTHER-1", price=Decimal('10.00'), supplier=other_supplier
+        )
+
+    def test_dry_run_previews_without_writing(self):
+        response = self.client.post(self.url, {"supplier": self.supplier.id, "price_percent": "5", "dry_run": True}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['matched'], 2)
+        preview = {row['sku']: row for row in response.data['preview']}
+        self.assertEqual(preview['PROMO-1']['new_price'], Decimal('210.00'))
+        self.assertEqual(preview['PROMO-1']['new_discounted_price'], Decimal('189.00'))
+        self.assertEqual(preview['PROMO-1']['new_final_price'], Decimal('219.24'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal('100.00'))
+
+    def test_apply_matches_save_and_respects_promotions(self):
+        # Savepoint, SELECT de ids con bloqueo, UPDATE y el refresco de la tabla de precios (SELECT + upsert)
+        with self.assertNumQueries(6):
+            response = self.client.post(
+                self.url, {"supplier": self.supplier.id, "price_percent": "5", "tax_rate": "8.00"}, format='json'
+            )
+        self.assertEqual(response.data, {"dry_run": False, "updated": 2})
+
+        self.product.refresh_from_db()
+        self.promo_product.refresh_from_db()
+        self.untouched.refresh_from_db()
+        self.assertEqual((self.product.price, self.product.tax_rate, self.product.final_price), (Decimal('105.00'), '8.00', Decimal('113.40')))
+        self.assertEqual(self.promo_product.discounted_price, Decimal('189.00'))
+        self.assertEqual(self.promo_product.final_price, Decimal('204.12'))
+        self.assertEqual(self.untouched.price, Decimal('10.00'))
+
+        # Mismo resultado que recalcular con save()
+        self.promo_product.save()
+        self.promo_product.refresh_from_db()
+        self.assertEqual(self.promo_product.final_price, Decimal('204.12'))
+
+    def test_requires_filter_single_price_rule_and_admin(self):
+        self.assertEqual(self.client.post(self.url, {"price_percent": "5"}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.post(self.url, {"all_products": True, "price": "1", "price_amount": "2"}, format='json').status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        self.client.force_authenticate(user=self.employee_user)
+        self.assertEqual(
+            self.client.post(self.url, {"all_products": True, "tax_rate": "8.00"}, format='json').status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+
+
+class ProductPriceTableTests(BaseProductTestCase):
+
+    def _prices(self, product):
+        return {
+            row.tier: (row.base_price, row.final_price, row.promotion_name)
+            for row in ProductPrice.objects.filter(product=product)
+        }
+
+    def test_table_follows_price_and_promotion_changes(self):
+        self.assertEqual(self._prices(self.product), {
+            'GENERAL': (Decimal('100.00'), Decimal('116.00'), None),
+            'FREQUENT': (Decimal('100.00'), Decimal('116.00'), None),
+        })
+
+        promo = Promotion.objects.create(
+            name="Solo VIP", description="D", discount_percent=20, start_date=self.today, end_date=self.next_month,
+            target_audience="FREQUENT_ONLY", product=self.product, is_active=True
+        )
+        self.assertEqual(self._prices(self.product), {
+            'GENERAL': (Decimal('100.00'), Decimal('116.00'), None),
+            'FREQUENT': (Decimal('80.00'), Decimal('92.80'), "Solo VIP"),
+        })
+
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.post(reverse('product-reprice'), {"ids": [self.product.pk], "price": "50.00"}, format='json')
+        self.assertEqual(self._prices(self.product)['FREQUENT'], (Decimal('40.00'), Decimal('46.40'), "Solo VIP"))
+
+        # Como en la API: la promoción se lee de nuevo con el precio ya actualizado
+        Promotion.objects.get(pk=promo.pk).delete()
+        self.assertEqual(self._prices(self.product)['FREQUENT'], (Decimal('50.00'), Decimal('58.00'), None))
+
+    def test_stock_and_flag_saves_do_not_rebuild_price_rows(self):
+        product = Product.objects.get(pk=self.product.pk)
+
+        with mock.patch.object(ProductPrice, 'refresh') as refresh:
+            product.reduce_stock(2)
+            product.low_stock = True
+            product.save()
+            product.update_inventory_status()
+        refresh.assert_not_called()
+
+        with mock.patch.object(ProductPrice, 'refresh') as refresh:
+            product.price = Decimal('90.00')
+            product.save()
+        refresh.assert_called_once_with([product.pk])
+
+    def test_lookup_reads_product_and_tier_prices_in_one_query(self):
+        self.client.force_authenticate(user=self.employee_user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('product-lookup'), {"sku": "BASE-001"})
+
+        self.assertEqual(response.data['prices']['general'], {"base_price": "100.00", "final_price": "116.00", "promotion_name": None})
+        self.assertEqual(response.data['available_to_sell'], 50)
+
+    def test_rebuild_command_restores_missing_rows(self):
+        ProductPrice.objects.all().delete()
+
+        call_command('rebuild_price_table', stdout=StringIO())
+
+        self.assertEqual(ProductPrice.objects.filter(product=self.product).count(), 2)
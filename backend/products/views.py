@@ -2,22 +2,169 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend 
 from rest_framework.decorators import action
-from .models import Product, Promotion
-from .serializers import ProductSerializer, PromotionSerializer
+from rest_framework.parsers import MultiPartParser
+from .models import InventorySnapshot, Product, ProductPrice, Promotion, StockReservation
+from .serializers import (
+    ProductSerializer, PromotionSerializer, ProductPOSSerializer, ProductLookupSerializer, ProductSearchResultSerializer,
+    BulkRepriceSerializer
+)
+from .search import ProductSearchService
+from .imports import ProductImportService
+from .repricing import BulkRepricingService
 from .permissions import IsAdminOrOwner 
+from .filters import ProductFilter
+from .pagination import ProductCursorPagination
+from .cache import product_lookup_cache
 from django.db import transaction
+from django.utils import timezone
 from django.db.models import F
+from django.utils.dateparse import parse_date, parse_datetime
+import datetime
+import io
 
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    #/api/products/?page_size=50&sku=&name=&supplier=&low_stock=
+    queryset = Product.objects.prefetch_related('promotions').order_by('id')
     serializer_class = ProductSerializer
+    pagination_class = ProductCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProductFilter
     
     def get_permissions(self):
-        if self.action == 'destroy':
+        if self.action in ['destroy', 'import_catalog', 'reprice']:
             return [IsAdminOrOwner()]
         return [permissions.IsAuthenticated()]
 
+    def perform_update(self, serializer):
+        # Product.save registra el cambio de current_stock como ajuste; el delta se calcula
+        # contra la fila bloqueada, no contra la leída antes del bloqueo
+        with transaction.atomic():
+            serializer.instance = Product.objects.select_for_update().get(pk=serializer.instance.pk)
+            serializer.save()
+
+    def _pos_queryset(self):
+        return self.filter_queryset(
+            Product.objects.only(
+                'id', 'name', 'sku', 'final_price', 'current_stock', 'reserved_quantity', 'low_stock'
+            ).annotate(
+                available_to_sell=F('current_stock') - F('reserved_quantity')
+            ).order_by('id')
+        )
+
+    #/api/products/pos/
+    @action(detail=False, methods=['get'], url_path='pos')
+    def pos(self, request):
+        queryset = self._pos_queryset()
+
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(ProductPOSSerializer(page, many=True).data)
+
+    #/api/products/search/?q=coca&limit=20
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "Query param 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({"error": "Limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = ProductSearchService.search(query, limit=limit, queryset=self._pos_queryset())
+        return Response(ProductSearchResultSerializer(results, many=True).data)
+
+    #/api/products/lookup/?sku=KO-600-MX
+    @action(detail=False, methods=['get'], url_path='lookup')
+    def lookup(self, request):
+        sku = request.query_params.get('sku', '').strip()
+        if not sku:
+            return Response({"error": "Query param 'sku' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = product_lookup_cache.get(sku)
+        if data is None:
+            product_fields = [
+                'id', 'sku', 'name', 'price', 'discounted_price', 'final_price',
+                'promo_requires_frequent_customer', 'current_stock', 'reserved_quantity'
+            ]
+            # Producto y sus precios por nivel en una sola lectura (índices únicos sku y product, tier)
+            tier_prices = list(
+                ProductPrice.objects.select_related('product').filter(product__sku=sku).only(
+                    'tier', 'base_price', 'final_price', 'promotion_name',
+                    *[f'product__{field}' for field in product_fields]
+                )
+            )
+            if tier_prices:
+                product = tier_prices[0].product
+            else:
+                product = Product.objects.filter(sku=sku).only(*product_fields).first()
+            if product is None:
+                return Response({"error": f"Product with SKU '{sku}' not found."}, status=status.HTTP_404_NOT_FOUND)
+            product.tier_price_rows = tier_prices
+
+            data = dict(ProductLookupSerializer(product).data)
+            product_lookup_cache.set(sku, data)
+
+        return Response(data)
+
+    #/api/products/import/  (multipart: file=<csv>, dry_run=true opcional)
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_catalog(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Field 'file' (CSV) is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+        result = ProductImportService(dry_run=dry_run).run(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+
+        return Response(
+            {"dry_run": dry_run, **result},
+            status=status.HTTP_200_OK if result["stats"]["rows"] else status.HTTP_400_BAD_REQUEST
+        )
+
+    #/api/products/reprice/  {"supplier": 3, "price_percent": "5.00", "dry_run": true}
+    @action(detail=False, methods=['post'], url_path='reprice')
+    def reprice(self, request):
+        serializer = BulkRepriceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        queryset = serializer.get_queryset()
+        rule = serializer.get_rule()
+
+        if serializer.validated_data['dry_run']:
+            matched, preview = BulkRepricingService.preview(queryset, rule)
+            return Response({"dry_run": True, "matched": matched, "preview": preview})
+
+        updated = BulkRepricingService.apply(queryset, rule)
+        return Response({"dry_run": False, "updated": updated})
+
+    #/api/products/{id}/stock-as-of/?as_of=2025-01-31  (fecha: cierre de ese día; o fecha y hora ISO)
+    @action(detail=True, methods=['get'], url_path='stock-as-of')
+    def stock_as_of(self, request, pk=None):
+        product = self.get_object()
+        raw = request.query_params.get('as_of', '').strip()
+
+        as_of = parse_datetime(raw) if raw else timezone.now()
+        if as_of is None:
+            day = parse_date(raw)
+            if day is None:
+                return Response(
+                    {"error": "Query param 'as_of' must be a date (YYYY-MM-DD) or an ISO datetime."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            as_of = datetime.datetime.combine(day, datetime.time.max)
+        if timezone.is_naive(as_of):
+            as_of = timezone.make_aware(as_of)
+
+        stock, reserved = InventorySnapshot.stock_as_of(product, as_of)
+        return Response({
+            "product": product.id,
+            "sku": product.sku,
+            "as_of": as_of,
+            "stock": stock,
+            "reserved_quantity": reserved,
+        })
 
     #/api/products/{id}/reserve/
     @action(detail=True, methods=['post'], url_path='reserve')
@@ -57,16 +204,30 @@ class ProductViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            product.reserved_quantity = F('reserved_quantity') + amount
-            product.save()
-            
-            product.refresh_from_db()
+            reservation = None
+            if amount > 0:
+                # Cada apartado vence; release_expired_holds lo libera si no se usa
+                reservation = StockReservation.objects.create(
+                    product=product,
+                    quantity=amount,
+                    expires_at=timezone.now() + StockReservation.hold_duration()
+                )
+            elif amount < 0:
+                StockReservation.release(product, -amount)
+
+            # La fila está bloqueada: save() registra el delta en la bitácora
+            product.reserved_quantity = new_reserved
+            product.save(
+                update_fields=['reserved_quantity', 'updated_at'],
+                movement=('RESERVATION' if amount > 0 else 'RELEASE', '')
+            )
 
         return Response({
             "status": "success",
             "product": product.name,
             "reserved_quantity": product.reserved_quantity,
-            "available_to_sell": product.current_stock - product.reserved_quantity
+            "available_to_sell": product.current_stock - product.reserved_quantity,
+            "expires_at": reservation.expires_at if reservation else None
         }, status=status.HTTP_200_OK)
 
 class PromotionViewSet(viewsets.ModelViewSet):
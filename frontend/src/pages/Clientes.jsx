@@ -5,6 +5,16 @@ import ActionButtons from '../components/common/ActionButtons';
 import NotificationModal from '../components/common/NotificationModal';
 import '../styles/Clientes.css';
 
+// Customers are paginated by cursor: load one page at a time and follow `next` on demand
+const CUSTOMERS_PAGE_URL = '/api/customers/?page_size=100';
+const SEARCH_DEBOUNCE_MS = 300;
+
+// `next` is an absolute URL built by the backend host; keep only path and query so it goes through the /api proxy
+const toRelativeUrl = (url) => {
+  if (!url) return null;
+  const { pathname, search } = new URL(url, window.location.origin);
+  return `${pathname}${search}`;
+};
 
 const Clientes = () => {
   const [searchTerm, setSearchTerm] = useState('');
@@ -12,6 +22,8 @@ const Clientes = () => {
   
   // Data State
   const [customers, setCustomers] = useState([]);
+  const [nextPageUrl, setNextPageUrl] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [editingId, setEditingId] = useState(null);
@@ -48,36 +60,76 @@ const Clientes = () => {
   };
   const [formData, setFormData] = useState(initialFormState);
 
+  // First page of customers; with a search term the backend matches phone, first name or last name
   useEffect(() => {
-    fetchCustomers();
-  }, []);
-
-  const fetchCustomers = async () => {
-    setLoading(true);
-    const token = localStorage.getItem('access_token');
-    if (!token) {
-      setError('No hay sesión activa');
-      setLoading(false);
-      return;
-    }
+    let cancelled = false;
+
+    const fetchCustomers = async () => {
+      setLoading(true);
+      const token = localStorage.getItem('access_token');
+      if (!token) {
+        setError('No hay sesión activa');
+        setLoading(false);
+        return;
+      }
 
+      try {
+        const term = searchTerm.trim();
+        const url = term ? `${CUSTOMERS_PAGE_URL}&search=${encodeURIComponent(term)}` : CUSTOMERS_PAGE_URL;
+        const response = await fetch(url, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
+        if (cancelled) return;
+
+        if (response.ok) {
+          const data = await response.json();
+          if (cancelled) return;
+          setError('');
+          setCustomers(Array.isArray(data.results) ? data.results : []);
+          setNextPageUrl(toRelativeUrl(data.next));
+        } else {
+          if (response.status === 403) setError('No tiene permisos para ver clientes');
+          else setError('Error al cargar clientes');
+        }
+      } catch (err) {
+        if (cancelled) return;
+        console.error('Error fetching customers:', err);
+        setError('Error de conexión');
+      } finally {
+        if (!cancelled) setLoading(false);
+      }
+    };
+
+    // Wait until the user stops typing before querying the backend
+    const timer = setTimeout(fetchCustomers, searchTerm ? SEARCH_DEBOUNCE_MS : 0);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
+  const loadMoreCustomers = async () => {
+    if (!nextPageUrl) return;
+    setLoadingMore(true);
     try {
-      const response = await fetch('/api/customers/', {
+      const token = localStorage.getItem('access_token');
+      const response = await fetch(nextPageUrl, {
         headers: { 'Authorization': `Bearer ${token}` }
       });
+      if (!response.ok) throw new Error('Error al cargar más clientes');
 
-      if (response.ok) {
-        const data = await response.json();
-        setCustomers(Array.isArray(data) ? data : []);
-      } else {
-        if (response.status === 403) setError('No tiene permisos para ver clientes');
-        else setError('Error al cargar clientes');
-      }
+      const data = await response.json();
+      // Customers created in this session are already in the list
+      setCustomers(prev => {
+        const loadedIds = new Set(prev.map(c => c.id));
+        return [...prev, ...(data.results || []).filter(c => !loadedIds.has(c.id))];
+      });
+      setNextPageUrl(toRelativeUrl(data.next));
     } catch (err) {
-      console.error('Error fetching customers:', err);
-      setError('Error de conexión');
+      console.error('Error fetching customers page:', err);
+      showNotify('error', err.message, 'Error');
     } finally {
-      setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -179,16 +231,6 @@ const Clientes = () => {
   };
 
 
-  const filteredCustomers = customers.filter(customer => {
-    const search = searchTerm.toLowerCase();
-    const fullName = `${customer.first_name} ${customer.last_name}`.toLowerCase();
-    return (
-      fullName.includes(search) ||
-      (customer.email || '').toLowerCase().includes(search) ||
-      (customer.phone_number || '').includes(search)
-    );
-  });
-
   return (
     <>
       <Navbar activeItem="Clientes" />
@@ -205,7 +247,7 @@ const Clientes = () => {
       <div className="Main-Container">
         <div className="Tools_Container">
           <SearchBar 
-            placeholder="Buscar Cliente"
+            placeholder="Buscar Cliente (nombre, apellido o teléfono)"
             value={searchTerm}
             onChange={(e) => setSearchTerm(e.target.value)}
           />
@@ -230,10 +272,10 @@ const Clientes = () => {
             <tbody>
               {loading ? (
                 <tr><td colSpan="5" className="text-center">Cargando...</td></tr>
-              ) : filteredCustomers.length === 0 ? (
+              ) : customers.length === 0 ? (
                 <tr><td colSpan="5" className="text-center">No se encontraron clientes</td></tr>
               ) : (
-                filteredCustomers.map(customer => (
+                customers.map(customer => (
                   <tr key={customer.id}>
                     <td>{customer.first_name} {customer.last_name}</td>
                     <td>{customer.phone_number}</td>
@@ -248,6 +290,14 @@ const Clientes = () => {
               )}
             </tbody>
           </table>
+
+          {!loading && nextPageUrl && (
+            <div className="text-center my-3">
+              <button className="btn btn-outline-secondary" onClick={loadMoreCustomers} disabled={loadingMore}>
+                {loadingMore ? 'Cargando...' : 'Cargar más clientes'}
+              </button>
+            </div>
+          )}
         </div>
       </div>
 
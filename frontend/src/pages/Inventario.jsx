@@ -5,12 +5,24 @@ import ActionButtons from '../components/common/ActionButtons';
 import NotificationModal from '../components/common/NotificationModal';
 import '../styles/Usuarios.css'; // Reusing styles
 
+// Products are paginated by cursor: load one page at a time and follow `next` on demand
+const PRODUCTS_PAGE_URL = '/api/products/?page_size=100';
+const SEARCH_DEBOUNCE_MS = 300;
+
+// `next` is an absolute URL built by the backend host; keep only path and query so it goes through the /api proxy
+const toRelativeUrl = (url) => {
+  if (!url) return null;
+  const { pathname, search } = new URL(url, window.location.origin);
+  return `${pathname}${search}`;
+};
 
 const Inventario = () => {
   const [searchTerm, setSearchTerm] = useState('');
   const [showModal, setShowModal] = useState(false);
   
   const [products, setProducts] = useState([]);
+  const [nextPageUrl, setNextPageUrl] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [suppliers, setSuppliers] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
@@ -50,8 +62,31 @@ const Inventario = () => {
 
   const [formData, setFormData] = useState(initialFormState);
 
+  // Suppliers are needed for the dropdown and the table
   useEffect(() => {
-    const fetchData = async () => {
+    const fetchSuppliers = async () => {
+      const token = localStorage.getItem('access_token');
+      if (!token) return;
+      try {
+        // Suppliers fetch might fail if not admin, but we should handle it gracefully or rely on backend permissions
+        const suppRes = await fetch('/api/suppliers/', { headers: { 'Authorization': `Bearer ${token}` } });
+        if (suppRes.ok) {
+          const suppliersData = await suppRes.json();
+          setSuppliers(Array.isArray(suppliersData) ? suppliersData : []);
+        }
+      } catch (err) {
+        console.error('Error fetching suppliers:', err);
+      }
+    };
+
+    fetchSuppliers();
+  }, []);
+
+  // First page of products; with a search term the backend filters by exact SKU and name prefix
+  useEffect(() => {
+    let cancelled = false;
+
+    const fetchProducts = async () => {
       setLoading(true);
       const token = localStorage.getItem('access_token');
       if (!token) {
@@ -62,34 +97,75 @@ const Inventario = () => {
 
       try {
         const headers = { 'Authorization': `Bearer ${token}` };
-        
-        // Fetch operations in parallel
-        const [prodRes, suppRes] = await Promise.all([
-          fetch('/api/products/', { headers }),
-          fetch('/api/suppliers/', { headers }) // Suppliers needed for dropdown
-        ]);
-
-        if (!prodRes.ok) throw new Error('Error al cargar productos');
-        // Suppliers fetch might fail if not admin, but we should handle it gracefully or rely on backend permissions
-        
-        const productsData = await prodRes.json();
-        setProducts(Array.isArray(productsData) ? productsData : []);
-
-        if (suppRes.ok) {
-          const suppliersData = await suppRes.json();
-          setSuppliers(Array.isArray(suppliersData) ? suppliersData : []);
+        const term = searchTerm.trim();
+
+        let results = [];
+        let next = null;
+        if (!term) {
+          const prodRes = await fetch(PRODUCTS_PAGE_URL, { headers });
+          if (!prodRes.ok) throw new Error('Error al cargar productos');
+          const productsData = await prodRes.json();
+          results = productsData.results || [];
+          next = productsData.next;
+        } else {
+          const query = encodeURIComponent(term);
+          const [skuRes, nameRes] = await Promise.all([
+            fetch(`${PRODUCTS_PAGE_URL}&sku=${query}`, { headers }),
+            fetch(`${PRODUCTS_PAGE_URL}&name=${query}`, { headers })
+          ]);
+          if (!skuRes.ok || !nameRes.ok) throw new Error('Error al buscar productos');
+          const [skuData, nameData] = await Promise.all([skuRes.json(), nameRes.json()]);
+          // The exact SKU match goes first; the name matches can continue with `next`
+          const skuIds = new Set((skuData.results || []).map(p => p.id));
+          results = [...(skuData.results || []), ...(nameData.results || []).filter(p => !skuIds.has(p.id))];
+          next = nameData.next;
         }
 
+        if (cancelled) return;
+        setError('');
+        setProducts(results);
+        setNextPageUrl(toRelativeUrl(next));
       } catch (err) {
+        if (cancelled) return;
         console.error('Error fetching data:', err);
         setError(err.message);
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
     };
 
-    fetchData();
-  }, []);
+    // Wait until the user stops typing before querying the backend
+    const timer = setTimeout(fetchProducts, searchTerm ? SEARCH_DEBOUNCE_MS : 0);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
+  const loadMoreProducts = async () => {
+    if (!nextPageUrl) return;
+    setLoadingMore(true);
+    try {
+      const token = localStorage.getItem('access_token');
+      const response = await fetch(nextPageUrl, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (!response.ok) throw new Error('Error al cargar más productos');
+
+      const data = await response.json();
+      // Products created in this session are already in the list
+      setProducts(prev => {
+        const loadedIds = new Set(prev.map(p => p.id));
+        return [...prev, ...(data.results || []).filter(p => !loadedIds.has(p.id))];
+      });
+      setNextPageUrl(toRelativeUrl(data.next));
+    } catch (err) {
+      console.error('Error fetching products page:', err);
+      showNotify('error', err.message, 'Error');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const handleInputChange = (e) => {
     const { id, value } = e.target;
@@ -197,14 +273,6 @@ const Inventario = () => {
   };
 
 
-  const filteredProducts = products.filter(product => {
-    const search = searchTerm.toLowerCase();
-    return (
-      (product.name || '').toLowerCase().includes(search) ||
-      (product.sku || '').toLowerCase().includes(search)
-    );
-  });
-
   // Helper to get supplier name from ID
   const getSupplierName = (id) => {
     const supplier = suppliers.find(s => s.id === id);
@@ -227,7 +295,7 @@ const Inventario = () => {
       <div className="Main-Container">
         <div className="Tools_Container">
           <SearchBar 
-            placeholder="Buscar Producto (Nombre o SKU)"
+            placeholder="Buscar Producto (SKU o inicio del nombre)"
             value={searchTerm}
             onChange={(e) => setSearchTerm(e.target.value)}
           />
@@ -253,10 +321,10 @@ const Inventario = () => {
             <tbody>
               {loading ? (
                 <tr><td colSpan="6" className="text-center">Cargando...</td></tr>
-              ) : filteredProducts.length === 0 ? (
+              ) : products.length === 0 ? (
                 <tr><td colSpan="6" className="text-center">No se encontraron productos</td></tr>
               ) : (
-                filteredProducts.map(product => (
+                products.map(product => (
                   <tr key={product.id}>
                     <td>{product.sku}</td>
                     <td>{product.name}</td>
@@ -274,6 +342,14 @@ const Inventario = () => {
               )}
             </tbody>
           </table>
+
+          {!loading && nextPageUrl && (
+            <div className="text-center my-3">
+              <button className="btn btn-outline-secondary" onClick={loadMoreProducts} disabled={loadingMore}>
+                {loadingMore ? 'Cargando...' : 'Cargar más productos'}
+              </button>
+            </div>
+          )}
         </div>
       </div>
 
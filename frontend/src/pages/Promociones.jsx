@@ -5,6 +5,22 @@ import ActionButtons from '../components/common/ActionButtons';
 import NotificationModal from '../components/common/NotificationModal';
 import '../styles/Promociones.css';
 
+// The product picker needs every product: walk the cursor pages of the light POS projection
+const fetchAllProducts = async (headers) => {
+  const products = [];
+  let url = '/api/products/pos/?page_size=500';
+  for (;;) {
+    const response = await fetch(url, { headers });
+    if (!response.ok) break;
+    const data = await response.json();
+    products.push(...(data.results || []));
+    if (!data.next) break;
+    // `next` is absolute; keep path and query so it goes through the /api proxy
+    const next = new URL(data.next, window.location.origin);
+    url = `${next.pathname}${next.search}`;
+  }
+  return products;
+};
 
 const Promociones = () => {
   const [searchTerm, setSearchTerm] = useState('');
@@ -75,9 +91,9 @@ const Promociones = () => {
     try {
       const headers = { 'Authorization': `Bearer ${token}` };
       
-      const [promosRes, prodsRes] = await Promise.all([
+      const [promosRes, productList] = await Promise.all([
         fetch('/api/promotions/', { headers }),
-        fetch('/api/products/', { headers })
+        fetchAllProducts(headers)
       ]);
 
       if (promosRes.ok) {
@@ -88,10 +104,7 @@ const Promociones = () => {
         if (promosRes.status === 403) throw new Error('No tiene permisos para ver promociones');
       }
 
-      if (prodsRes.ok) {
-        const data = await prodsRes.json();
-        setProducts(Array.isArray(data) ? data : []);
-      }
+      setProducts(productList);
 
     } catch (err) {
       console.error('Error fetching data:', err);
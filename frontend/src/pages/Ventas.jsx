@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import Navbar from "../components/layout/Navbar";
 import SearchBar from "../components/layout/SearchBar";
@@ -9,6 +9,13 @@ import NotificationModal from "../components/common/NotificationModal";
 // We leave Ventas.css just for the Custom SVG animations used by LoadingModal inside it
 import "../styles/Ventas.css";
 
+// The catalog is never downloaded whole: first page of the POS projection, or the ranked search
+const POS_PRODUCTS_URL = "/api/products/pos/?page_size=50";
+const PRODUCT_SEARCH_LIMIT = 50;
+// Customer picker: a short page of matches for what the cashier types (name, last name or phone)
+const CUSTOMER_PICKER_URL = "/api/customers/?page_size=20";
+const SEARCH_DEBOUNCE_MS = 300;
+
 const Ventas = () => {
   // UI State
   const [searchTerm, setSearchTerm] = useState("");
@@ -31,12 +38,20 @@ const Ventas = () => {
   // Data State
   const [products, setProducts] = useState([]);
   const [customers, setCustomers] = useState([]);
+  const [customerSearch, setCustomerSearch] = useState("");
+  const [selectedCustomer, setSelectedCustomer] = useState(null);
   const [loading, setLoading] = useState(true);
 
   // Cart & Order State
   const [cart, setCart] = useState([]);
   const [selectedCustomerId, setSelectedCustomerId] = useState("");
   const [createdOrder, setCreatedOrder] = useState(null); // Stores the order response from backend
+  // Same key for every retry of the same cart, so a retried POST never creates a second order
+  const idempotencyKeyRef = useRef(null);
+
+  useEffect(() => {
+    idempotencyKeyRef.current = null;
+  }, [cart, selectedCustomerId]);
 
   const showNotify = (type, message, title = '', onConfirm = null) => {
     setNotification({
@@ -56,41 +71,88 @@ const Ventas = () => {
   const navigate = useNavigate();
 
   useEffect(() => {
-    fetchData();
-  }, []);
+    let cancelled = false;
 
-  const fetchData = async () => {
-    setLoading(true);
-    const token = localStorage.getItem("access_token");
-    if (!token) {
-      setError("No hay sesión activa");
-      setLoading(false);
-      return;
-    }
+    const fetchCustomers = async () => {
+      const token = localStorage.getItem("access_token");
+      if (!token) {
+        setError("No hay sesión activa");
+        return;
+      }
 
-    try {
-      const headers = { Authorization: `Bearer ${token}` };
-      const [prodRes, custRes] = await Promise.all([
-        fetch("/api/products/", { headers }),
-        fetch("/api/customers/", { headers }),
-      ]);
+      const term = customerSearch.trim();
+      const url = term ? `${CUSTOMER_PICKER_URL}&search=${encodeURIComponent(term)}` : CUSTOMER_PICKER_URL;
 
-      if (prodRes.ok) {
-        const prodData = await prodRes.json();
-        setProducts(Array.isArray(prodData) ? prodData : []);
-      }
-      if (custRes.ok) {
+      try {
+        const custRes = await fetch(url, { headers: { Authorization: `Bearer ${token}` } });
+        if (!custRes.ok || cancelled) return;
         const custData = await custRes.json();
-        setCustomers(Array.isArray(custData) ? custData : []);
+        if (cancelled) return;
+        setCustomers(Array.isArray(custData.results) ? custData.results : []);
+      } catch (err) {
+        if (cancelled) return;
+        console.error("Error loading sales data:", err);
+        setError("Error al cargar datos");
       }
-    } catch (err) {
-      console.error("Error loading sales data:", err);
-      setError("Error al cargar datos");
-    } finally {
-      setLoading(false);
-    }
+    };
+
+    const timer = setTimeout(fetchCustomers, customerSearch ? SEARCH_DEBOUNCE_MS : 0);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [customerSearch]);
+
+  const handleCustomerChange = (e) => {
+    const id = e.target.value;
+    setSelectedCustomerId(id);
+    setSelectedCustomer(customers.find((c) => String(c.id) === id) || null);
   };
 
+  // The selected customer stays in the picker even if a new search does not return it
+  const customerOptions =
+    selectedCustomer && !customers.some((c) => c.id === selectedCustomer.id)
+      ? [selectedCustomer, ...customers]
+      : customers;
+
+  // Products: name/SKU search runs on the backend (tolerates partial names and typos)
+  useEffect(() => {
+    let cancelled = false;
+
+    const fetchProducts = async () => {
+      const token = localStorage.getItem("access_token");
+      if (!token) {
+        setLoading(false);
+        return;
+      }
+
+      const term = searchTerm.trim();
+      const url = term
+        ? `/api/products/search/?q=${encodeURIComponent(term)}&limit=${PRODUCT_SEARCH_LIMIT}`
+        : POS_PRODUCTS_URL;
+
+      try {
+        const prodRes = await fetch(url, { headers: { Authorization: `Bearer ${token}` } });
+        if (!prodRes.ok || cancelled) return;
+        const prodData = await prodRes.json();
+        if (cancelled) return;
+        // The search returns a list; the POS projection returns a cursor page
+        const results = Array.isArray(prodData) ? prodData : prodData.results;
+        setProducts(Array.isArray(results) ? results : []);
+      } catch (err) {
+        console.error("Error loading products:", err);
+      } finally {
+        if (!cancelled) setLoading(false);
+      }
+    };
+
+    const timer = setTimeout(fetchProducts, searchTerm ? SEARCH_DEBOUNCE_MS : 0);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
   // --- Cart Logic ---
   const addToCart = (product) => {
     setCart((prev) => {
@@ -152,12 +214,17 @@ const Ventas = () => {
       })),
     };
 
+    if (!idempotencyKeyRef.current) {
+      idempotencyKeyRef.current = crypto.randomUUID();
+    }
+
     try {
       const response = await fetch("/api/orders/", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
           Authorization: `Bearer ${token}`,
+          "Idempotency-Key": idempotencyKeyRef.current,
         },
         body: JSON.stringify(orderPayload),
       });
@@ -211,6 +278,8 @@ const Ventas = () => {
 
       if (response.ok) {
         setSelectedCustomerId("");
+        setSelectedCustomer(null);
+        setCustomerSearch("");
         setPaymentAmount("");
 
         // Navigate to Ticket
@@ -240,12 +309,6 @@ const Ventas = () => {
     }
   };
 
-  const filteredProducts = products.filter(
-    (p) =>
-      p.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      p.sku.toLowerCase().includes(searchTerm.toLowerCase()),
-  );
-
   return (
     <>
       <Navbar activeItem="Ventas" />
@@ -273,16 +336,23 @@ const Ventas = () => {
             <div className="w-full lg:w-2/3 flex flex-col h-full p-2.5">
               <div className="flex flex-col h-full gap-3">
                 {/* Cliente Selector */}
-                <div className="bg-white w-full rounded-xl p-2.5 flex items-center justify-center flex-row shadow-sm">
+                <div className="bg-white w-full rounded-xl p-2.5 flex items-center justify-center flex-row gap-3 shadow-sm">
+                  <input
+                    type="text"
+                    placeholder="Buscar cliente (nombre o teléfono)"
+                    className="w-[35%] h-8 p-2 rounded-lg border border-gray-100 focus:outline-none focus:ring-2 focus:ring-blue-500 bg-grey-100"
+                    value={customerSearch}
+                    onChange={(e) => setCustomerSearch(e.target.value)}
+                  />
                   <select
                     name="Client"
                     id="Client"
                     className="w-[50%] h-8 p-2 rounded-lg border border-gray-100 focus:outline-none focus:ring-2 focus:ring-blue-500 bg-grey-100"
                     value={selectedCustomerId}
-                    onChange={(e) => setSelectedCustomerId(e.target.value)}
+                    onChange={handleCustomerChange}
                   >
                     <option value="">Cliente Visitante</option>
-                    {customers.map((c) => (
+                    {customerOptions.map((c) => (
                       <option key={c.id} value={c.id}>
                         {c.first_name} {c.last_name}
                       </option>
@@ -297,7 +367,7 @@ const Ventas = () => {
                       <p className="text-center text-gray-500">Cargando productos...</p>
                     ) : (
                       <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
-                        {filteredProducts.map((product) => (
+                        {products.map((product) => (
                           <div className="col-span-1" key={product.id}>
                             <div
                               className="bg-white rounded-xl p-4 border border-[#ddd] cursor-pointer hover:shadow-md transition-shadow h-full flex flex-col justify-center"